@@ -1,4 +1,7 @@
-from fastapi import APIRouter, Request, Query, Depends
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import APIRouter, Request, Query, Depends, Header
 from sqlalchemy.ext.asyncio import AsyncSession
 from starlette import status
 
@@ -9,6 +12,10 @@ from api.v1.handlers.short_link_service import (
     get_db_connect_status_handler,
     delete_short_url_handler,
     batch_upload_links_handler,
+    get_short_url_timeseries_handler,
+    export_short_url_history_handler,
+    batch_status_handler,
+    delete_batch_handler,
 )
 from api.v1.schemas.short_link_service import (
     GetShotLinkRequest,
@@ -17,10 +24,14 @@ from api.v1.schemas.short_link_service import (
     ShortUrlInfoResponse,
     ShortUrlInfoResponseDetail,
     DBConnStatusResponse,
-    ShotLinksListResponse
+    ShotLinksListResponse,
+    TimeseriesResponse,
+    ShortIdsBatchRequest,
+    ShortUrlBatchStatusResponse,
+    DeleteBatchResponse,
 )
 # Объект router, в котором регистрируем обработчики
-from db.short_links_db_base import get_session
+from db.short_links_db_base import get_read_session, get_session
 
 router = APIRouter()
 
@@ -36,12 +47,24 @@ async def batch_upload_links(request: GetShotLinksListRequest, db: AsyncSession
 
 
 @router.get("/ping", response_model=DBConnStatusResponse, status_code=status.HTTP_200_OK)
-async def get_db_connect_status(db: AsyncSession = Depends(get_session), ):
+async def get_db_connect_status(db: AsyncSession = Depends(get_read_session), ):
     return await get_db_connect_status_handler(db)
 
 
+@router.post("/status/batch", response_model=ShortUrlBatchStatusResponse, status_code=status.HTTP_200_OK)
+async def batch_status(request: ShortIdsBatchRequest, db: AsyncSession = Depends(get_read_session), ):
+    return await batch_status_handler(request, db)
+
+
+@router.post("/delete/batch", response_model=DeleteBatchResponse, status_code=status.HTTP_200_OK)
+async def delete_batch(request: ShortIdsBatchRequest, db: AsyncSession = Depends(get_session), ):
+    return await delete_batch_handler(request, db)
+
+
 @router.get("/{shorten_url_id}", status_code=status.HTTP_307_TEMPORARY_REDIRECT)
-async def redirect_for_short_url_id(shorten_url_id: str, request: Request, db: AsyncSession = Depends(get_session), ):
+async def redirect_for_short_url_id(
+        shorten_url_id: str, request: Request, db: AsyncSession = Depends(get_read_session),
+):
     return await redirect_for_short_url_id_handler(shorten_url_id, request, db)
 
 
@@ -58,12 +81,46 @@ async def get_short_url_info(
         full_info: bool = Query(default=False, alias="full-info"),
         max_result: int = Query(default=10, alias="max-result"),
         offset: int = Query(default=0, ),
-        db: AsyncSession = Depends(get_session),
+        cursor: Optional[str] = Query(default=None, ),
+        since: Optional[date] = Query(default=None, ),
+        until: Optional[date] = Query(default=None, ),
+        if_none_match: Optional[str] = Header(default=None, ),
+        if_modified_since: Optional[str] = Header(default=None, ),
+        db: AsyncSession = Depends(get_read_session),
 ):
     return await get_short_url_info_handler(
         shorten_url_id,
         full_info=full_info,
         max_result=max_result,
         offset=offset,
+        cursor=cursor,
+        since=since,
+        until=until,
+        if_none_match=if_none_match,
+        if_modified_since=if_modified_since,
         db=db,
     )
+
+
+@router.get("/{shorten_url_id}/status/timeseries", response_model=TimeseriesResponse, status_code=status.HTTP_200_OK)
+async def get_short_url_timeseries(
+        shorten_url_id: str,
+        bucket: str = Query(default="day", regex="^(minute|hour|day)$"),
+        since: Optional[datetime] = Query(default=None, alias="from"),
+        until: Optional[datetime] = Query(default=None, alias="to"),
+        db: AsyncSession = Depends(get_read_session),
+):
+    return await get_short_url_timeseries_handler(shorten_url_id, bucket=bucket, since=since, until=until, db=db)
+
+
+@router.get("/{shorten_url_id}/status/export", status_code=status.HTTP_200_OK)
+async def export_short_url_history(
+        shorten_url_id: str,
+        export_format: str = Query(default="ndjson", alias="format", regex="^(ndjson|csv)$"),
+        since: Optional[datetime] = Query(default=None, alias="from"),
+        until: Optional[datetime] = Query(default=None, alias="to"),
+        db: AsyncSession = Depends(get_read_session),
+):
+    return await export_short_url_history_handler(
+        shorten_url_id, export_format=export_format, since=since, until=until, db=db,
+    )
@@ -1,55 +1,186 @@
 import logging
-from logging import config as logging_config
+from datetime import date, datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
 
 from fastapi import Request, Query, status, HTTPException
-from fastapi.responses import ORJSONResponse, RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse, Response, StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from core.config import LEN_SHORT_LINK, LINK_NOT_FOUND, PAGE_DELETED, WAS_DELETED
+from core.config import LEN_SHORT_LINK, LINK_NOT_FOUND, PAGE_DELETED, WAS_DELETED, INVALID_CURSOR
+from core.config import INVALID_TIME_RANGE, TIMESERIES_DEFAULT_BUCKETS, TIMESERIES_MAX_BUCKETS
+from core.config import LINK_DELETED, LINK_FOUND, LINK_GONE, LINK_MISSING
+from core.config import PERMANENT_REDIRECT_STATUSES, STATUS_CACHE_CONTROL
 from api.v1.schemas.short_link_service import (
     GetShotLinkRequest,
     GetShotLinksListRequest,
     ShotLinkResponse,
     ShortLinkCreate,
-    ShortLinkUsageHistoryAdd,
-    ShortLinkUpdate,
     ShortUrlInfoResponse,
-    ShortUrlInfoResponseDetail,
     DBConnStatusResponse,
-    ShotLinksListCreate,
-    ShotLinksListResponse
+    BatchUploadItem,
+    RedirectPolicy,
+    ShortIdsBatchRequest,
+    TimeseriesResponse,
+    check_http_link,
 )
-from core.config import PROJECT_URL
-from core.logger import LOGGING
-from models.short_link import ShortLink, ShortLinkHistory
-from services.base import RepositoryDB
+from core.config import PROJECT_URL, ORIGINAL_URL_KEY, SHORT_ID, SHORT_URL, BATCH_ERROR, app_settings
+from services.bloom import LinkIdFilter
+from services.cache import MISS, LinkCache, LinkCacheEntry
+from services.clicks import ClickEvent, ClickRecorder
+from services.dedup import link_hash
+from services.export import EXPORT_MEDIA_TYPES, encode_history
+from services.id_generator import make_id_generator
+from services.pagination import decode_cursor, encode_cursor
+from services.rollups import BUCKET_SIZES, bucket_start
+from services.singleflight import SingleFlight
+from services.storage import LinkRecord, make_storage
+from db.routing import USE_PRIMARY
+from db.short_links_db_base import async_session, engine, replica_router
 
-logging_config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
-sl_crud = RepositoryDB(ShortLink)
-slh_crud = RepositoryDB(ShortLinkHistory)
+storage = make_storage(
+    app_settings.storage_backend,
+    chunk_size=app_settings.batch_insert_chunk_size,
+    counter_shards=app_settings.counter_shards,
+    sqlite_path=app_settings.sqlite_path,
+    visitors_precision=app_settings.visitors_precision,
+    visitors_daily=app_settings.visitors_daily,
+)
+link_cache = LinkCache(
+    max_size=app_settings.link_cache_size,
+    ttl=app_settings.link_cache_ttl,
+    negative_ttl=app_settings.link_cache_negative_ttl,
+)
+id_generator = make_id_generator(
+    app_settings.id_generator,
+    length=LEN_SHORT_LINK,
+    worker_id=app_settings.id_worker_id,
+    workers=app_settings.web_concurrency,
+    engine=engine if app_settings.storage_backend == 'postgres' else None,
+)
+link_filter = LinkIdFilter(
+    async_session,
+    storage=storage,
+    error_rate=app_settings.link_filter_error_rate,
+    max_bytes=app_settings.link_filter_max_bytes,
+    refresh_interval=app_settings.link_filter_refresh_interval,
+    rebuild_interval=app_settings.link_filter_rebuild_interval,
+)
+# Одновременные чтения одной ссылки (вирусная ссылка после промаха кеша, опрос /status)
+link_lookups: SingleFlight[Optional[LinkRecord]] = SingleFlight("link")
+click_recorder = ClickRecorder(
+    async_session,
+    storage=storage,
+    batch_size=app_settings.click_batch_size,
+    flush_interval=app_settings.click_flush_interval,
+    queue_size=app_settings.click_queue_size,
+)
 
 
-def get_item_object_in_for_url(original_url: str, len_short_link: int) -> ShortLinkCreate:
+async def get_item_object_in_for_url(
+        db: AsyncSession, original_url: str, policy: RedirectPolicy = RedirectPolicy(),
+) -> ShortLinkCreate:
     logger.info("start get_item_object_in_for_url; original_url: %s", original_url)
-    link_id = sl_crud.create_short_url(len_short_link)
+    link_id = await id_generator.next_id(db)
     logger.debug("link_id: %s", link_id)
     obj_in = ShortLinkCreate(
         original_link=original_url,
         link_id=link_id,
         short_link=f"{PROJECT_URL}{link_id}",
+        redirect_status=policy.redirect_status,
+        cache_max_age=policy.cache_max_age,
     )
-    logger.info("end get_item_object_in_for_url; obj_in: %s", obj_in)
+    logger.debug("end get_item_object_in_for_url; obj_in: %s", obj_in)
     return obj_in
 
 
+def read_your_writes(db: AsyncSession, shorten_url_id: str) -> None:
+    # Только что созданная или удалённая ссылка может ещё не дойти до реплики
+    if replica_router.recently_written(shorten_url_id):
+        db.info[USE_PRIMARY] = True
+
+
+async def load_link(db: AsyncSession, shorten_url_id: str) -> Optional[LinkRecord]:
+    """Ссылка по short-id; одновременные чтения одной ссылки идут в БД одним запросом.
+
+    Запрос выполняется на сессии первого из вызовов; ключ учитывает, читается ли
+    ссылка с основной БД, чтобы read-your-writes не получил ответ реплики.
+    """
+    read_your_writes(db, shorten_url_id)
+    use_primary = bool(db.info.get(USE_PRIMARY))
+    return await link_lookups.do((shorten_url_id, use_primary), lambda: storage.get_link(db, shorten_url_id))
+
+
+async def get_link_entry(db: AsyncSession, shorten_url_id: str) -> Optional[LinkCacheEntry]:
+    entry = link_cache.get(shorten_url_id)
+    if entry is not MISS:
+        logger.debug("link_cache hit: %s", shorten_url_id)
+        return entry
+    if not link_filter.might_exist(shorten_url_id):
+        return None
+    # Удаление ссылки во время чтения инвалидирует ключ - тогда прочитанное в кеш не попадёт
+    version = link_cache.version()
+    sl_obj = await load_link(db, shorten_url_id)
+    entry = LinkCacheEntry.from_link(sl_obj) if sl_obj else None
+    link_cache.put(shorten_url_id, entry, version)
+    return entry
+
+
+def redirect_cache_control(entry: LinkCacheEntry) -> Optional[str]:
+    """Cache-Control редиректа по политике ссылки; None - редирект не кешируется"""
+    max_age = entry.cache_max_age
+    if max_age is None and entry.redirect_status in PERMANENT_REDIRECT_STATUSES:
+        max_age = app_settings.permanent_redirect_max_age
+    return f"public, max-age={max_age}" if max_age is not None else None
+
+
+async def resolve_duplicate_links(
+        db: AsyncSession, items: list[tuple[dict, BatchUploadItem]],
+) -> tuple[list[tuple[dict, BatchUploadItem]], list[tuple[dict, dict]]]:
+    """Заполняет элементы пачки, чьи URL с той же политикой редиректа уже сокращались, одним запросом к БД.
+
+    Принимает пары (элемент ответа, элемент запроса). Возвращает пары, для которых нужно
+    создать ссылки, и пары (повтор внутри пачки, первый элемент с тем же URL) - повтор
+    получит результат первого.
+    """
+    hashes = [link_hash(item.original_url, item.redirect_status, item.cache_max_age) for _, item in items]
+    existing = await storage.get_active_by_hashes(db, hashes=list(set(hashes)))
+    new_items = []
+    duplicates = []
+    owners: dict[bytes, dict] = {}
+    for (item_resp, item), hash_ in zip(items, hashes):
+        if hash_ in existing:
+            item_resp[SHORT_ID], item_resp[SHORT_URL] = existing[hash_]
+        elif hash_ in owners:
+            duplicates.append((item_resp, owners[hash_]))
+        else:
+            owners[hash_] = item_resp
+            new_items.append((item_resp, item))
+    return new_items, duplicates
+
+
 async def get_short_link_handler(request: GetShotLinkRequest, db: AsyncSession):
     logger.info("start get_short_link_handler")
-    obj_in = get_item_object_in_for_url(request.original_url, LEN_SHORT_LINK)
-    short_link_obj = await sl_crud.create(db=db, obj_in=obj_in)
-    logger.debug("short_link: %s", short_link_obj)
-    resp = ShotLinkResponse(short_id=short_link_obj.link_id, short_url=short_link_obj.short_link).dict(by_alias=True)
+    if app_settings.dedup_enabled:
+        hash_ = link_hash(request.original_url, request.redirect_status, request.cache_max_age)
+        existing = await storage.get_active_by_hashes(db, hashes=[hash_])
+        if existing:
+            link_id, short_link = next(iter(existing.values()))
+            logger.info("end get_short_link_handler: already shortened: %s", link_id)
+            return ORJSONResponse(
+                ShotLinkResponse(short_id=link_id, short_url=short_link).dict(by_alias=True),
+                status_code=status.HTTP_201_CREATED
+            )
+    obj_in = await get_item_object_in_for_url(db, request.original_url, request)
+    errors = await storage.create_links(db, rows=[obj_in.dict()])
+    if errors[obj_in.link_id]:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=errors[obj_in.link_id])
+    replica_router.note_write([obj_in.link_id])
+    link_filter.add([obj_in.link_id])
+    logger.debug("short_link: %s", obj_in)
+    resp = ShotLinkResponse(short_id=obj_in.link_id, short_url=obj_in.short_link).dict(by_alias=True)
     logger.info("end get_short_link_handler: %s", resp)
     return ORJSONResponse(
         resp,
@@ -58,30 +189,59 @@ async def get_short_link_handler(request: GetShotLinkRequest, db: AsyncSession):
 
 
 async def batch_upload_links_handler(request: GetShotLinksListRequest, db: AsyncSession):
-    logger.info("start batch_upload_links_handler: request: %s", request.__root__)
-    list_obj = [get_item_object_in_for_url(item.original_url, LEN_SHORT_LINK) for item in request.__root__]
-    logger.debug("list_obj: %s", list_obj)
-    objects_in = ShotLinksListCreate(
-        __root__=list_obj
-    )
-    logger.debug("objects_in: %s", objects_in)
-    multi_obj = await sl_crud.update_multi(db=db, objects_in=objects_in)
-    logger.debug("multi_obj: %s; type(multi_obj): %s", multi_obj, type(multi_obj))
-    list_resp = [ShotLinkResponse(short_id=obj.link_id, short_url=obj.short_link) for obj in multi_obj]
-    resp = ShotLinksListResponse(
-        __root__=list_resp
-    ).dict(by_alias=True)
-
-    logger.info("end batch_upload_links_handler: request: %s", resp)
+    logger.info("start batch_upload_links_handler: len(request): %s", len(request.__root__))
+    # Ответ собирается сразу в виде словарей: на пачках в 10-100 тыс. ссылок
+    # создание pydantic-моделей на каждый элемент заметно дороже самой вставки
+    list_resp = []
+    valid_items = []
+    for item in request.__root__:
+        item_resp = {ORIGINAL_URL_KEY: item.original_url, SHORT_ID: None, SHORT_URL: None, BATCH_ERROR: None}
+        list_resp.append(item_resp)
+        try:
+            check_http_link(item.original_url)
+        except ValueError as err:
+            item_resp[BATCH_ERROR] = str(err)
+            continue
+        valid_items.append((item_resp, item))
+    new_items = valid_items
+    duplicates: list[tuple[dict, dict]] = []
+    if app_settings.dedup_enabled:
+        new_items, duplicates = await resolve_duplicate_links(db, valid_items)
+    link_ids = await id_generator.next_ids(db, len(new_items))
+    rows = []
+    for (item_resp, item), link_id in zip(new_items, link_ids):
+        short_link = f"{PROJECT_URL}{link_id}"
+        rows.append({
+            "original_link": item.original_url,
+            "link_id": link_id,
+            "short_link": short_link,
+            "redirect_status": item.redirect_status,
+            "cache_max_age": item.cache_max_age,
+        })
+        item_resp[SHORT_ID] = link_id
+        item_resp[SHORT_URL] = short_link
+    errors = await storage.create_links(db, rows=rows)
+    created_link_ids = [link_id for link_id, error in errors.items() if error is None]
+    replica_router.note_write(created_link_ids)
+    link_filter.add(created_link_ids)
+    for item_resp in list_resp:
+        error = errors.get(item_resp[SHORT_ID]) if item_resp[SHORT_ID] else None
+        if error:
+            item_resp.update({SHORT_ID: None, SHORT_URL: None, BATCH_ERROR: error})
+    for item_resp, owner_resp in duplicates:
+        item_resp.update({SHORT_ID: owner_resp[SHORT_ID], SHORT_URL: owner_resp[SHORT_URL],
+                          BATCH_ERROR: owner_resp[BATCH_ERROR]})
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("end batch_upload_links_handler: created: %s", len(rows) - sum(map(bool, errors.values())))
     return ORJSONResponse(
-        resp["__root__"],
+        list_resp,
         status_code=status.HTTP_201_CREATED
     )
 
 
 async def get_db_connect_status_handler(db: AsyncSession):
     logger.info("start get_db_connect_status_handler")
-    ping_result: bool = await sl_crud.ping_db(db)
+    ping_result: bool = await storage.ping(db)
     resp = DBConnStatusResponse(is_available=ping_result).dict()
     logger.info("end get_db_connect_status_handler: resp: %s", resp)
     return ORJSONResponse(resp, status_code=status.HTTP_200_OK)
@@ -89,40 +249,117 @@ async def get_db_connect_status_handler(db: AsyncSession):
 
 async def delete_short_url_handler(shorten_url_id: str, db):
     logger.info("start delete_short_url_handler, shorten_url_id: %s", shorten_url_id)
-    sl_obj = await sl_crud.get_for_shorten_url(db=db, shorten_url_id=shorten_url_id)
-    logger.debug("sl_obj.id: %s", sl_obj.id)
+    sl_obj: Optional[LinkRecord] = None
+    if link_filter.might_exist(shorten_url_id):
+        sl_obj = await storage.get_link(db, shorten_url_id)
     if not sl_obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
+    logger.debug("sl_obj.id: %s", sl_obj.id)
     if not sl_obj.is_active:
         raise HTTPException(status_code=status.HTTP_410_GONE, detail=PAGE_DELETED)
-    sl_del_obj = await sl_crud.delete(db=db, db_obj=sl_obj)
-    logger.debug("sl_del_obj.is_active %s", sl_del_obj.is_active)
+    await storage.deactivate_link(db, link=sl_obj)
+    link_cache.invalidate(shorten_url_id)
+    replica_router.note_write([shorten_url_id])
     logger.info("end delete_short_url_handler, shorten_url_id: %s", shorten_url_id)
     return ORJSONResponse({shorten_url_id: WAS_DELETED}, status_code=status.HTTP_200_OK)
 
 
+def unique_ids_in_filter(request: ShortIdsBatchRequest) -> tuple[list[str], list[str]]:
+    """short-id пачки без повторов в порядке запроса и те из них, что могут существовать"""
+    ids = list(dict.fromkeys(request.__root__))
+    return ids, [shorten_url_id for shorten_url_id in ids if link_filter.might_exist(shorten_url_id)]
+
+
+async def batch_status_handler(request: ShortIdsBatchRequest, db: AsyncSession):
+    logger.info("start batch_status_handler: len(request): %s", len(request.__root__))
+    ids, candidates = unique_ids_in_filter(request)
+    if any(replica_router.recently_written(shorten_url_id) for shorten_url_id in candidates):
+        db.info[USE_PRIMARY] = True
+    links = await storage.get_links(db, candidates)
+    found = list(links.values())
+    click_counts = await storage.get_click_counts(db, links=found)
+    unique_clients = await storage.get_unique_clients_many(db, link_ids=[link.id for link in found])
+    resp = []
+    for shorten_url_id in ids:
+        link = links.get(shorten_url_id)
+        if link is None:
+            resp.append({
+                SHORT_ID: shorten_url_id, "status": LINK_MISSING, "click_count": None, "unique_clients": None,
+            })
+            continue
+        resp.append({
+            SHORT_ID: shorten_url_id,
+            "status": LINK_FOUND if link.is_active else LINK_GONE,
+            "click_count": click_counts[link.id],
+            "unique_clients": unique_clients[link.id],
+        })
+    logger.info("end batch_status_handler: found: %s of %s", len(found), len(ids))
+    return ORJSONResponse(resp, status_code=status.HTTP_200_OK)
+
+
+async def delete_batch_handler(request: ShortIdsBatchRequest, db: AsyncSession):
+    logger.info("start delete_batch_handler: len(request): %s", len(request.__root__))
+    ids, candidates = unique_ids_in_filter(request)
+    was_active = await storage.deactivate_links(db, link_ids=candidates)
+    deleted = [shorten_url_id for shorten_url_id, active in was_active.items() if active]
+    for shorten_url_id in deleted:
+        link_cache.invalidate(shorten_url_id)
+    replica_router.note_write(deleted)
+    resp = []
+    for shorten_url_id in ids:
+        if shorten_url_id not in was_active:
+            link_status = LINK_MISSING
+        else:
+            link_status = LINK_DELETED if was_active[shorten_url_id] else LINK_GONE
+        resp.append({SHORT_ID: shorten_url_id, "status": link_status})
+    logger.info("end delete_batch_handler: deleted: %s of %s", len(deleted), len(ids))
+    return ORJSONResponse(resp, status_code=status.HTTP_200_OK)
+
+
 async def redirect_for_short_url_id_handler(shorten_url_id: str, request: Request, db: AsyncSession):
     logger.info("start redirect_for_short_url_id_handler, shorten_url_id: %s", shorten_url_id)
     client_info = f"{request.client.host}:{request.client.port}"
     logger.debug("client_info: %s", client_info)
-    sl_obj = await sl_crud.get_for_shorten_url(db, shorten_url_id)
-    if not sl_obj:
+    entry = await get_link_entry(db, shorten_url_id)
+    if not entry:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
-    if not sl_obj.is_active:
+    if not entry.is_active:
         raise HTTPException(status_code=status.HTTP_410_GONE, detail=PAGE_DELETED)
-    slh_create_obj = ShortLinkUsageHistoryAdd(
-        short_link_id=sl_obj.id,
-        client_ip=client_info,
+    logger.debug("entry: %s", entry)
+    await click_recorder.record(ClickEvent(entry.id, client_info, datetime.utcnow()))
+    logger.info("end redirect_for_short_url_id_handler; entry.original_link:%s", entry.original_link)
+    cache_control = redirect_cache_control(entry)
+    return RedirectResponse(
+        entry.original_link,
+        status_code=entry.redirect_status,
+        headers={"cache-control": cache_control} if cache_control else None,
     )
-    logger.debug("sl_obj: %s; sl_obj.id_type: %s", sl_obj, type(sl_obj.id))
-    slh_obj = await slh_crud.create(db=db, obj_in=slh_create_obj)
-    logger.debug("slh_obj: %s", slh_obj)
-    usage_up = ShortLinkUpdate(usages_count=sl_obj.usages_count + 1)
-    logger.debug("usage_up: %s; type(usage_up): %s", usage_up, type(usage_up))
-    sl_obj_up = await sl_crud.update(db=db, db_obj=sl_obj, obj_in=usage_up)
-    logger.debug("sl_obj_up: %s; sl_obj_up.id_type: %s", sl_obj_up, type(sl_obj_up.id))
-    logger.info("end redirect_for_short_url_id_handler; sl_obj.original_link:%s", sl_obj.original_link)
-    return RedirectResponse(sl_obj.original_link, status_code=status.HTTP_307_TEMPORARY_REDIRECT)
+
+
+def status_validators(link: LinkRecord, click_count: int, last_click_at: Optional[datetime]) -> dict[str, str]:
+    """ETag и Last-Modified ответа /status: его содержимое меняется только с новыми переходами"""
+    headers = {"etag": f'"{link.id.hex}-{click_count}"', "cache-control": STATUS_CACHE_CONTROL}
+    modified = max((moment for moment in (link.created_at, last_click_at) if moment), default=None)
+    if modified is not None:
+        headers["last-modified"] = format_datetime(modified.replace(tzinfo=timezone.utc), usegmt=True)
+    return headers
+
+
+def is_not_modified(headers: dict[str, str], if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+    """У клиента актуальная версия ответа с заголовками headers"""
+    # If-None-Match важнее If-Modified-Since; ETag сравнивается слабо (RFC 9110, 13.1.2)
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or headers["etag"] in tags
+    if if_modified_since is None or "last-modified" not in headers:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    return parsedate_to_datetime(headers["last-modified"]) <= since
 
 
 async def get_short_url_info_handler(
@@ -131,26 +368,125 @@ async def get_short_url_info_handler(
         full_info: bool = Query(default=False, alias="full-info"),
         max_result: int = Query(default=10, alias="max-result"),
         offset: int = Query(default=0, ),
+        cursor: Optional[str] = Query(default=None, ),
+        since: Optional[date] = Query(default=None, ),
+        until: Optional[date] = Query(default=None, ),
+        if_none_match: Optional[str] = None,
+        if_modified_since: Optional[str] = None,
 ):
     logger.info("start get_short_url_info_handler")
-    sl_obj = await sl_crud.get_for_shorten_url(db, shorten_url_id)
+    if not link_filter.might_exist(shorten_url_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
+    sl_obj = await load_link(db, shorten_url_id)
     if not sl_obj:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
-    status_info = ShortUrlInfoResponse(click_count=sl_obj.usages_count).dict()
+    click_count = await storage.get_click_count(db, link=sl_obj)
+    headers = status_validators(sl_obj, click_count, await storage.get_last_click_at(db, link_id=sl_obj.id))
+    if is_not_modified(headers, if_none_match, if_modified_since):
+        # Уникальные клиенты и история не читаются: без новых переходов они те же
+        logger.info("end get_short_url_info_handler; not modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    unique_clients = await storage.get_unique_clients(db, link_id=sl_obj.id, since=since, until=until)
+    status_info = ShortUrlInfoResponse(click_count=click_count, unique_clients=unique_clients).dict()
     logger.debug("status_info: %s", status_info)
     if not full_info:
         logger.info("end get_short_url_info_handler; not detail")
         return ORJSONResponse(
             status_info,
-            status_code=status.HTTP_200_OK)
+            status_code=status.HTTP_200_OK,
+            headers=headers)
 
-    detail = await slh_crud.get_detail_history(db=db, link_id=sl_obj.id, limit=max_result, offset=offset)
+    try:
+        after = decode_cursor(cursor, id_type=storage.history_id_type) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_CURSOR)
+    detail, next_cursor = await storage.get_history(
+        db, link_id=sl_obj.id, limit=max_result, offset=offset, after=after,
+    )
     logger.debug("len(detail): %s", len(detail))
-    detail_resp = ShortUrlInfoResponseDetail(
-        click_count=sl_obj.usages_count,
-        detail=detail
-    ).dict()
+    # Строки истории сериализуются как есть, без модели FullInfo на каждую; форма та же,
+    # что у ShortUrlInfoResponseDetail
+    detail_resp = {
+        **status_info,
+        "detail": [{"use_at": row.use_at, "client_ip": row.client_ip} for row in detail],
+        "next_cursor": encode_cursor(next_cursor) if next_cursor else None,
+    }
     logger.debug("detail_resp: %s", detail_resp)
     return ORJSONResponse(
         detail_resp,
-        status_code=status.HTTP_200_OK)
+        status_code=status.HTTP_200_OK,
+        headers=headers)
+
+
+def naive_utc(moment: datetime) -> datetime:
+    # В БД время хранится в UTC без часового пояса
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def get_short_url_timeseries_handler(
+        shorten_url_id: str,
+        db: AsyncSession,
+        bucket: str = Query(default="day", regex="^(minute|hour|day)$"),
+        since: Optional[datetime] = Query(default=None, alias="from"),
+        until: Optional[datetime] = Query(default=None, alias="to"),
+):
+    logger.info("start get_short_url_timeseries_handler; shorten_url_id: %s, bucket: %s", shorten_url_id, bucket)
+    until = naive_utc(until) if until else datetime.utcnow()
+    # Начало выравнивается по корзине, чтобы первая корзина была полной
+    if since is None:
+        since = until - BUCKET_SIZES[bucket] * TIMESERIES_DEFAULT_BUCKETS
+    since = bucket_start(naive_utc(since), bucket)
+    if since >= until:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=INVALID_TIME_RANGE)
+    if (until - since) / BUCKET_SIZES[bucket] > TIMESERIES_MAX_BUCKETS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"{INVALID_TIME_RANGE}: more than {TIMESERIES_MAX_BUCKETS} buckets",
+        )
+    if not link_filter.might_exist(shorten_url_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
+    sl_obj = await load_link(db, shorten_url_id)
+    if not sl_obj:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
+    points = await storage.get_timeseries(db, link_id=sl_obj.id, bucket=bucket, since=since, until=until)
+    resp = TimeseriesResponse(
+        bucket=bucket,
+        since=since,
+        until=until,
+        points=[{"bucket_start": start, "count": count} for start, count in points],
+    ).dict()
+    logger.info("end get_short_url_timeseries_handler; points: %s", len(points))
+    return ORJSONResponse(resp, status_code=status.HTTP_200_OK)
+
+
+async def export_short_url_history_handler(
+        shorten_url_id: str,
+        db: AsyncSession,
+        export_format: str = Query(default="ndjson", alias="format", regex="^(ndjson|csv)$"),
+        since: Optional[datetime] = Query(default=None, alias="from"),
+        until: Optional[datetime] = Query(default=None, alias="to"),
+):
+    logger.info(
+        "start export_short_url_history_handler; shorten_url_id: %s, format: %s", shorten_url_id, export_format,
+    )
+    if not link_filter.might_exist(shorten_url_id):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
+    sl_obj = await load_link(db, shorten_url_id)
+    if not sl_obj:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=LINK_NOT_FOUND)
+    # Сессия из зависимости закрывается после отправки ответа, поэтому курсор
+    # живёт, пока тело ответа не будет отдано целиком
+    batches = storage.stream_history(
+        db,
+        link_id=sl_obj.id,
+        since=naive_utc(since) if since else None,
+        until=naive_utc(until) if until else None,
+        batch_size=app_settings.history_export_batch_size,
+    )
+    return StreamingResponse(
+        encode_history(batches, export_format),
+        media_type=EXPORT_MEDIA_TYPES[export_format],
+        headers={"Content-Disposition": f'attachment; filename="{shorten_url_id}.{export_format}"'},
+    )
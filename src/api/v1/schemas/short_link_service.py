@@ -1,21 +1,38 @@
 from datetime import datetime
+from typing import Literal, Optional
 from uuid import UUID, uuid4
 
-from pydantic import BaseModel, validator, Field
+from pydantic import BaseModel, validator, Field, conint, conlist
 
 from api.v1.constants.contstants import HTTP_CHECK
-from core.config import ORIGINAL_URL_KEY, SHORT_URL, SHORT_ID
+from core.config import ORIGINAL_URL_KEY, SHORT_URL, SHORT_ID, BATCH_ERROR, BATCH_IDS_MAX_SIZE
+from core.config import CACHE_MAX_AGE_KEY, DEFAULT_REDIRECT_STATUS, REDIRECT_MAX_AGE_LIMIT, REDIRECT_STATUS_KEY
 
 
-class GetShotLinkRequest(BaseModel):
+def check_http_link(original_url: str) -> str:
+    if HTTP_CHECK not in original_url:
+        raise ValueError('the value must be an http link')
+    return original_url
+
+
+class RedirectPolicy(BaseModel):
+    """Политика редиректа создаваемой ссылки.
+
+    По умолчанию 307 без Cache-Control: каждый переход учитывается. 301/308 кешируются
+    браузерами (max-age по умолчанию - PERMANENT_REDIRECT_MAX_AGE), и повторные переходы
+    до сервера не доходят; cache-max-age разрешает кешировать и 307.
+    """
+    redirect_status: Literal[301, 307, 308] = Field(DEFAULT_REDIRECT_STATUS, alias=REDIRECT_STATUS_KEY)
+    cache_max_age: Optional[conint(ge=0, le=REDIRECT_MAX_AGE_LIMIT)] = Field(None, alias=CACHE_MAX_AGE_KEY)
+
+
+class GetShotLinkRequest(RedirectPolicy):
     """Класс запроса на получение укороченной ссылки"""
     original_url: str = Field(alias=ORIGINAL_URL_KEY)
 
     @validator('original_url')
     def check_value(cls, original_url):
-        if HTTP_CHECK not in original_url:
-            raise ValueError('the value must be an http link')
-        return original_url
+        return check_http_link(original_url)
 
     class Config:
         #  Позволяет возвращать alias, а в работе использовать "питонячее имя"
@@ -40,9 +57,17 @@ class ShotLinkResponse(ShortLinkBase):
         orm_mode = True
 
 
+class BatchUploadItem(RedirectPolicy):
+    """Элемент пачки ссылок; URL проверяется поэлементно при обработке пачки"""
+    original_url: str = Field(alias=ORIGINAL_URL_KEY)
+
+    class Config:
+        allow_population_by_field_name = True
+
+
 class GetShotLinksListRequest(BaseModel):
     """Класс запроса на получение укороченных ссылок пачками"""
-    __root__: list[GetShotLinkRequest]
+    __root__: list[BatchUploadItem]
 
 
 class ShortLinkCreate(BaseModel):
@@ -50,6 +75,8 @@ class ShortLinkCreate(BaseModel):
     original_link: str
     link_id: str
     short_link: str
+    redirect_status: int = DEFAULT_REDIRECT_STATUS
+    cache_max_age: Optional[int] = None
 
 
 class ShortLinkUpdate(BaseModel):
@@ -78,12 +105,69 @@ class ShortUrlInfoResponse(BaseModel):
     """Класс ответ а запрос статуса использования URL."""
 
     click_count: int
+    # Оценка HyperLogLog: за всё время или за дни since..until
+    unique_clients: int = 0
 
 
 class ShortUrlInfoResponseDetail(ShortUrlInfoResponse):
     """Класс ответ а запрос статуса использования URL с дополнительной информацией."""
 
     detail: list[FullInfo]
+    # Непрозрачный курсор следующей страницы, None - страниц больше нет
+    next_cursor: Optional[str] = None
+
+
+class ShortIdsBatchRequest(BaseModel):
+    """Класс запроса пакетных операций над ссылками: список short-id"""
+    __root__: conlist(str, min_items=1, max_items=BATCH_IDS_MAX_SIZE)
+
+
+class ShortUrlBatchStatusItem(BaseModel):
+    """Статус одной ссылки пачки: found, gone или not-found; для ненайденных переходов нет"""
+    short_id: str = Field(alias=SHORT_ID)
+    status: str
+    click_count: Optional[int] = None
+    unique_clients: Optional[int] = None
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class ShortUrlBatchStatusResponse(BaseModel):
+    """Класс ответа на пакетный запрос статуса ссылок"""
+
+    __root__: list[ShortUrlBatchStatusItem]
+
+
+class DeleteBatchItem(BaseModel):
+    """Результат удаления одной ссылки пачки: deleted, gone или not-found"""
+    short_id: str = Field(alias=SHORT_ID)
+    status: str
+
+    class Config:
+        allow_population_by_field_name = True
+
+
+class DeleteBatchResponse(BaseModel):
+    """Класс ответа на пакетное удаление ссылок"""
+
+    __root__: list[DeleteBatchItem]
+
+
+class TimeseriesPoint(BaseModel):
+    """Число переходов за корзину, начинающуюся в bucket_start"""
+
+    bucket_start: datetime
+    count: int
+
+
+class TimeseriesResponse(BaseModel):
+    """Класс ответа на запрос переходов по времени; пустые корзины не включаются"""
+
+    bucket: str
+    since: datetime
+    until: datetime
+    points: list[TimeseriesPoint]
 
 
 class DBConnStatusResponse(BaseModel):
@@ -98,10 +182,21 @@ class ShotLinksListCreate(BaseModel):
     __root__: list[ShortLinkCreate]
 
 
+class ShotLinkBatchResult(BaseModel):
+    """Результат обработки одного элемента пачки: короткая ссылка или ошибка"""
+    original_url: str = Field(alias=ORIGINAL_URL_KEY)
+    short_id: Optional[str] = Field(alias=SHORT_ID)
+    short_url: Optional[str] = Field(alias=SHORT_URL)
+    error: Optional[str] = Field(alias=BATCH_ERROR)
+
+    class Config:
+        allow_population_by_field_name = True
+
+
 class ShotLinksListResponse(BaseModel):
     """Класс ответа на запрос создания коротких ссылок пачками"""
 
-    __root__: list[ShotLinkResponse]
+    __root__: list[ShotLinkBatchResult]
 
     class Config:
         orm_mode = True
@@ -0,0 +1,85 @@
+"""Сравнение batch upload: RepositoryDB.update_multi против RepositoryDB.bulk_create.
+
+Нужна БД с применёнными миграциями (по умолчанию DATABASE_DSN из настроек).
+Запуск из каталога src:
+
+    python -m benchmarks.bench_batch_upload --sizes 1000 10000 30000
+
+update_multi перечитывает вставленное через WHERE link_id IN (...) с параметром на каждую
+ссылку, поэтому пачки больше ~32 тыс. упираются в лимит параметров asyncpg и сравниваются
+только для bulk_create (--bulk-only).
+"""
+import argparse
+import asyncio
+import time
+
+from shortuuid import ShortUUID
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.schemas.short_link_service import ShortLinkCreate, ShotLinksListCreate
+from core.config import LEN_SHORT_LINK, PROJECT_URL, app_settings
+from models.short_link import ShortLink
+from services.base import RepositoryDB
+
+sl_crud = RepositoryDB(ShortLink)
+shortuuid = ShortUUID()
+
+
+def make_rows(size: int) -> list[dict]:
+    rows = []
+    for i in range(size):
+        link_id = shortuuid.random(length=LEN_SHORT_LINK)
+        rows.append({
+            "original_link": f"https://example.com/page/{i}",
+            "link_id": link_id,
+            "short_link": f"{PROJECT_URL}{link_id}",
+        })
+    return rows
+
+
+async def run_update_multi(db: AsyncSession, rows: list[dict]) -> int:
+    objects_in = ShotLinksListCreate(__root__=[ShortLinkCreate(**row) for row in rows])
+    return len(await sl_crud.update_multi(db=db, objects_in=objects_in))
+
+
+async def run_bulk_create(db: AsyncSession, rows: list[dict]) -> int:
+    results = await sl_crud.bulk_create(db=db, rows=rows, chunk_size=app_settings.batch_insert_chunk_size)
+    return sum(error is None for error in results.values())
+
+
+async def main(dsn: str, sizes: list[int], repeat: int, bulk_only: bool) -> None:
+    engine = create_async_engine(dsn)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    print(f"{'size':>8} {'update_multi, s':>16} {'bulk_create, s':>16} {'speedup':>8}")
+    try:
+        for size in sizes:
+            timings = {}
+            candidates = [("update_multi", run_update_multi), ("bulk_create", run_bulk_create)]
+            for name, func in candidates[bulk_only:]:
+                best = float("inf")
+                for _ in range(repeat):
+                    rows = make_rows(size)
+                    async with session_factory() as db:
+                        started = time.perf_counter()
+                        created = await func(db, rows)
+                        best = min(best, time.perf_counter() - started)
+                    assert created == size, f"{name}: created {created} of {size}"
+                timings[name] = best
+            if bulk_only:
+                print(f"{size:>8} {'-':>16} {timings['bulk_create']:>16.3f} {'-':>8}")
+                continue
+            print(f"{size:>8} {timings['update_multi']:>16.3f} {timings['bulk_create']:>16.3f} "
+                  f"{timings['update_multi'] / timings['bulk_create']:>7.1f}x")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=app_settings.database_dsn)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 30000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--bulk-only", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.sizes, args.repeat, args.bulk_only))
@@ -0,0 +1,68 @@
+"""Микробенчмарк генераторов link_id.
+
+Сравнивает исходный способ (новый ShortUUID на каждую ссылку) с генераторами из
+services/id_generator.py. Для block нужна БД с применёнными миграциями (--dsn),
+без неё он пропускается. Запуск из каталога src:
+
+    python -m benchmarks.bench_id_generators --count 100000
+"""
+import argparse
+import asyncio
+import time
+from typing import Optional
+
+from shortuuid import ShortUUID
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.config import LEN_SHORT_LINK
+from services.id_generator import BlockSequenceIdGenerator, RandomIdGenerator, SnowflakeIdGenerator
+
+
+async def bench_generator(generator, db: Optional[AsyncSession], count: int, batch: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count // batch):
+        if batch == 1:
+            await generator.next_id(db)
+        else:
+            await generator.next_ids(db, batch)
+    return time.perf_counter() - started
+
+
+def bench_original(count: int) -> float:
+    started = time.perf_counter()
+    for _ in range(count):
+        ShortUUID().random(length=LEN_SHORT_LINK)
+    return time.perf_counter() - started
+
+
+def report(name: str, count: int, seconds: float, baseline: float) -> None:
+    print(f"{name:<28} {count / seconds:>14,.0f} ids/s {baseline / seconds:>8.1f}x")
+
+
+async def main(count: int, dsn: Optional[str]) -> None:
+    baseline = bench_original(count)
+    report("ShortUUID() per id (old)", count, baseline, baseline)
+    for batch in (1, 1000):
+        report(f"random, batch={batch}", count,
+               await bench_generator(RandomIdGenerator(LEN_SHORT_LINK), None, count, batch), baseline)
+        report(f"snowflake, batch={batch}", count,
+               await bench_generator(SnowflakeIdGenerator(worker_id=1), None, count, batch), baseline)
+    if not dsn:
+        return
+    engine = create_async_engine(dsn)
+    try:
+        async with sessionmaker(engine, class_=AsyncSession)() as db:
+            for batch in (1, 1000):
+                report(f"block, batch={batch}", count,
+                       await bench_generator(BlockSequenceIdGenerator(), db, count, batch), baseline)
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--dsn", default=None)
+    args = parser.parse_args()
+    asyncio.run(main(args.count, args.dsn))
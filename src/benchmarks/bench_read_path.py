@@ -0,0 +1,118 @@
+"""Горячие чтения: ORM-объекты против колонок Core с заранее собранными выражениями.
+
+Сравнивает чтение ссылки по link_id и страницы истории с сериализацией, как в /status?full-info:
+прежний путь (select(Model), ORM-объекты в identity map, FullInfo на каждую строку) и
+RepositoryDB.get_for_shorten_url / get_detail_history со списком колонок. Печатает
+операции в секунду и пик выделенной памяти на операцию (tracemalloc).
+
+Нужна БД с применёнными миграциями (по умолчанию DATABASE_DSN из настроек); ссылка
+и её история создаются бенчмарком. Запуск из каталога src:
+
+    python -m benchmarks.bench_read_path --requests 2000 --page 100
+"""
+import argparse
+import asyncio
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable
+
+from shortuuid import ShortUUID
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.schemas.short_link_service import FullInfo, ShortUrlInfoResponseDetail
+from core.config import LEN_SHORT_LINK, app_settings
+from models.short_link import ShortLink, ShortLinkHistory
+from services.base import RepositoryDB
+from services.storage.postgres import HISTORY_COLUMNS, LINK_COLUMNS
+
+links = RepositoryDB(ShortLink)
+history = RepositoryDB(ShortLinkHistory)
+
+
+async def orm_link(db: AsyncSession, link_id: str) -> None:
+    (await db.execute(select(ShortLink).where(ShortLink.link_id == link_id))).scalar_one()
+
+
+async def core_link(db: AsyncSession, link_id: str) -> None:
+    await links.get_for_shorten_url(db, link_id, columns=LINK_COLUMNS)
+
+
+async def orm_history(db: AsyncSession, link: ShortLink, page: int) -> dict:
+    statement = (
+        select(ShortLinkHistory)
+        .where(ShortLinkHistory.short_link_id == link.id)
+        .order_by(ShortLinkHistory.use_at, ShortLinkHistory.id)
+        .limit(page + 1)
+    )
+    rows = (await db.execute(statement)).scalars().all()[:page]
+    return ShortUrlInfoResponseDetail(click_count=0, detail=[FullInfo.from_orm(row) for row in rows]).dict()
+
+
+async def core_history(db: AsyncSession, link: ShortLink, page: int) -> dict:
+    rows, _ = await history.get_detail_history(db, link_id=link.id, columns=HISTORY_COLUMNS, limit=page)
+    return {"click_count": 0, "detail": [{"use_at": row.use_at, "client_ip": row.client_ip} for row in rows]}
+
+
+async def measure(session_factory, requests: int, call: Callable[[AsyncSession], Awaitable]) -> tuple[float, float]:
+    """Операций в секунду и пик памяти одной операции в КиБ; сессия новая на операцию, как на запрос"""
+    for _ in range(10):
+        async with session_factory() as db:
+            await call(db)
+    started = time.perf_counter()
+    for _ in range(requests):
+        async with session_factory() as db:
+            await call(db)
+    seconds = time.perf_counter() - started
+    tracemalloc.start()
+    async with session_factory() as db:
+        await call(db)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return requests / seconds, peak / 1024
+
+
+async def main(dsn: str, requests: int, page: int) -> None:
+    engine = create_async_engine(dsn)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    link_id = ShortUUID().random(length=LEN_SHORT_LINK)
+    try:
+        async with session_factory() as db:
+            link = ShortLink(original_link="https://example.com/bench", link_id=link_id)
+            db.add(link)
+            await db.flush()
+            moment = datetime.utcnow()
+            db.add_all(
+                ShortLinkHistory(
+                    short_link_id=link.id, client_raw=f"127.0.0.1:{i}", use_at=moment - timedelta(seconds=i),
+                )
+                for i in range(page)
+            )
+            await db.commit()
+
+        print(f"{'read':<10} {'orm, req/s':>12} {'core, req/s':>12} {'speedup':>8} {'orm, KiB':>9} {'core, KiB':>9}")
+        for name, old, new in (
+                ("link", lambda db: orm_link(db, link_id), lambda db: core_link(db, link_id)),
+                ("history", lambda db: orm_history(db, link, page), lambda db: core_history(db, link, page)),
+        ):
+            old_rate, old_peak = await measure(session_factory, requests, old)
+            new_rate, new_peak = await measure(session_factory, requests, new)
+            print(f"{name:<10} {old_rate:>12,.0f} {new_rate:>12,.0f} {new_rate / old_rate:>7.1f}x "
+                  f"{old_peak:>9.1f} {new_peak:>9.1f}")
+    finally:
+        # История удаляется каскадом в БД
+        async with session_factory() as db:
+            await db.execute(delete(ShortLink).where(ShortLink.link_id == link_id))
+            await db.commit()
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dsn", default=app_settings.database_dsn)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--page", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(main(args.dsn, args.requests, args.page))
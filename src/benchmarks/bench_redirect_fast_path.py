@@ -0,0 +1,84 @@
+"""Пропускная способность редиректа: ASGI fast path против маршрута FastAPI.
+
+Приложение вызывается напрямую как ASGI-callable на одном ядре, без сети и сервера,
+поэтому меряется только стоимость HTTP-слоя. Ссылка заранее лежит в кеше, а запись
+переходов отключена, так что БД не нужна. Запуск из каталога src:
+
+    python -m benchmarks.bench_redirect_fast_path --requests 20000
+"""
+import argparse
+import asyncio
+import time
+import uuid
+
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+
+from api.v1.endpoints import short_link_service
+from api.v1.handlers.short_link_service import click_recorder, link_cache
+from main import app as fast_path_app
+from services.cache import LinkCacheEntry
+
+LINK_ID = "benchlink1"
+
+
+def make_scope(path: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"host", b"bench")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+
+
+async def receive() -> dict:
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def run(app, requests: int) -> float:
+    statuses = []
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.start":
+            statuses.append(message["status"])
+
+    scope = make_scope(f"/api/v1/{LINK_ID}")
+    started = time.perf_counter()
+    for _ in range(requests):
+        await app(dict(scope), receive, send)
+    elapsed = time.perf_counter() - started
+    assert set(statuses) == {307}, set(statuses)
+    return requests / elapsed
+
+
+async def noop_record(event) -> None:
+    return None
+
+
+async def main(requests: int) -> None:
+    routed_app = FastAPI(default_response_class=ORJSONResponse)
+    routed_app.include_router(short_link_service.router, prefix='/api/v1')
+
+    link_cache.put(LINK_ID, LinkCacheEntry(uuid.uuid4(), "https://example.com/landing", True))
+    # Меряем HTTP-слой: переходы никуда не пишем
+    click_recorder.record = noop_record
+
+    for name, app in (("FastAPI route", routed_app), ("ASGI fast path", fast_path_app)):
+        await run(app, requests // 10)  # прогрев
+        rps = await run(app, requests)
+        print(f"{name:<16} {rps:>10,.0f} req/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
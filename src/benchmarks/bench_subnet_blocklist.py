@@ -0,0 +1,77 @@
+"""Стоимость проверки адреса клиента по чёрному списку подсетей в зависимости от его размера.
+
+Сравнивает SubnetTrie с линейным перебором ip_network (его время растёт с числом
+подсетей, поэтому он меряется только до --linear-max). Списки - случайные подсети
+IPv4 /8../32 и IPv6 /16../64 пополам, адреса - наполовину из списка, наполовину
+случайные. БД не нужна. Запуск из каталога src:
+
+    python -m benchmarks.bench_subnet_blocklist --sizes 100 1000 10000 100000
+"""
+import argparse
+import ipaddress
+import random
+import time
+
+from services.subnets import SubnetTrie
+
+
+def make_networks(rng: random.Random, size: int) -> list:
+    networks = []
+    for _ in range(size):
+        if rng.random() < 0.5:
+            networks.append(ipaddress.IPv4Network((rng.getrandbits(32), rng.randint(8, 32)), strict=False))
+        else:
+            networks.append(ipaddress.IPv6Network((rng.getrandbits(128), rng.randint(16, 64)), strict=False))
+    return networks
+
+
+def make_hosts(rng: random.Random, networks: list, count: int) -> list[str]:
+    hosts = []
+    for i in range(count):
+        if i % 2:
+            network = rng.choice(networks)
+            hosts.append(str(network[rng.randrange(min(network.num_addresses, 2 ** 32))]))
+        elif rng.random() < 0.5:
+            hosts.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+        else:
+            hosts.append(str(ipaddress.IPv6Address(rng.getrandbits(128))))
+    return hosts
+
+
+def bench_trie(trie: SubnetTrie, hosts: list[str]) -> float:
+    started = time.perf_counter()
+    for host in hosts:
+        host in trie
+    return (time.perf_counter() - started) / len(hosts)
+
+
+def bench_linear(networks: list, hosts: list[str]) -> float:
+    started = time.perf_counter()
+    for host in hosts:
+        address = ipaddress.ip_address(host)
+        any(address in network for network in networks)
+    return (time.perf_counter() - started) / len(hosts)
+
+
+def main(sizes: list[int], lookups: int, linear_max: int, seed: int) -> None:
+    rng = random.Random(seed)
+    print(f"{'subnets':>8} {'build, s':>9} {'trie, us':>9} {'linear, us':>11}")
+    for size in sizes:
+        networks = make_networks(rng, size)
+        hosts = make_hosts(rng, networks, lookups)
+        started = time.perf_counter()
+        trie = SubnetTrie(networks)
+        build = time.perf_counter() - started
+        trie_us = bench_trie(trie, hosts) * 1e6
+        linear = f"{bench_linear(networks, hosts[:1000]) * 1e6:>11.2f}" if size <= linear_max else f"{'-':>11}"
+        print(f"{size:>8} {build:>9.3f} {trie_us:>9.2f} {linear}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--lookups", type=int, default=100000)
+    parser.add_argument("--linear-max", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    main(args.sizes, args.lookups, args.linear_max, args.seed)
@@ -0,0 +1,322 @@
+"""Набор нагрузочных бенчмарков сервиса.
+
+Прогоняет нагрузки из benchmarks/workloads.py (редиректы по Ципфу, batch upload разных
+размеров, глубокая пагинация /status?full-info) и сохраняет пропускную способность и
+задержки p50/p95/p99 в JSON для сравнения между коммитами. Нужна БД с применёнными
+миграциями (или STORAGE_BACKEND=memory - без БД, для проверки самого набора). Запуск из каталога src:
+
+    # в процессе, через ASGI-транспорт httpx
+    python -m benchmarks.suite --target asgi --out results.json
+    # против отдельно поднятого uvicorn (или --target uvicorn, чтобы поднять его здесь)
+    python -m benchmarks.suite --target http://127.0.0.1:8080
+    # записать определения нагрузок и потом воспроизвести их
+    python -m benchmarks.suite --record requests.jsonl --record-only
+    python -m benchmarks.suite --replay requests.jsonl --compare results.json
+"""
+import argparse
+import asyncio
+import platform
+import random
+import subprocess
+import sys
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import AsyncIterator, Iterable, Optional
+
+import httpx
+import orjson
+
+from benchmarks.workloads import (
+    API_PREFIX,
+    DEFAULT_WORKLOADS,
+    BatchUploadWorkload,
+    DeepPagingWorkload,
+    RedirectWorkload,
+    RequestSpec,
+    Workload,
+    batch_upload_requests,
+    load_workloads,
+    original_urls,
+    redirect_requests,
+    save_workloads,
+)
+from core.config import SHORT_ID, app_settings
+
+SETUP_BATCH_SIZE = 1000
+
+
+class Target:
+    """Тестируемое приложение: HTTP-клиент к нему и способ дождаться записи переходов"""
+
+    def __init__(self, name: str, client: httpx.AsyncClient):
+        self.name = name
+        self.client = client
+
+    async def flush_clicks(self) -> None:
+        await asyncio.sleep(app_settings.click_flush_interval * 2 + 0.5)
+
+
+class AsgiTarget(Target):
+    async def flush_clicks(self) -> None:
+        from api.v1.handlers.short_link_service import click_recorder
+
+        # stop() дописывает очередь целиком, после чего запись продолжается как обычно
+        await click_recorder.stop()
+        await click_recorder.start()
+
+
+@asynccontextmanager
+async def open_target(target: str, port: int) -> AsyncIterator[Target]:
+    timeout = httpx.Timeout(60.0)
+    limits = httpx.Limits(max_connections=256, max_keepalive_connections=256)
+    if target == "asgi":
+        from main import app
+
+        await app.router.startup()
+        try:
+            async with httpx.AsyncClient(app=app, base_url="http://bench", timeout=timeout) as client:
+                yield AsgiTarget(target, client)
+        finally:
+            await app.router.shutdown()
+        return
+    if target == "uvicorn":
+        process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--no-access-log"],
+        )
+        base_url = f"http://127.0.0.1:{port}"
+        try:
+            async with httpx.AsyncClient(base_url=base_url, timeout=timeout, limits=limits) as client:
+                await wait_until_up(client)
+                yield Target(target, client)
+        finally:
+            process.terminate()
+            process.wait()
+        return
+    async with httpx.AsyncClient(base_url=target, timeout=timeout, limits=limits) as client:
+        yield Target(target, client)
+
+
+async def wait_until_up(client: httpx.AsyncClient, attempts: int = 100) -> None:
+    for _ in range(attempts):
+        try:
+            await client.get(f"{API_PREFIX}/ping")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("application did not start")
+
+
+def percentile(sorted_values: list[float], share: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(share * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def summarize(name: str, latencies: list[float], errors: int, elapsed: float, **extra) -> dict:
+    ordered = sorted(latencies)
+    return {
+        "name": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        "p50_ms": round(percentile(ordered, 0.50) * 1000, 3),
+        "p95_ms": round(percentile(ordered, 0.95) * 1000, 3),
+        "p99_ms": round(percentile(ordered, 0.99) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else 0.0,
+        **extra,
+    }
+
+
+async def run_requests(
+        client: httpx.AsyncClient,
+        specs: Iterable[RequestSpec],
+        *,
+        concurrency: int,
+        ok_statuses: frozenset[int],
+) -> tuple[list[float], int, float]:
+    """Выполняет запросы в concurrency параллельных потоков; возвращает задержки успешных, число ошибок и время"""
+    iterator = iter(specs)
+    latencies: list[float] = []
+    errors = 0
+
+    async def worker() -> None:
+        nonlocal errors
+        for spec in iterator:
+            started = time.perf_counter()
+            try:
+                response = await client.request(spec.method, spec.path, json=spec.json)
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            if response.status_code in ok_statuses:
+                latencies.append(time.perf_counter() - started)
+            else:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - started
+
+
+async def create_links(client: httpx.AsyncClient, count: int, seed: int) -> list[str]:
+    rng = random.Random(seed)
+    link_ids: list[str] = []
+    while len(link_ids) < count:
+        size = min(SETUP_BATCH_SIZE, count - len(link_ids))
+        response = await client.post(f"{API_PREFIX}/batch-upload", json=original_urls(size, rng))
+        response.raise_for_status()
+        link_ids.extend(item[SHORT_ID] for item in response.json() if item[SHORT_ID])
+    return link_ids
+
+
+async def run_redirect(target: Target, workload: RedirectWorkload) -> list[dict]:
+    link_ids = await create_links(target.client, workload.links, workload.seed)
+    latencies, errors, elapsed = await run_requests(
+        target.client,
+        redirect_requests(workload, link_ids),
+        concurrency=workload.concurrency,
+        ok_statuses=frozenset({307}),
+    )
+    return [summarize(workload.name, latencies, errors, elapsed, concurrency=workload.concurrency)]
+
+
+async def run_batch_upload(target: Target, workload: BatchUploadWorkload) -> list[dict]:
+    results = []
+    for size in workload.sizes:
+        latencies, errors, elapsed = await run_requests(
+            target.client,
+            batch_upload_requests(workload, size),
+            concurrency=1,
+            ok_statuses=frozenset({201}),
+        )
+        results.append(summarize(
+            f"{workload.name}[{size}]", latencies, errors, elapsed,
+            urls_per_s=round(size * len(latencies) / elapsed, 1) if elapsed else 0.0,
+        ))
+    return results
+
+
+async def run_deep_paging(target: Target, workload: DeepPagingWorkload) -> list[dict]:
+    (link_id,) = await create_links(target.client, 1, workload.seed)
+    await run_requests(
+        target.client,
+        (RequestSpec("GET", f"{API_PREFIX}/{link_id}") for _ in range(workload.clicks)),
+        concurrency=64,
+        ok_statuses=frozenset({307}),
+    )
+    await target.flush_clicks()
+    status_path = f"{API_PREFIX}/{link_id}/status"
+    base_params = {"full-info": "true", "max-result": workload.page_size}
+
+    # Курсор: каждая следующая страница зависит от предыдущей, поэтому обход последовательный
+    latencies: list[float] = []
+    errors = 0
+    cursor: Optional[str] = None
+    started = time.perf_counter()
+    for _ in range(workload.pages):
+        params = dict(base_params, **({"cursor": cursor} if cursor else {}))
+        request_started = time.perf_counter()
+        response = await target.client.get(status_path, params=params)
+        if response.status_code != 200:
+            errors += 1
+            break
+        latencies.append(time.perf_counter() - request_started)
+        cursor = response.json().get("next_cursor")
+        if not cursor:
+            break
+    cursor_result = summarize(
+        f"{workload.name}[cursor]", latencies, errors, time.perf_counter() - started,
+        first_page_ms=round(latencies[0] * 1000, 3) if latencies else 0.0,
+        last_page_ms=round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    )
+
+    offset_specs = [
+        RequestSpec("GET", f"{status_path}?full-info=true&max-result={workload.page_size}"
+                           f"&offset={page * workload.page_size}")
+        for page in range(len(latencies) or workload.pages)
+    ]
+    latencies, errors, elapsed = await run_requests(
+        target.client, offset_specs, concurrency=1, ok_statuses=frozenset({200}),
+    )
+    offset_result = summarize(
+        f"{workload.name}[offset]", latencies, errors, elapsed,
+        first_page_ms=round(latencies[0] * 1000, 3) if latencies else 0.0,
+        last_page_ms=round(latencies[-1] * 1000, 3) if latencies else 0.0,
+    )
+    return [cursor_result, offset_result]
+
+
+RUNNERS = {
+    "redirect": run_redirect,
+    "batch_upload": run_batch_upload,
+    "deep_paging": run_deep_paging,
+}
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True, stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_results(results: list[dict], previous: Optional[dict]) -> None:
+    previous_by_name = {result["name"]: result for result in (previous or {}).get("results", [])}
+    print(f"{'workload':<26} {'req/s':>10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>7}  vs previous")
+    for result in results:
+        line = (f"{result['name']:<26} {result['throughput_rps']:>10.1f} {result['p50_ms']:>9.2f} "
+                f"{result['p95_ms']:>9.2f} {result['p99_ms']:>9.2f} {result['errors']:>7}")
+        before = previous_by_name.get(result["name"])
+        if before and before["throughput_rps"] and before["p99_ms"]:
+            line += (f"  rps {result['throughput_rps'] / before['throughput_rps'] - 1:+.1%}, "
+                     f"p99 {result['p99_ms'] / before['p99_ms'] - 1:+.1%}")
+        print(line)
+
+
+async def main(args: argparse.Namespace) -> None:
+    workloads: list[Workload] = load_workloads(args.replay) if args.replay else list(DEFAULT_WORKLOADS)
+    if args.only:
+        workloads = [workload for workload in workloads if workload.name in args.only]
+    if args.record:
+        save_workloads(args.record, workloads)
+        if args.record_only:
+            return
+
+    results: list[dict] = []
+    async with open_target(args.target, args.port) as target:
+        for workload in workloads:
+            results.extend(await RUNNERS[workload.kind](target, workload))
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "created_at": datetime.utcnow().isoformat(),
+            "target": args.target,
+            "python": platform.python_version(),
+            "workloads": [workload.dict() for workload in workloads],
+        },
+        "results": results,
+    }
+    with open(args.out, "wb") as file:
+        file.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+    previous = None
+    if args.compare:
+        with open(args.compare, "rb") as file:
+            previous = orjson.loads(file.read())
+    print_results(results, previous)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--target", default="asgi", help="asgi, uvicorn or base URL of a running service")
+    parser.add_argument("--port", type=int, default=8765, help="port for --target uvicorn")
+    parser.add_argument("--out", default="bench-results.json")
+    parser.add_argument("--compare", help="previous results JSON to compare with")
+    parser.add_argument("--replay", help="JSONL with workload definitions to run instead of the defaults")
+    parser.add_argument("--record", help="save workload definitions to this JSONL")
+    parser.add_argument("--record-only", action="store_true")
+    parser.add_argument("--only", nargs="+", help="run only workloads with these names")
+    asyncio.run(main(parser.parse_args()))
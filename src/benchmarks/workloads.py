@@ -0,0 +1,101 @@
+"""Описания нагрузок для набора бенчмарков.
+
+Нагрузка - это определение с зерном генератора, а не записанные запросы: идентификаторы
+ссылок появляются только при подготовке данных, поэтому при воспроизведении из
+requests.jsonl трафик заново генерируется из того же определения и даёт ту же картину.
+"""
+import bisect
+import itertools
+import random
+from typing import Annotated, Iterator, Literal, NamedTuple, Optional, Union
+
+import orjson
+from pydantic import BaseModel, Field, parse_obj_as
+
+from core.config import ORIGINAL_URL_KEY
+
+API_PREFIX = "/api/v1"
+
+
+class RequestSpec(NamedTuple):
+    method: str
+    path: str
+    json: Optional[object] = None
+
+
+class RedirectWorkload(BaseModel):
+    """Редиректы с распределением Ципфа по ссылкам: немногие ссылки получают большую часть трафика"""
+    kind: Literal["redirect"] = "redirect"
+    name: str = "redirect-zipf"
+    links: int = 1000
+    requests: int = 20000
+    zipf_s: float = 1.1
+    concurrency: int = 32
+    seed: int = 1
+
+
+class BatchUploadWorkload(BaseModel):
+    """Batch upload пачками разного размера"""
+    kind: Literal["batch_upload"] = "batch_upload"
+    name: str = "batch-upload"
+    sizes: list[int] = [10, 100, 1000, 10000]
+    repeat: int = 5
+    seed: int = 1
+
+
+class DeepPagingWorkload(BaseModel):
+    """Последовательный обход /status?full-info до глубоких страниц: курсором и через offset"""
+    kind: Literal["deep_paging"] = "deep_paging"
+    name: str = "deep-paging"
+    clicks: int = 20000
+    page_size: int = 100
+    pages: int = 100
+    seed: int = 1
+
+
+Workload = Annotated[Union[RedirectWorkload, BatchUploadWorkload, DeepPagingWorkload], Field(discriminator="kind")]
+
+
+DEFAULT_WORKLOADS: list[Workload] = [RedirectWorkload(), BatchUploadWorkload(), DeepPagingWorkload()]
+
+
+def zipf_sampler(count: int, s: float, rng: random.Random):
+    """Возвращает функцию, выдающую индекс в [0, count) с вероятностью ~ 1 / (rank + 1) ** s"""
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) ** s for rank in range(count)))
+    total = cum_weights[-1]
+
+    def sample() -> int:
+        return bisect.bisect_left(cum_weights, rng.random() * total)
+
+    return sample
+
+
+def original_urls(count: int, rng: random.Random) -> list[dict]:
+    return [{ORIGINAL_URL_KEY: f"https://example.com/{rng.getrandbits(64):x}/{i}"} for i in range(count)]
+
+
+def redirect_requests(workload: RedirectWorkload, link_ids: list[str]) -> Iterator[RequestSpec]:
+    rng = random.Random(workload.seed)
+    # Ранги популярности не совпадают с порядком создания ссылок
+    ranked = link_ids[:]
+    rng.shuffle(ranked)
+    sample = zipf_sampler(len(ranked), workload.zipf_s, rng)
+    for _ in range(workload.requests):
+        yield RequestSpec("GET", f"{API_PREFIX}/{ranked[sample()]}")
+
+
+def batch_upload_requests(workload: BatchUploadWorkload, size: int) -> Iterator[RequestSpec]:
+    rng = random.Random(workload.seed * 1_000_003 + size)
+    for _ in range(workload.repeat):
+        yield RequestSpec("POST", f"{API_PREFIX}/batch-upload", original_urls(size, rng))
+
+
+def save_workloads(path: str, workloads: list[Workload]) -> None:
+    with open(path, "wb") as file:
+        for workload in workloads:
+            file.write(orjson.dumps(workload.dict()) + b"\n")
+
+
+def load_workloads(path: str) -> list[Workload]:
+    with open(path, "rb") as file:
+        return [parse_obj_as(Workload, orjson.loads(line)) for line in file if line.strip()]
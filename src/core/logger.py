@@ -1,3 +1,14 @@
+import atexit
+import copy
+import logging
+import queue
+import random
+from logging import config as logging_config
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+import orjson
+
 LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 LOG_DEFAULT_HANDLERS = ['console', ]
 
@@ -60,3 +71,116 @@ LOGGING = {
         'handlers': LOG_DEFAULT_HANDLERS,
     },
 }
+
+
+class JsonFormatter(logging.Formatter):
+    """Структурированный формат: одна JSON-строка на запись"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if record.exc_info:
+            entry['exc_info'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exc_info'] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей ниже WARNING; предупреждения и ошибки - всегда"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.WARNING or random.random() < self.rate
+
+
+class _LoopSafeQueueHandler(QueueHandler):
+    """Кладёт запись в очередь, склеив только сообщение; форматирование и вывод - в потоке слушателя"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _AccessQueueHandler(QueueHandler):
+    """Записи uvicorn.access кладутся в очередь с args: их разбирает AccessFormatter, а там только строки и числа"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return copy.copy(record)
+
+
+_listeners: list[QueueListener] = []
+_atexit_registered = False
+
+
+def _stop_listeners() -> None:
+    while _listeners:
+        _listeners.pop().stop()
+
+
+def _move_behind_queue(
+        logger: logging.Logger, handler_class: type[QueueHandler], sample_rate: float,
+) -> QueueListener:
+    """Заменяет обработчики логгера одним QueueHandler; сами обработчики работают в потоке слушателя"""
+    handlers = list(logger.handlers)
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = handler_class(log_queue)
+    if sample_rate < 1.0:
+        queue_handler.addFilter(SamplingFilter(sample_rate))
+    for handler in handlers:
+        logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+def setup_logging(
+        *,
+        mode: str = 'dev',
+        level: str = 'INFO',
+        levels: Optional[dict[str, str]] = None,
+        sample_rate: float = 1.0,
+        json_format: bool = False,
+) -> None:
+    """Применяет настройки логирования один раз на процесс.
+
+    dev - исходная конфигурация LOGGING: всё вплоть до DEBUG синхронно в консоль.
+    prod - уровни из настроек, сэмплирование записей ниже WARNING, опционально JSON,
+    а вывод в консоль вынесен из event loop в потоки QueueListener - и для корневого
+    логгера, и для uvicorn.access, у которого свой обработчик и propagate=False.
+    """
+    global _atexit_registered
+    if mode == 'dev':
+        logging_config.dictConfig(LOGGING)
+        return
+    config = copy.deepcopy(LOGGING)
+    config['formatters']['json'] = {'()': JsonFormatter}
+    config['handlers']['console']['formatter'] = 'json' if json_format else 'verbose'
+    config['handlers']['console']['level'] = 'NOTSET'
+    config['loggers']['']['level'] = level
+    config['root']['level'] = level
+    config['loggers']['uvicorn.access']['level'] = level
+    for name, module_level in (levels or {}).items():
+        config['loggers'].setdefault(name, {})['level'] = module_level
+    logging_config.dictConfig(config)
+
+    _stop_listeners()
+    _listeners.append(_move_behind_queue(logging.getLogger(), _LoopSafeQueueHandler, sample_rate))
+    _listeners.append(_move_behind_queue(logging.getLogger('uvicorn.access'), _AccessQueueHandler, sample_rate))
+    # Повторный вызов заменяет слушателей, а остановка при выходе регистрируется один раз
+    if not _atexit_registered:
+        atexit.register(_stop_listeners)
+        _atexit_registered = True
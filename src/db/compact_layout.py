@@ -0,0 +1,162 @@
+"""Переход на компактное хранение ссылок и истории переходов.
+
+Между миграциями f5a8c3d1e927 (expand) и 2b9e4f7a1c38 (contract) переводит в новый
+формат уже существующие строки истории: выдаёт bigint id из последовательности и
+раскладывает client_ip на inet и порт (это делает триггер при UPDATE). Хранимый
+short_link не обнуляется: старый код ещё отдаёт его, а contract удаляет колонку целиком.
+Строка client_ip тоже остаётся до contract - её читает старый код; после выкладки
+нового кода (он читает client_host и порт) её обнуляет команда cleanup.
+Идёт короткими транзакциями по batch-size строк с паузой между ними, поэтому сервис
+продолжает работать; прерванный запуск можно просто повторить.
+
+Отчёт о размерах таблиц и индексов (сумма по секциям) и средней ширине строки
+сохраняется в JSON и сравнивается с сохранённым ранее. Запуск из каталога src:
+
+    python -m db.compact_layout report --out before.json
+    python -m db.compact_layout backfill --batch-size 5000 --pause 0.05
+    alembic upgrade head
+    python -m db.compact_layout cleanup --batch-size 5000 --pause 0.05
+    python -m db.compact_layout report --baseline before.json
+
+Размер на диске уменьшается только после VACUUM FULL или pg_repack по секциям:
+до этого освободившееся место переиспользуется новыми строками, а средняя ширина
+строки показывает выигрыш сразу.
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+
+import orjson
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.short_links_db_base import async_session
+
+logger = logging.getLogger(__name__)
+
+TABLES = ('short_link', 'short_link_history')
+
+HISTORY_BATCH = text(
+    'WITH batch AS ('
+    ' SELECT id, use_at FROM short_link_history'
+    ' WHERE use_at >= :since AND seq_id IS NULL'
+    ' ORDER BY use_at LIMIT :batch_size FOR UPDATE SKIP LOCKED'
+    ') '
+    "UPDATE short_link_history h SET seq_id = nextval('short_link_history_id_seq'), client_ip = h.client_ip "
+    'FROM batch WHERE h.id = batch.id AND h.use_at = batch.use_at '
+    'RETURNING h.use_at'
+)
+# После contract id - bigint из последовательности, поэтому строки перебираются диапазонами id по первичному ключу
+MAX_HISTORY_ID = text('SELECT max(id) FROM short_link_history')
+CLEANUP_BATCH = text(
+    'UPDATE short_link_history SET client_ip = NULL '
+    'WHERE id > :after AND id <= :until AND client_host IS NOT NULL AND client_ip IS NOT NULL'
+)
+
+# Секции (или сама таблица, если она не секционирована) и их размеры
+RELATION_SIZES = text(
+    'SELECT coalesce(sum(pg_relation_size(relid)), 0), coalesce(sum(pg_indexes_size(relid)), 0),'
+    ' coalesce(sum(pg_total_relation_size(relid)), 0), coalesce(sum(c.reltuples) FILTER (WHERE c.reltuples > 0), 0) '
+    'FROM pg_partition_tree(CAST(:table AS regclass)) t JOIN pg_class c ON c.oid = t.relid '
+    'WHERE t.isleaf'
+)
+
+
+async def backfill_history(session: AsyncSession, *, batch_size: int, pause: float) -> int:
+    """Выдаёт bigint id и раскладывает client_ip у строк истории, записанных до expand"""
+    since, total = datetime.min, 0
+    while True:
+        # Строки идут по индексу use_at; уже обработанные на границе пачки отсекает seq_id IS NULL
+        rows = (await session.execute(HISTORY_BATCH, {'since': since, 'batch_size': batch_size})).scalars().all()
+        await session.commit()
+        if not rows:
+            return total
+        since, total = max(rows), total + len(rows)
+        logger.info('Backfilled %d history rows (up to %s)', total, since)
+        await asyncio.sleep(pause)
+
+
+async def cleanup_history(session: AsyncSession, *, batch_size: int, pause: float) -> int:
+    """Обнуляет client_ip строк, уже разложенных на client_host и порт; запускается после contract"""
+    last = (await session.execute(MAX_HISTORY_ID)).scalar() or 0
+    after, total = 0, 0
+    while after < last:
+        total += (await session.execute(CLEANUP_BATCH, {'after': after, 'until': after + batch_size})).rowcount
+        await session.commit()
+        after += batch_size
+        logger.info('Cleaned up %d history rows (up to id %d of %d)', total, min(after, last), last)
+        await asyncio.sleep(pause)
+    return total
+
+
+async def collect_report(session: AsyncSession, *, sample_percent: float) -> dict:
+    """Размеры таблиц и индексов по всем секциям и средняя ширина строки по выборке"""
+    report = {'collected_at': datetime.utcnow().isoformat(), 'tables': {}}
+    for table in TABLES:
+        heap, indexes, total, rows = (await session.execute(RELATION_SIZES, {'table': table})).one()
+        # TABLESAMPLE читает sample_percent страниц, а не всю таблицу
+        row_width = (await session.execute(text(
+            f'SELECT avg(pg_column_size(t.*)) FROM {table} t TABLESAMPLE SYSTEM (:percent)'
+        ), {'percent': sample_percent})).scalar()
+        report['tables'][table] = {
+            'heap_bytes': int(heap),
+            'index_bytes': int(indexes),
+            'toast_bytes': int(total - heap - indexes),
+            'total_bytes': int(total),
+            'rows_estimate': int(rows),
+            'avg_row_bytes': round(float(row_width), 1) if row_width is not None else None,
+        }
+    await session.commit()
+    return report
+
+
+def format_report(report: dict, baseline: Optional[dict] = None) -> str:
+    lines = []
+    for table, sizes in report['tables'].items():
+        lines.append(table)
+        before = (baseline or {}).get('tables', {}).get(table, {})
+        for key, value in sizes.items():
+            line = f'  {key:<14} {value if value is not None else "-":>14}'
+            old = before.get(key)
+            if old and value is not None:
+                line += f'  was {old:>14}  {(value - old) / old:+.1%}'
+            lines.append(line)
+    return '\n'.join(lines)
+
+
+async def main(args: argparse.Namespace) -> None:
+    async with async_session() as session:
+        if args.command == 'backfill':
+            history = await backfill_history(session, batch_size=args.batch_size, pause=args.pause)
+            print(f'backfilled {history} history rows')
+        elif args.command == 'cleanup':
+            history = await cleanup_history(session, batch_size=args.batch_size, pause=args.pause)
+            print(f'cleaned up {history} history rows')
+        report = await collect_report(session, sample_percent=args.sample_percent)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'rb') as file:
+            baseline = orjson.loads(file.read())
+    print(format_report(report, baseline))
+    if args.out:
+        with open(args.out, 'wb') as file:
+            file.write(orjson.dumps(report, option=orjson.OPT_INDENT_2))
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('report', 'backfill', 'cleanup'))
+    parser.add_argument('--batch-size', type=int, default=5000, help='строк в одной транзакции backfill и cleanup')
+    parser.add_argument('--pause', type=float, default=0.05, help='пауза между транзакциями, с')
+    parser.add_argument('--sample-percent', type=float, default=1.0, help='доля страниц для средней ширины строки')
+    parser.add_argument('--out', help='сохранить отчёт в JSON')
+    parser.add_argument('--baseline', help='JSON с прошлым отчётом для сравнения')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(parse_args()))
@@ -0,0 +1,139 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.dml import UpdateBase
+
+logger = logging.getLogger(__name__)
+
+# Ключи Session.info
+ROUTER = "router"
+READ_ONLY = "read_only"
+USE_PRIMARY = "use_primary"
+REPLICA = "replica"
+
+
+class ReplicaRouter:
+    """Выбор движка для чтения: реплики по кругу с учётом их доступности.
+
+    Доступность реплик проверяется фоновой задачей; если живых реплик нет,
+    чтение идёт на основную БД. Для read-your-writes роутер помнит ключи
+    (link_id), записанные за последние read_your_writes_window секунд.
+
+    Ключи помнит процесс: при WEB_CONCURRENCY > 1 запись, обработанная одним воркером,
+    не видна роутеру другого, и тот может прочитать ссылку с отстающей реплики
+    (404 сразу после создания, редирект сразу после удаления) - до конца её отставания.
+    """
+
+    def __init__(
+            self,
+            primary: AsyncEngine,
+            replicas: list[AsyncEngine],
+            *,
+            read_your_writes_window: float,
+            health_check_interval: float,
+            health_check_timeout: float = 1.0,
+    ):
+        self.primary = primary
+        self.replicas = replicas
+        self._healthy = list(replicas)
+        self._round_robin = itertools.cycle(self._healthy)
+        self._window = read_your_writes_window
+        self._recent_writes: OrderedDict[str, float] = OrderedDict()
+        self._health_check_interval = health_check_interval
+        self._health_check_timeout = health_check_timeout
+        self._task: Optional[asyncio.Task] = None
+
+    def read_engine(self) -> AsyncEngine:
+        if not self._healthy:
+            return self.primary
+        return next(self._round_robin)
+
+    def note_write(self, keys: Iterable[str]) -> None:
+        if self._window <= 0 or not self.replicas:
+            return
+        now = time.monotonic()
+        self._forget_expired(now)
+        expires_at = now + self._window
+        for key in keys:
+            self._recent_writes[key] = expires_at
+            self._recent_writes.move_to_end(key)
+
+    def recently_written(self, key: str) -> bool:
+        expires_at = self._recent_writes.get(key)
+        return expires_at is not None and expires_at > time.monotonic()
+
+    def _forget_expired(self, now: float) -> None:
+        # Окно одинаковое для всех ключей, поэтому самые старые записи - в начале
+        while self._recent_writes:
+            key, expires_at = next(iter(self._recent_writes.items()))
+            if expires_at > now:
+                break
+            del self._recent_writes[key]
+
+    async def check_health(self) -> None:
+        results = await asyncio.gather(*(self._ping(engine) for engine in self.replicas))
+        healthy = [engine for engine, is_alive in zip(self.replicas, results) if is_alive]
+        if healthy != self._healthy:
+            logger.warning("healthy replicas changed: %s of %s", len(healthy), len(self.replicas))
+            self._healthy = healthy
+            self._round_robin = itertools.cycle(healthy)
+
+    async def _ping(self, engine: AsyncEngine) -> bool:
+        async def select_one() -> None:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+
+        try:
+            # Таймаут и на подключение: недоступная реплика иначе держит проверку всех реплик
+            await asyncio.wait_for(select_one(), self._health_check_timeout)
+            return True
+        except Exception as err:
+            logger.error("replica %s is unavailable: %s", engine.url.host, err)
+            return False
+
+    async def start(self) -> None:
+        if self.replicas and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await self.check_health()
+            await asyncio.sleep(self._health_check_interval)
+
+
+class RoutingSession(Session):
+    """Сессия, отправляющая чтение read-only сессий на реплики, а всё остальное - на основную БД.
+
+    Реплика выбирается один раз на сессию, чтобы все её запросы видели одни и те же данные.
+    Запись (flush, INSERT/UPDATE/DELETE) всегда идёт на основную БД.
+    """
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        router: ReplicaRouter = self.info[ROUTER]
+        if (
+                not self.info.get(READ_ONLY)
+                or self.info.get(USE_PRIMARY)
+                or self._flushing
+                or isinstance(clause, UpdateBase)
+        ):
+            return router.primary.sync_engine
+        if REPLICA not in self.info:
+            self.info[REPLICA] = router.read_engine()
+        return self.info[REPLICA].sync_engine
@@ -1,14 +1,40 @@
+import logging
+
 from core.config import app_settings
 from sqlalchemy.orm import declarative_base, sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 
+from db.routing import READ_ONLY, ROUTER, ReplicaRouter, RoutingSession
+from services.metrics import instrument_engine
+
+logger = logging.getLogger(__name__)
+
 # Создаём базовый класс для будущих моделей
 Base = declarative_base()
 # Создаём движок
 # Настройки подключения к БД передаём из переменных окружения, которые заранее загружены в файл настроек
-engine = create_async_engine(app_settings.database_dsn, echo=True, future=True)
+engine = create_async_engine(app_settings.database_dsn, echo=app_settings.db_echo, future=True)
+# Реплики только для чтения; без них всё идёт на основную БД
+replica_engines = [
+    create_async_engine(dsn, echo=app_settings.db_echo, future=True) for dsn in app_settings.database_replica_dsns
+]
+# Время и число запросов, состояние пулов - для /metrics
+instrument_engine(engine.sync_engine, 'primary')
+for replica_engine in replica_engines:
+    instrument_engine(replica_engine.sync_engine, f'replica:{replica_engine.url.host}')
+if replica_engines and app_settings.web_concurrency > 1:
+    logger.warning(
+        'read-your-writes is tracked per process: with %s workers a link may be read from a lagging replica',
+        app_settings.web_concurrency,
+    )
+replica_router = ReplicaRouter(
+    engine,
+    replica_engines,
+    read_your_writes_window=app_settings.read_your_writes_window,
+    health_check_interval=app_settings.replica_health_check_interval,
+)
 async_session = sessionmaker(
-    engine, class_=AsyncSession, expire_on_commit=False
+    class_=AsyncSession, sync_session_class=RoutingSession, expire_on_commit=False, info={ROUTER: replica_router}
 )
 
 
@@ -17,3 +43,10 @@ async_session = sessionmaker(
 async def get_session() -> AsyncSession:
     async with async_session() as session:
         yield session
+
+
+# Сессия для обработчиков, которые только читают: запросы уходят на реплику
+async def get_read_session() -> AsyncSession:
+    async with async_session() as session:
+        session.info[READ_ONLY] = True
+        yield session
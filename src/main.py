@@ -1,10 +1,26 @@
+import logging
+
 import uvicorn
 from fastapi import FastAPI
-from fastapi.responses import ORJSONResponse
+from fastapi.responses import ORJSONResponse, Response
 
 from core import config
+from core.config import app_settings
+from db.short_links_db_base import async_session, engine, replica_engines, replica_router
+from models.short_link import ShortLinkHistory
+from services.partitions import HistoryPartitionManager
+from services.rollups import RollupCompactor
+from services.subnets import SubnetBlocklist
+from services.warmup import Warmup
 # Добавляем импорт на ранее созданный модуль
 from api.v1.endpoints import short_link_service
+from api.v1.handlers.short_link_service import click_recorder, id_generator, link_cache, link_filter, storage
+from middlewares.metrics import MetricsMiddleware
+from middlewares.redirect_fast_path import RedirectFastPathMiddleware
+from middlewares.subnet_blocklist import SubnetBlocklistMiddleware
+from services import metrics
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(
     # Конфигурируем название проекта. Оно будет отображаться в документации
@@ -20,6 +36,96 @@ app = FastAPI(
 
 # Подключаем роутер к серверу, указав префикс
 app.include_router(short_link_service.router, prefix='/api/v1')
+# Редиректы обслуживаются до роутинга FastAPI; статические пути роутера (/ping и т.п.) - нет
+app.add_middleware(
+    RedirectFastPathMiddleware,
+    prefix='/api/v1',
+    reserved=frozenset(route.path.strip('/') for route in short_link_service.router.routes if '{' not in route.path),
+)
+# Добавлен после быстрого пути, значит внешний к нему: учитывает и быстрый путь редиректов
+app.add_middleware(MetricsMiddleware)
+blocklist = SubnetBlocklist(app_settings.blocklist_path, reload_interval=app_settings.blocklist_reload_interval)
+# Самый внешний: запросы из запрещённых подсетей отсекаются до всего остального
+app.add_middleware(SubnetBlocklistMiddleware, blocklist=blocklist)
+
+history_partitions = HistoryPartitionManager(
+    async_session,
+    table=ShortLinkHistory.__tablename__,
+    interval=app_settings.history_partition_interval,
+    ahead=app_settings.history_partitions_ahead,
+    retention_days=app_settings.history_retention_days,
+    check_interval=app_settings.history_partition_check_interval,
+)
+rollup_compactor = RollupCompactor(
+    async_session,
+    storage=storage,
+    minute_retention_days=app_settings.rollup_minute_retention_days,
+    hour_retention_days=app_settings.rollup_hour_retention_days,
+    check_interval=app_settings.rollup_compaction_interval,
+)
+warmup = Warmup(
+    async_session,
+    storage=storage,
+    link_cache=link_cache,
+    # Пул соединений есть только у Postgres; реплики тоже обслуживают чтения
+    engines=[engine, *replica_engines] if app_settings.storage_backend == 'postgres' else [],
+    pool_connections=app_settings.warmup_pool_connections,
+    preload_links=app_settings.warmup_preload_links,
+    enabled=app_settings.warmup_enabled,
+)
+
+
+@app.get('/metrics', include_in_schema=False)
+async def metrics_handler() -> Response:
+    return Response(metrics.metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get('/ready', include_in_schema=False)
+async def readiness_handler() -> Response:
+    # Балансировщик направляет трафик на экземпляр только после прогрева
+    if not warmup.ready:
+        return ORJSONResponse({'ready': False}, status_code=503)
+    return ORJSONResponse({'ready': True, 'startup_seconds': warmup.startup_seconds})
+
+
+@app.on_event("startup")
+async def start_background_tasks():
+    # Первым: время запуска считается от начала старта
+    await warmup.start()
+    await blocklist.start()
+    # Номер воркера snowflake арендуется до первого запроса
+    await id_generator.start()
+    await click_recorder.start()
+    # Секции истории есть только в Postgres
+    if app_settings.storage_backend == 'postgres':
+        await history_partitions.start()
+    await replica_router.start()
+    await rollup_compactor.start()
+    # Фильтр строится в фоне; пока он не готов, запросы идут в БД как обычно.
+    # Ссылки других воркеров он узнаёт лишь при дочитывании и до того ответил бы на них 404,
+    # поэтому при нескольких воркерах не включается
+    if app_settings.link_filter_enabled and app_settings.web_concurrency > 1:
+        logger.warning(
+            'link filter is disabled: links created by the other %s workers would get 404 until its refresh',
+            app_settings.web_concurrency - 1,
+        )
+    elif app_settings.link_filter_enabled:
+        await link_filter.start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await warmup.stop()
+    await blocklist.stop()
+    # Дописываем в БД все накопленные переходы до остановки приложения
+    await click_recorder.stop()
+    await history_partitions.stop()
+    await replica_router.stop()
+    await rollup_compactor.stop()
+    await link_filter.stop()
+    await id_generator.stop()
+    await storage.close()
+
 
 if __name__ == '__main__':
     # Приложение может запускаться командой
@@ -0,0 +1,58 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metrics import ROUTE_KEY, http_request_duration, http_requests_in_flight, http_requests_total
+
+# Метка для путей, не совпавших ни с одним маршрутом: сырой путь раздул бы число рядов
+UNMATCHED_ROUTE = "unmatched"
+
+
+class MetricsMiddleware:
+    """Считает запросы, их время и число выполняющихся запросов по шаблону маршрута.
+
+    Шаблон берётся из scope после обработки: FastAPI кладёт туда endpoint, а обработчики
+    в обход роутинга - ROUTE_KEY. Должен быть внешним middleware, чтобы учитывать и их.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self._routes: dict = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            method = scope["method"]
+            route = self._route(scope)
+            http_requests_total.inc((method, route, status_code))
+            http_request_duration.observe(elapsed, (method, route))
+
+    def _route(self, scope: Scope) -> str:
+        route = scope.get(ROUTE_KEY)
+        if route is not None:
+            return route
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return UNMATCHED_ROUTE
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = self._routes[endpoint] = next(
+                (r.path for r in scope["app"].routes if getattr(r, "endpoint", None) is endpoint), UNMATCHED_ROUTE,
+            )
+        return route
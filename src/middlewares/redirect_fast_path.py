@@ -0,0 +1,109 @@
+import logging
+from datetime import datetime
+from typing import Callable, Optional
+from urllib.parse import quote
+
+import orjson
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from api.v1.handlers.short_link_service import (
+    click_recorder,
+    get_link_entry,
+    link_cache,
+    link_filter,
+    redirect_cache_control,
+)
+from core.config import LINK_NOT_FOUND, PAGE_DELETED
+from db.routing import READ_ONLY
+from db.short_links_db_base import async_session
+from services.cache import MISS
+from services.clicks import ClickEvent
+from services.metrics import ROUTE_KEY
+
+logger = logging.getLogger(__name__)
+
+# Те же символы, что оставляет без кодирования starlette.responses.RedirectResponse
+LOCATION_SAFE_CHARS = ":/%#?=@[]!$&'()*+,;"
+JSON_HEADERS = [(b"content-type", b"application/json")]
+
+
+class RedirectFastPathMiddleware:
+    """Обслуживает GET {prefix}/{shorten_url_id} в обход роутинга FastAPI.
+
+    Редирект - это поиск по ключу и заголовок Location, поэтому здесь нет внедрения
+    зависимостей, pydantic-моделей и объектов Response; сессия БД открывается только
+    при промахе кеша и если фильтр link_id не отверг ссылку. Ответы те же, что у
+    обработчика: редирект с кодом и Cache-Control по политике ссылки, 404 и 410.
+    Остальные запросы, включая пути из reserved, передаются приложению без изменений.
+
+    session_factory - атрибут класса: Starlette пересоздаёт экземпляры middleware при
+    каждом add_middleware, поэтому тесты подменяют фабрику сессий на классе.
+    """
+
+    session_factory: Callable[[], AsyncSession] = async_session
+
+    def __init__(
+            self,
+            app: ASGIApp,
+            prefix: str,
+            reserved: frozenset[str] = frozenset(),
+            session_factory: Optional[Callable[[], AsyncSession]] = None,
+    ):
+        self.app = app
+        if session_factory is not None:
+            self.session_factory = session_factory
+        self._prefix = prefix.rstrip("/") + "/"
+        self._reserved = reserved
+        self._route = self._prefix + "{shorten_url_id}"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+        path = scope["path"]
+        shorten_url_id = path[len(self._prefix):]
+        if (
+                not path.startswith(self._prefix)
+                or not shorten_url_id
+                or "/" in shorten_url_id
+                or shorten_url_id in self._reserved
+        ):
+            await self.app(scope, receive, send)
+            return
+        scope[ROUTE_KEY] = self._route
+        await self._redirect(shorten_url_id, scope, send)
+
+    async def _redirect(self, shorten_url_id: str, scope: Scope, send: Send) -> None:
+        entry = link_cache.get(shorten_url_id)
+        if entry is MISS and not link_filter.might_exist(shorten_url_id):
+            entry = None
+        if entry is MISS:
+            async with self.session_factory() as db:
+                db.info[READ_ONLY] = True
+                entry = await get_link_entry(db, shorten_url_id)
+        if entry is None:
+            await self._send_error(send, 404, LINK_NOT_FOUND)
+            return
+        if not entry.is_active:
+            await self._send_error(send, 410, PAGE_DELETED)
+            return
+        host, port = scope.get("client") or ("", 0)
+        await click_recorder.record(ClickEvent(entry.id, f"{host}:{port}", datetime.utcnow()))
+        location = quote(str(entry.original_link), safe=LOCATION_SAFE_CHARS).encode("latin-1")
+        headers = [(b"location", location), (b"content-length", b"0")]
+        cache_control = redirect_cache_control(entry)
+        if cache_control:
+            headers.append((b"cache-control", cache_control.encode()))
+        await send({"type": "http.response.start", "status": entry.redirect_status, "headers": headers})
+        await send({"type": "http.response.body", "body": b""})
+
+    @staticmethod
+    async def _send_error(send: Send, status_code: int, detail: str) -> None:
+        body = orjson.dumps({"detail": detail})
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": JSON_HEADERS + [(b"content-length", str(len(body)).encode())],
+        })
+        await send({"type": "http.response.body", "body": body})
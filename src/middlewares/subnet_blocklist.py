@@ -0,0 +1,29 @@
+import orjson
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from core.config import SUBNET_BLOCKED
+from services.subnets import SubnetBlocklist
+
+BLOCKED_BODY = orjson.dumps({"detail": SUBNET_BLOCKED})
+BLOCKED_HEADERS = [(b"content-type", b"application/json"), (b"content-length", str(len(BLOCKED_BODY)).encode())]
+
+
+class SubnetBlocklistMiddleware:
+    """Отвечает 403 на запросы клиентов из подсетей чёрного списка, не передавая их приложению.
+
+    Адрес клиента берётся из scope["client"] (request.client.host). Добавляется последним,
+    то есть внешним: запрещённый запрос не проходит остальные middleware и не учитывается
+    в метриках HTTP - для него есть blocked_requests_total.
+    """
+
+    def __init__(self, app: ASGIApp, blocklist: SubnetBlocklist):
+        self.app = app
+        self._blocklist = blocklist
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        client = scope.get("client")
+        if scope["type"] != "http" or client is None or not self._blocklist.is_blocked(client[0]):
+            await self.app(scope, receive, send)
+            return
+        await send({"type": "http.response.start", "status": 403, "headers": BLOCKED_HEADERS})
+        await send({"type": "http.response.body", "body": BLOCKED_BODY})
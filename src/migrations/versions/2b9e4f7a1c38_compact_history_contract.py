@@ -0,0 +1,103 @@
+"""compact layout, contract: switch history ids to bigint, drop stored short_link
+
+Revision ID: 2b9e4f7a1c38
+Revises: f5a8c3d1e927
+Create Date: 2026-10-18 18:41:12.907354
+
+Применяется после `python -m db.compact_layout backfill` вместе с выкладкой нового кода:
+старый код с UUID-идентификаторами истории после неё работать не может.
+
+Долгие шаги - проверка NOT NULL и построение новых индексов - идут посекционно
+вне общей транзакции (CONCURRENTLY), поэтому запись в историю не блокируется.
+Короткая блокировка берётся только в конце, на замену первичного ключа и удаление
+колонок; индексы секций к этому моменту уже построены: уникальные становятся
+первичными ключами секций (USING INDEX), и ключ родительской таблицы их присоединяет.
+После выкладки `python -m db.compact_layout cleanup` обнуляет строки client_ip,
+уже разложенные на client_host и порт (до этого их читал старый код).
+Место на диске освобождают VACUUM FULL или pg_repack по секциям: отчёт
+`python -m db.compact_layout report --baseline ...` показывает разницу.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2b9e4f7a1c38'
+down_revision = 'f5a8c3d1e927'
+branch_labels = None
+depends_on = None
+
+
+def _partitions() -> list[str]:
+    rows = op.get_bind().execute(sa.text(
+        "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+        "WHERE i.inhparent = 'short_link_history'::regclass ORDER BY c.relname"
+    ))
+    return [name for name, in rows]
+
+
+def upgrade() -> None:
+    pending = op.get_bind().execute(sa.text(
+        'SELECT EXISTS (SELECT 1 FROM short_link_history WHERE seq_id IS NULL)'
+    )).scalar()
+    if pending:
+        raise RuntimeError('short_link_history is not backfilled yet: run `python -m db.compact_layout backfill`')
+
+    partitions = _partitions()
+    with op.get_context().autocommit_block():
+        for partition in partitions:
+            # NOT NULL через проверенный CHECK: SET NOT NULL не сканирует секцию второй раз
+            op.execute(f'ALTER TABLE {partition} ADD CONSTRAINT {partition}_seq_id_not_null '
+                       f'CHECK (seq_id IS NOT NULL) NOT VALID')
+            op.execute(f'ALTER TABLE {partition} VALIDATE CONSTRAINT {partition}_seq_id_not_null')
+            op.execute(f'ALTER TABLE {partition} ALTER COLUMN seq_id SET NOT NULL')
+            op.execute(f'ALTER TABLE {partition} DROP CONSTRAINT {partition}_seq_id_not_null')
+            op.execute(f'CREATE UNIQUE INDEX CONCURRENTLY IF NOT EXISTS {partition}_seq_id_use_at_key '
+                       f'ON {partition} (seq_id, use_at)')
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {partition}_short_link_id_use_at_seq_id_idx '
+                       f'ON {partition} (short_link_id, use_at, seq_id)')
+
+    op.execute('DROP TRIGGER short_link_history_compact_client ON short_link_history')
+    op.execute('DROP FUNCTION short_link_history_compact_client()')
+
+    # Все секции уже NOT NULL, поэтому на родительской таблице это только изменение каталога
+    op.alter_column('short_link_history', 'seq_id', nullable=False)
+    # Удаляет и унаследованные первичные ключи секций
+    op.drop_constraint('short_link_history_pkey', 'short_link_history', type_='primary')
+    # Вместе с колонкой удаляется и старый индекс (short_link_id, use_at, id)
+    op.drop_column('short_link_history', 'id')
+    op.alter_column('short_link_history', 'seq_id', new_column_name='id')
+    op.execute('ALTER SEQUENCE short_link_history_id_seq OWNED BY short_link_history.id')
+    # Ключ родительской таблицы присоединяет только индексы секций, за которыми стоит
+    # ограничение, а простой уникальный индекс построил бы заново под блокировкой
+    for partition in partitions:
+        op.execute(f'ALTER TABLE {partition} ADD CONSTRAINT {partition}_pkey '
+                   f'PRIMARY KEY USING INDEX {partition}_seq_id_use_at_key')
+    op.create_primary_key('short_link_history_pkey', 'short_link_history', ['id', 'use_at'])
+    op.create_index('ix_short_link_history_short_link_id_use_at_id', 'short_link_history',
+                    ['short_link_id', 'use_at', 'id'], unique=False)
+    op.drop_column('short_link', 'short_link')
+
+
+def downgrade() -> None:
+    # Возвращает схему предыдущей ревизии без триггеров: её downgrade удаляет их, если они есть
+    from core.config import PROJECT_URL
+
+    op.add_column('short_link', sa.Column('short_link', sa.UnicodeText(), nullable=True))
+    op.execute(
+        sa.text('UPDATE short_link SET short_link = :project_url || link_id')
+        .bindparams(project_url=PROJECT_URL)
+    )
+
+    op.drop_constraint('short_link_history_pkey', 'short_link_history', type_='primary')
+    op.drop_index('ix_short_link_history_short_link_id_use_at_id', table_name='short_link_history')
+    op.alter_column('short_link_history', 'id', new_column_name='seq_id', server_default=None)
+    op.alter_column('short_link_history', 'seq_id', nullable=True,
+                    server_default=sa.text("nextval('short_link_history_id_seq')"))
+    op.execute('ALTER SEQUENCE short_link_history_id_seq OWNED BY NONE')
+    op.add_column('short_link_history', sa.Column('id', sa.UUID(), nullable=False,
+                                                  server_default=sa.text('gen_random_uuid()')))
+    op.create_primary_key('short_link_history_pkey', 'short_link_history', ['id', 'use_at'])
+    op.create_index('ix_short_link_history_short_link_id_use_at_id', 'short_link_history',
+                    ['short_link_id', 'use_at', 'id'], unique=False)
+
@@ -0,0 +1,36 @@
+"""short link sharded counters
+
+Revision ID: 3c1f0a7d2b91
+Revises: 9b3e68ecafbd
+Create Date: 2026-10-18 10:12:41.204511
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f0a7d2b91'
+down_revision = '9b3e68ecafbd'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('short_link_counter',
+    sa.Column('short_link_id', sa.UUID(), nullable=False),
+    sa.Column('shard', sa.SmallInteger(), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['short_link_id'], ['short_link.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('short_link_id', 'shard')
+    )
+
+
+def downgrade() -> None:
+    # Переносим накопленные в шардах переходы обратно в short_link.usages_count
+    op.execute(
+        "UPDATE short_link SET usages_count = COALESCE(short_link.usages_count, 0) + c.total "
+        "FROM (SELECT short_link_id, SUM(count) AS total FROM short_link_counter GROUP BY short_link_id) AS c "
+        "WHERE short_link.id = c.short_link_id"
+    )
+    op.drop_table('short_link_counter')
@@ -0,0 +1,37 @@
+"""short link history keyset index
+
+Revision ID: 5e8b2c4f9a13
+Revises: 3c1f0a7d2b91
+Create Date: 2026-10-18 11:03:27.581930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e8b2c4f9a13'
+down_revision = '3c1f0a7d2b91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY не блокирует запись переходов на время построения индекса
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_short_link_history_short_link_id_use_at_id',
+            'short_link_history',
+            ['short_link_id', 'use_at', 'id'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_short_link_history_short_link_id_use_at_id',
+            table_name='short_link_history',
+            postgresql_concurrently=True,
+        )
@@ -0,0 +1,94 @@
+"""partition short link history by use_at
+
+Revision ID: 7a4d91e6c0b2
+Revises: 5e8b2c4f9a13
+Create Date: 2026-10-18 12:20:05.113862
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7a4d91e6c0b2'
+down_revision = '5e8b2c4f9a13'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Секции нарезаются так же, как их дальше поддерживает HistoryPartitionManager:
+    # иначе при интервале не в месяц его секции пересекались бы с созданными здесь
+    from core.config import app_settings
+    from services.partitions import next_period, period_start
+
+    interval = app_settings.history_partition_interval
+
+    op.rename_table('short_link_history', 'short_link_history_old')
+    op.execute('ALTER TABLE short_link_history_old RENAME CONSTRAINT short_link_history_pkey '
+               'TO short_link_history_old_pkey')
+    op.execute('ALTER TABLE short_link_history_old RENAME CONSTRAINT short_link_history_short_link_id_fkey '
+               'TO short_link_history_old_short_link_id_fkey')
+    op.drop_index('ix_short_link_history_short_link_id_use_at_id', table_name='short_link_history_old')
+    op.drop_index('ix_short_link_history_use_at', table_name='short_link_history_old')
+
+    op.create_table('short_link_history',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('short_link_id', sa.UUID(), nullable=False),
+    sa.Column('client_ip', sa.String(length=60), nullable=False),
+    sa.Column('use_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['short_link_id'], ['short_link.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', 'use_at'),
+    postgresql_partition_by='RANGE (use_at)',
+    )
+    op.create_index('ix_short_link_history_use_at', 'short_link_history', ['use_at'], unique=False)
+    op.create_index('ix_short_link_history_short_link_id_use_at_id', 'short_link_history',
+                    ['short_link_id', 'use_at', 'id'], unique=False)
+    # Строки вне созданных секций не теряются, а попадают сюда
+    op.execute('CREATE TABLE short_link_history_default PARTITION OF short_link_history DEFAULT')
+
+    now = datetime.utcnow()
+    oldest = op.get_bind().execute(sa.text('SELECT min(use_at) FROM short_link_history_old')).scalar() or now
+    start = period_start(min(oldest, now), interval)
+    last = period_start(now, interval)
+    for _ in range(app_settings.history_partitions_ahead):
+        last = next_period(last, interval)
+    while start <= last:
+        end = next_period(start, interval)
+        op.execute(
+            f"CREATE TABLE short_link_history_p{start:%Y%m%d} PARTITION OF short_link_history "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        )
+        start = end
+
+    op.execute(
+        'INSERT INTO short_link_history (id, short_link_id, client_ip, use_at) '
+        'SELECT id, short_link_id, client_ip, COALESCE(use_at, now() at time zone \'utc\') '
+        'FROM short_link_history_old'
+    )
+    op.drop_table('short_link_history_old')
+
+
+def downgrade() -> None:
+    op.rename_table('short_link_history', 'short_link_history_partitioned')
+    op.create_table('short_link_history',
+    sa.Column('id', sa.UUID(), nullable=False),
+    sa.Column('short_link_id', sa.UUID(), nullable=False),
+    sa.Column('client_ip', sa.String(length=60), nullable=False),
+    sa.Column('use_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['short_link_id'], ['short_link.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id', name='short_link_history_pkey_plain'),
+    )
+    op.execute(
+        'INSERT INTO short_link_history (id, short_link_id, client_ip, use_at) '
+        'SELECT id, short_link_id, client_ip, use_at FROM short_link_history_partitioned'
+    )
+    # Вместе с родительской таблицей удаляются и все секции
+    op.drop_table('short_link_history_partitioned')
+    op.execute('ALTER TABLE short_link_history RENAME CONSTRAINT short_link_history_pkey_plain '
+               'TO short_link_history_pkey')
+    op.create_index('ix_short_link_history_use_at', 'short_link_history', ['use_at'], unique=False)
+    op.create_index('ix_short_link_history_short_link_id_use_at_id', 'short_link_history',
+                    ['short_link_id', 'use_at', 'id'], unique=False)
@@ -0,0 +1,26 @@
+"""link id sequences
+
+Revision ID: 8d2e5b1f7c64
+Revises: 7a4d91e6c0b2
+Create Date: 2026-10-18 13:41:52.076214
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e5b1f7c64'
+down_revision = '7a4d91e6c0b2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Шаг последовательности - размер блока link_id, резервируемого воркером за один nextval.
+    # Увеличивать его можно в любой момент, уменьшать нельзя: блоки начнут пересекаться
+    op.execute(sa.schema.CreateSequence(sa.Sequence('short_link_id_block_seq', start=1, increment=1000)))
+
+
+def downgrade() -> None:
+    op.execute(sa.schema.DropSequence(sa.Sequence('short_link_id_block_seq')))
@@ -0,0 +1,84 @@
+"""short link original link hash
+
+Revision ID: a19c7e3d5f20
+Revises: 8d2e5b1f7c64
+Create Date: 2026-10-18 14:55:10.682307
+
+"""
+import hashlib
+from urllib.parse import urlsplit, urlunsplit
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a19c7e3d5f20'
+down_revision = '8d2e5b1f7c64'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 5000
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def _url_hash(url: str) -> bytes:
+    # Копия services.dedup на момент миграции: миграция не должна меняться вместе с кодом
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        # Неверный порт или незакрытый IPv6-хост: хешируется как есть, как и в приложении
+        return hashlib.sha256(url.strip().encode()).digest()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    normalized = urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+    return hashlib.sha256(normalized.encode()).digest()
+
+
+def _fill_hashes(bind, rows) -> None:
+    bind.execute(
+        sa.text('UPDATE short_link SET original_link_hash = :hash WHERE id = :id'),
+        [{'id': id_, 'hash': _url_hash(original_link)} for id_, original_link in rows],
+    )
+
+
+def upgrade() -> None:
+    op.add_column('short_link', sa.Column('original_link_hash', sa.LargeBinary(length=32), nullable=True))
+    # Заполняем хеши пачками, каждая в своей транзакции, чтобы не держать долгих блокировок.
+    # Пачки идут по первичному ключу: без индекса по хешу условие IS NULL пересканировало
+    # бы таблицу на каждой пачке
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        after = None
+        while True:
+            rows = bind.execute(sa.text(
+                'SELECT id, original_link FROM short_link '
+                'WHERE (CAST(:after AS uuid) IS NULL OR id > :after) AND original_link_hash IS NULL '
+                'ORDER BY id LIMIT :limit'
+            ), {'after': after, 'limit': BACKFILL_BATCH_SIZE}).all()
+            if not rows:
+                break
+            _fill_hashes(bind, rows)
+            after = rows[-1][0]
+        # Ссылки, созданные работающим старым кодом позади курсора, - один дочищающий проход
+        while True:
+            rows = bind.execute(sa.text(
+                'SELECT id, original_link FROM short_link WHERE original_link_hash IS NULL LIMIT :limit'
+            ), {'limit': BACKFILL_BATCH_SIZE}).all()
+            if not rows:
+                break
+            _fill_hashes(bind, rows)
+        op.create_index(op.f('ix_short_link_original_link_hash'), 'short_link', ['original_link_hash'],
+                        unique=False, postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_short_link_original_link_hash'), table_name='short_link')
+    op.drop_column('short_link', 'original_link_hash')
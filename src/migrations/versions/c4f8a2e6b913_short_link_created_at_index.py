@@ -0,0 +1,33 @@
+"""short link created_at index
+
+Revision ID: c4f8a2e6b913
+Revises: a19c7e3d5f20
+Create Date: 2026-10-18 14:12:05.317204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4f8a2e6b913'
+down_revision = 'a19c7e3d5f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Фильтр link_id каждые несколько секунд дочитывает ссылки, созданные после отметки времени
+    with op.get_context().autocommit_block():
+        op.create_index(
+            op.f('ix_short_link_created_at'),
+            'short_link',
+            ['created_at'],
+            unique=False,
+            postgresql_concurrently=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(op.f('ix_short_link_created_at'), table_name='short_link', postgresql_concurrently=True)
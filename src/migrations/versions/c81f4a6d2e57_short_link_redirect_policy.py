@@ -0,0 +1,27 @@
+"""short link redirect policy
+
+Revision ID: c81f4a6d2e57
+Revises: 2b9e4f7a1c38
+Create Date: 2026-10-18 19:27:50.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c81f4a6d2e57'
+down_revision = '2b9e4f7a1c38'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Постоянное значение по умолчанию не переписывает таблицу; у всех ссылок 307, как и было
+    op.add_column('short_link', sa.Column('redirect_status', sa.SmallInteger(), server_default='307', nullable=False))
+    op.add_column('short_link', sa.Column('cache_max_age', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('short_link', 'cache_max_age')
+    op.drop_column('short_link', 'redirect_status')
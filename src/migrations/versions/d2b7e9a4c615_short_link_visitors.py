@@ -0,0 +1,30 @@
+"""short link visitors
+
+Revision ID: d2b7e9a4c615
+Revises: c4f8a2e6b913
+Create Date: 2026-10-18 15:40:52.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2b7e9a4c615'
+down_revision = 'c4f8a2e6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('short_link_visitors',
+    sa.Column('short_link_id', sa.UUID(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('sketch', sa.LargeBinary(), nullable=False),
+    sa.ForeignKeyConstraint(['short_link_id'], ['short_link.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('short_link_id', 'day')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('short_link_visitors')
@@ -0,0 +1,35 @@
+"""short link rollup
+
+Revision ID: e7c3a9f1b482
+Revises: d2b7e9a4c615
+Create Date: 2026-10-18 17:12:06.381520
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7c3a9f1b482'
+down_revision = 'd2b7e9a4c615'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('short_link_rollup',
+    sa.Column('short_link_id', sa.UUID(), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('granularity', sa.SmallInteger(), nullable=False),
+    sa.Column('count', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['short_link_id'], ['short_link.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('short_link_id', 'bucket_start', 'granularity')
+    )
+    op.create_index(
+        'ix_short_link_rollup_granularity_bucket_start', 'short_link_rollup', ['granularity', 'bucket_start'],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_short_link_rollup_granularity_bucket_start', table_name='short_link_rollup')
+    op.drop_table('short_link_rollup')
@@ -0,0 +1,97 @@
+"""compact layout, expand: bigint history ids, inet client, derived short_link
+
+Revision ID: f5a8c3d1e927
+Revises: e7c3a9f1b482
+Create Date: 2026-10-18 18:05:41.260715
+
+Первая из двух миграций перехода на компактное хранение. Только быстрые изменения
+каталога, без перезаписи таблиц, поэтому её можно применять под нагрузкой:
+
+- short_link_history.seq_id bigint из последовательности (станет id вместо UUID);
+- client_host inet и client_port smallint вместо строки "host:port" в client_ip;
+- short_link.short_link становится необязательной (вычисляется из link_id).
+
+Триггер переводит в новый формат строки истории, которые пишет ещё работающий старый код.
+Строку client_ip он не стирает: старый код читает её в /status и выгрузке. Хранимый
+short_link до contract тоже не трогается: старый код отдаёт его повторам при дедупликации.
+Обе избыточные колонки убираются только после contract (short_link - самой миграцией,
+client_ip - командой `python -m db.compact_layout cleanup`).
+Существующие строки переводит `python -m db.compact_layout backfill`, после чего
+применяется вторая миграция (2b9e4f7a1c38) вместе с выкладкой нового кода.
+Нужен Postgres 13+ (BEFORE-триггеры секционированных таблиц, gen_random_uuid).
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5a8c3d1e927'
+down_revision = 'e7c3a9f1b482'
+branch_labels = None
+depends_on = None
+
+# Порт 0..65535 в smallint: значения от 32768 хранятся отрицательными (как PORT_MASK в models)
+COMPACT_CLIENT_FUNCTION = """
+CREATE FUNCTION short_link_history_compact_client() RETURNS trigger AS $$
+DECLARE
+    port integer;
+BEGIN
+    IF NEW.client_ip IS NULL OR NEW.client_host IS NOT NULL THEN
+        RETURN NEW;
+    END IF;
+    port := substring(NEW.client_ip FROM ':([0-9]{1,5})$')::integer;
+    IF port IS NULL OR port > 65535 THEN
+        RETURN NEW;
+    END IF;
+    BEGIN
+        NEW.client_host := regexp_replace(NEW.client_ip, ':[0-9]+$', '')::inet;
+    EXCEPTION WHEN invalid_text_representation THEN
+        -- Не IP-адрес (тестовый клиент, unix-сокет): остаётся строкой
+        RETURN NEW;
+    END;
+    NEW.client_port := CASE WHEN port > 32767 THEN port - 65536 ELSE port END;
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql
+"""
+
+
+def upgrade() -> None:
+    op.execute('CREATE SEQUENCE short_link_history_id_seq AS bigint')
+    # Без DEFAULT в ADD COLUMN: nextval() - изменчивое значение, и таблица переписалась бы целиком
+    op.add_column('short_link_history', sa.Column('seq_id', sa.BigInteger(), nullable=True))
+    op.alter_column('short_link_history', 'seq_id', server_default=sa.text("nextval('short_link_history_id_seq')"))
+    op.add_column('short_link_history', sa.Column('client_host', sa.dialects.postgresql.INET(), nullable=True))
+    op.add_column('short_link_history', sa.Column('client_port', sa.SmallInteger(), nullable=True))
+    op.alter_column('short_link_history', 'client_ip', existing_type=sa.String(length=60), nullable=True)
+    op.alter_column('short_link_history', 'id', server_default=sa.text('gen_random_uuid()'))
+    op.alter_column('short_link', 'short_link', nullable=True)
+
+    op.execute(COMPACT_CLIENT_FUNCTION)
+    op.execute(
+        'CREATE TRIGGER short_link_history_compact_client BEFORE INSERT OR UPDATE OF client_ip '
+        'ON short_link_history FOR EACH ROW EXECUTE FUNCTION short_link_history_compact_client()'
+    )
+
+
+def downgrade() -> None:
+    from core.config import PROJECT_URL
+
+    op.execute('DROP TRIGGER IF EXISTS short_link_history_compact_client ON short_link_history')
+    op.execute('DROP FUNCTION IF EXISTS short_link_history_compact_client()')
+
+    op.execute(
+        sa.text('UPDATE short_link SET short_link = :project_url || link_id WHERE short_link IS NULL')
+        .bindparams(project_url=PROJECT_URL)
+    )
+    op.alter_column('short_link', 'short_link', nullable=False)
+    op.execute(
+        'UPDATE short_link_history SET client_ip = host(client_host) || \':\' || (client_port & 65535) '
+        'WHERE client_host IS NOT NULL AND client_ip IS NULL'
+    )
+    op.alter_column('short_link_history', 'client_ip', existing_type=sa.String(length=60), nullable=False)
+    op.alter_column('short_link_history', 'id', server_default=None)
+    op.drop_column('short_link_history', 'client_port')
+    op.drop_column('short_link_history', 'client_host')
+    op.drop_column('short_link_history', 'seq_id')
+    op.execute('DROP SEQUENCE short_link_history_id_seq')
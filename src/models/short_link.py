@@ -1,12 +1,29 @@
 import uuid
 from datetime import datetime
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, Boolean
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import relationship
+from sqlalchemy import (
+    BigInteger, Column, Date, DateTime, ForeignKey, Index, Integer, LargeBinary, Sequence, SmallInteger, String,
+    Boolean, case, func,
+)
+from sqlalchemy.dialects.postgresql import INET, UUID
+from sqlalchemy.orm import column_property, relationship
 from sqlalchemy_utils import URLType
 
+from core.config import DEFAULT_REDIRECT_STATUS, PROJECT_URL
 from db.short_links_db_base import Base
+from services.dedup import link_hash
+
+# Порт 0..65535 хранится в smallint с переполнением: порты от 32768 записываются отрицательными
+PORT_MASK = 0xFFFF
+
+
+def _original_link_hash(context) -> bytes:
+    params = context.get_current_parameters()
+    return link_hash(
+        str(params["original_link"]),
+        params.get("redirect_status") or DEFAULT_REDIRECT_STATUS,
+        params.get("cache_max_age"),
+    )
 
 
 class ShortLink(Base):
@@ -17,24 +34,117 @@ class ShortLink(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     is_active = Column(Boolean, default=True)
     original_link = Column(URLType, nullable=False)
+    # Хеш нормализованного original_link и политики редиректа для поиска повторно присланных URL
+    original_link_hash = Column(LargeBinary(32), index=True, default=_original_link_hash)
     link_id = Column(String(10), index=True, nullable=False, unique=True)
-    short_link = Column(URLType, nullable=False)
     usages_count = Column(Integer, default=0)
-    created_at = Column(DateTime, default=datetime.utcnow)
+    created_at = Column(DateTime, index=True, default=datetime.utcnow)
+    # Код редиректа (307, 301 или 308) и max-age для Cache-Control; NULL - без Cache-Control
+    redirect_status = Column(SmallInteger, nullable=False, default=DEFAULT_REDIRECT_STATUS,
+                             server_default=str(DEFAULT_REDIRECT_STATUS))
+    cache_max_age = Column(Integer)
+
+    # История удаляется каскадом на стороне БД, без загрузки строк в ORM
+    link_history = relationship('ShortLinkHistory', cascade="all, delete", passive_deletes=True)
 
-    link_history = relationship('ShortLinkHistory', cascade="all, delete")
+    @property
+    def short_link(self) -> str:
+        # Всегда PROJECT_URL + link_id, поэтому не хранится
+        return f"{PROJECT_URL}{self.link_id}"
 
 
 class ShortLinkHistory(Base):
-    """История использования"""
+    """История использования.
+
+    Таблица секционирована по диапазонам use_at (см. services/partitions.py),
+    поэтому use_at входит в первичный ключ. Клиент хранится как inet и smallint-порт;
+    клиенты, не являющиеся IP-адресом (тестовый клиент, unix-сокет), - строкой в
+    client_raw. client_ip собирается из них при чтении.
+    """
 
     __tablename__ = "short_link_history"
+    __table_args__ = (
+        # Keyset-пагинация истории ссылки: WHERE short_link_id = ? AND (use_at, id) > (?, ?)
+        Index('ix_short_link_history_short_link_id_use_at_id', 'short_link_id', 'use_at', 'id'),
+        {'postgresql_partition_by': 'RANGE (use_at)'},
+    )
 
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Секционированной таблице (до Postgres 17) нельзя identity-колонку: bigint из последовательности
+    id = Column(BigInteger, Sequence('short_link_history_id_seq'), primary_key=True)
     short_link_id = Column(
         UUID(as_uuid=True),
         ForeignKey('short_link.id', ondelete="CASCADE"),
         nullable=False,
     )
-    client_ip = Column(String(60), nullable=False)
-    use_at = Column(DateTime, index=True, default=datetime.utcnow)
+    client_host = Column(INET)
+    client_port = Column(SmallInteger)
+    client_raw = Column('client_ip', String(60))
+    use_at = Column(DateTime, primary_key=True, index=True, default=datetime.utcnow)
+
+    client_ip = column_property(
+        case(
+            (client_host.is_not(None), func.concat(func.host(client_host), ':', client_port.op('&')(PORT_MASK))),
+            else_=client_raw,
+        )
+    )
+
+
+class ShortLinkCounter(Base):
+    """Шардированный счётчик переходов.
+
+    Прирост переходов распределяется по нескольким строкам (шардам) одной
+    ссылки, поэтому параллельные записи не конкурируют за одну блокировку.
+    Итоговое число переходов - usages_count ссылки плюс сумма по шардам.
+    """
+
+    __tablename__ = "short_link_counter"
+
+    short_link_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey('short_link.id', ondelete="CASCADE"),
+        primary_key=True,
+    )
+    shard = Column(SmallInteger, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
+
+
+class ShortLinkVisitors(Base):
+    """Скетчи HyperLogLog уникальных посетителей ссылки (см. services/hll.py).
+
+    Строка с day = ALL_TIME - посетители за всё время, остальные - за отдельные дни;
+    скетчи за диапазон дней сливаются при чтении.
+    """
+
+    __tablename__ = "short_link_visitors"
+
+    short_link_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey('short_link.id', ondelete="CASCADE"),
+        primary_key=True,
+    )
+    day = Column(Date, primary_key=True)
+    sketch = Column(LargeBinary, nullable=False)
+
+
+class ShortLinkRollup(Base):
+    """Число переходов ссылки по временным корзинам (см. services/rollups.py).
+
+    granularity - индекс размера корзины в ROLLUP_BUCKETS (минута, час, день).
+    Переходы пишутся в минутные корзины, старые корзины сворачиваются в более крупные,
+    так что число строк за диапазон зависит от сроков хранения корзин, а не от числа переходов.
+    """
+
+    __tablename__ = "short_link_rollup"
+    __table_args__ = (
+        # Сворачивание: WHERE granularity = ? AND bucket_start < ?
+        Index('ix_short_link_rollup_granularity_bucket_start', 'granularity', 'bucket_start'),
+    )
+
+    short_link_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey('short_link.id', ondelete="CASCADE"),
+        primary_key=True,
+    )
+    bucket_start = Column(DateTime, primary_key=True)
+    granularity = Column(SmallInteger, primary_key=True)
+    count = Column(BigInteger, nullable=False, default=0)
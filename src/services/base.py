@@ -1,18 +1,26 @@
 import logging
-from logging import config as logging_config
-from typing import Any, Generic, Optional, Type, TypeVar
+import random
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Callable, Generic, Mapping, Optional, Sequence, Type, TypeVar
 from uuid import UUID
 
 from fastapi.encoders import jsonable_encoder
 from pydantic import BaseModel
-from shortuuid import ShortUUID
-from sqlalchemy import select, update
+from sqlalchemy import (
+    LargeBinary, String, any_, bindparam, delete, func, insert, literal, literal_column, select, tuple_, update,
+)
+from sqlalchemy.dialects.postgresql import ARRAY, UUID as PG_UUID, insert as pg_insert
+from sqlalchemy.engine import Row
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Executable
 
-from core.logger import LOGGING
+from core.config import LINK_ID_CONFLICT
 from db.short_links_db_base import Base
+from services.hll import ALL_TIME, HyperLogLog
+from services.pagination import HistoryCursor
+from services.rollups import ROLLUP_BUCKETS
 
-logging_config.dictConfig(LOGGING)
 logger = logging.getLogger(__name__)
 
 
@@ -43,23 +51,133 @@ class RepositoryDB(Repository, Generic[ModelType, CreateSchemaType, UpdateSchema
 
     def __init__(self, model: Type[ModelType]):
         self._model = model
+        self._statements: dict[Any, Executable] = {}
 
-    @staticmethod
-    def create_short_url(url_len: int) -> str:
-        return ShortUUID().random(length=url_len)
+    def _statement(self, key: Any, build: Callable[[], Executable]) -> Executable:
+        """Выражение, собранное один раз на репозиторий; значения передаются через bindparam.
+
+        Повторно используемый select() не строится заново, а его ключ кеша запоминается
+        в самом объекте, так что скомпилированный SQL сразу находится в кеше движка.
+        """
+        statement = self._statements.get(key)
+        if statement is None:
+            statement = self._statements[key] = build()
+        return statement
+
+    def _columns(self, names: Sequence[str]) -> list:
+        """Колонки модели по именам атрибутов (включая column_property) как выражения Core.
+
+        Запрос только из них возвращает строки Row без ORM-объектов и identity map.
+        """
+        columns = self._model.__mapper__.columns
+        return [columns[name].label(name) for name in names]
 
     async def get(self, db: AsyncSession, id_: Any) -> Optional[ModelType]:
         statement = select(self._model).where(self._model.id_ == id_)
         results = await db.execute(statement=statement)
         return results.scalar_one_or_none()
 
-    async def get_for_shorten_url(self, db: AsyncSession, shorten_url_id: Any) -> Optional[ModelType]:
-        statement = select(self._model).where(self._model.link_id == shorten_url_id)
-        results = await db.execute(statement=statement)
-        return results.scalar_one_or_none()
+    async def get_for_shorten_url(
+            self, db: AsyncSession, shorten_url_id: Any, *, columns: Sequence[str],
+    ) -> Optional[Row]:
+        """Колонки columns ссылки по link_id"""
+        statement = self._statement(("get_for_shorten_url", *columns), lambda: select(
+            *self._columns(columns)
+        ).where(self._model.link_id == bindparam("link_id")))
+        return (await db.execute(statement, {"link_id": shorten_url_id})).one_or_none()
+
+    async def count(self, db: AsyncSession) -> int:
+        return (await db.execute(select(func.count()).select_from(self._model))).scalar_one()
+
+    async def stream_link_ids(
+            self,
+            db: AsyncSession,
+            *,
+            created_since: Optional[datetime] = None,
+            batch_size: int,
+    ) -> AsyncIterator[Sequence[tuple[str, datetime]]]:
+        """Пары (link_id, created_at) пачками через серверный курсор, не загружая всю таблицу"""
+        statement = select(self._model.link_id, self._model.created_at)
+        if created_since is not None:
+            statement = statement.where(self._model.created_at > created_since)
+        result = await db.stream(statement.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def get_last_use_at(self, db: AsyncSession, *, link_id: UUID) -> Optional[datetime]:
+        """Время последнего перехода: по индексу (short_link_id, use_at, id) - одна запись на секцию"""
+        result = await db.execute(select(func.max(self._model.use_at)).where(self._model.short_link_id == link_id))
+        return result.scalar_one()
+
+    async def stream_history(
+            self,
+            db: AsyncSession,
+            *,
+            link_id: UUID,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int,
+    ) -> AsyncIterator[Sequence[tuple[datetime, str]]]:
+        """Пары (use_at, client_ip) истории ссылки в порядке (use_at, id) пачками через серверный курсор"""
+        statement = select(self._model.use_at, self._model.client_ip).where(self._model.short_link_id == link_id)
+        if since is not None:
+            statement = statement.where(self._model.use_at >= since)
+        if until is not None:
+            statement = statement.where(self._model.use_at < until)
+        statement = statement.order_by(self._model.use_at, self._model.id)
+        result = await db.stream(statement.execution_options(yield_per=batch_size))
+        async for partition in result.partitions():
+            yield partition
+
+    async def get_many_for_shorten_urls(
+            self, db: AsyncSession, shorten_url_ids: list[str], *, columns: Sequence[str],
+    ) -> Sequence[Row]:
+        """Колонки columns ссылок по списку link_id одним запросом с параметром-массивом (= ANY)"""
+        if not shorten_url_ids:
+            return []
+        statement = self._statement(("get_many_for_shorten_urls", *columns), lambda: select(
+            *self._columns(columns)
+        ).where(self._model.link_id == any_(bindparam("link_ids", type_=ARRAY(String)))))
+        return (await db.execute(statement, {"link_ids": shorten_url_ids})).all()
+
+    async def get_most_clicked(self, db: AsyncSession, *, counters: Type[Base], limit: int) -> list[ModelType]:
+        """Активные ссылки с наибольшим числом переходов: usages_count плюс сумма шардов counters"""
+        totals = (
+            select(counters.short_link_id, func.sum(counters.count).label("total"))
+            .group_by(counters.short_link_id)
+            .subquery()
+        )
+        statement = (
+            select(self._model)
+            .outerjoin(totals, totals.c.short_link_id == self._model.id)
+            .where(self._model.is_active.is_(True))
+            .order_by((self._model.usages_count + func.coalesce(totals.c.total, 0)).desc())
+            .limit(limit)
+        )
+        return list((await db.execute(statement)).scalars().all())
+
+    async def get_active_by_hashes(self, db: AsyncSession, *, hashes: list[bytes]) -> dict[bytes, str]:
+        """link_id активных ссылок по хешам original_link.
+
+        Хеши передаются одним параметром-массивом (= ANY), поэтому размер пачки
+        не упирается в лимит параметров запроса.
+        """
+        if not hashes:
+            return {}
+        statement = select(self._model.original_link_hash, self._model.link_id).where(
+            self._model.original_link_hash == any_(bindparam("hashes", value=hashes, type_=ARRAY(LargeBinary))),
+            self._model.is_active.is_(True),
+        )
+        result = await db.execute(statement)
+        return dict(result.all())
+
+    def _column_values(self, data: dict) -> dict:
+        # Поля схемы без колонки в модели (вычисляемый short_link) не записываются
+        columns = self._model.__table__.columns
+        return {key: value for key, value in data.items() if key in columns}
 
     async def create(self, db: AsyncSession, *, obj_in: CreateSchemaType) -> ModelType:
-        obj_in_data = jsonable_encoder(obj_in)
+        obj_in_data = self._column_values(jsonable_encoder(obj_in))
         db_obj = self._model(**obj_in_data)
         db.add(db_obj)
         await db.commit()
@@ -80,15 +198,229 @@ class RepositoryDB(Repository, Generic[ModelType, CreateSchemaType, UpdateSchema
         await db.refresh(db_obj)
         return db_obj
 
-    async def delete(self, db: AsyncSession, *, db_obj: ModelType,) -> ModelType:
-        db.add(db_obj)
-        await db.execute(update(self._model).where(self._model.id == db_obj.id).values({"is_active": False}))
+    async def bulk_insert(self, db: AsyncSession, *, rows: list[dict]) -> None:
+        """Многострочный INSERT без загрузки ORM-объектов; коммит - на вызывающей стороне"""
+        if rows:
+            await db.execute(insert(self._model).values(rows))
+
+    async def bulk_increment_counters(self, db: AsyncSession, *, deltas: Mapping[UUID, int], shards: int) -> None:
+        """Атомарно прибавляет счётчики всех ссылок одним INSERT ... ON CONFLICT DO UPDATE.
+
+        Для каждой ссылки выбирается случайный шард, инкремент выполняется на стороне БД.
+        Строки идут в порядке short_link_id, чтобы параллельные сбросы разных воркеров
+        блокировали общие строки в одном порядке и не взаимоблокировались.
+        """
+        if not deltas:
+            return
+        statement = pg_insert(self._model).values(
+            [
+                {"short_link_id": short_link_id, "shard": random.randrange(shards), "count": delta}
+                for short_link_id, delta in sorted(deltas.items())
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.short_link_id, self._model.shard],
+            set_={"count": self._model.count + statement.excluded.count},
+        )
+        await db.execute(statement)
+
+    async def get_counter_total(self, db: AsyncSession, *, short_link_id: UUID) -> int:
+        """Сумма счётчика ссылки по всем шардам"""
+        result = await db.execute(
+            select(func.coalesce(func.sum(self._model.count), 0)).where(self._model.short_link_id == short_link_id)
+        )
+        return int(result.scalar_one())
+
+    async def get_counter_totals(self, db: AsyncSession, *, short_link_ids: list[UUID]) -> dict[UUID, int]:
+        """Суммы счётчиков нескольких ссылок одним GROUP BY; ссылок без переходов в ответе нет"""
+        if not short_link_ids:
+            return {}
+        result = await db.execute(
+            select(self._model.short_link_id, func.sum(self._model.count))
+            .where(self._model.short_link_id == any_(
+                bindparam("short_link_ids", value=short_link_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+            ))
+            .group_by(self._model.short_link_id)
+        )
+        return {short_link_id: int(total) for short_link_id, total in result.all()}
+
+    async def merge_sketches(self, db: AsyncSession, *, sketches: Mapping[tuple[UUID, date], HyperLogLog]) -> None:
+        """Сливает скетчи посетителей с сохранёнными; коммит - на вызывающей стороне.
+
+        Новые строки вставляются как есть, существующие блокируются SELECT ... FOR UPDATE
+        и перезаписываются слиянием. Ключи обходятся в одном порядке, чтобы параллельные
+        сбросы разных воркеров не взаимоблокировались.
+        """
+        if not sketches:
+            return
+        keys = sorted(sketches)
+        inserted = await db.execute(
+            pg_insert(self._model)
+            .values([
+                {"short_link_id": short_link_id, "day": day, "sketch": sketches[short_link_id, day].to_bytes()}
+                for short_link_id, day in keys
+            ])
+            .on_conflict_do_nothing()
+            .returning(self._model.short_link_id, self._model.day)
+        )
+        inserted_keys = set(map(tuple, inserted.all()))
+        existing = [key for key in keys if key not in inserted_keys]
+        if not existing:
+            return
+        stored = await db.execute(
+            select(self._model.short_link_id, self._model.day, self._model.sketch)
+            .where(tuple_(self._model.short_link_id, self._model.day).in_(existing))
+            .order_by(self._model.short_link_id, self._model.day)
+            .with_for_update()
+        )
+        await db.execute(update(self._model), [
+            {
+                "short_link_id": short_link_id,
+                "day": day,
+                "sketch": HyperLogLog.from_bytes(sketch).merge(sketches[short_link_id, day]).to_bytes(),
+            }
+            for short_link_id, day, sketch in stored.all()
+        ])
+
+    async def get_sketches(
+            self,
+            db: AsyncSession,
+            *,
+            short_link_id: UUID,
+            since: Optional[date] = None,
+            until: Optional[date] = None,
+    ) -> list[bytes]:
+        """Скетч за всё время или, если задан диапазон, дневные скетчи за него"""
+        statement = select(self._model.sketch).where(self._model.short_link_id == short_link_id)
+        if since is None and until is None:
+            statement = statement.where(self._model.day == ALL_TIME)
+        else:
+            statement = statement.where(self._model.day != ALL_TIME)
+            if since is not None:
+                statement = statement.where(self._model.day >= since)
+            if until is not None:
+                statement = statement.where(self._model.day <= until)
+        return list((await db.execute(statement)).scalars().all())
+
+    async def bulk_increment_rollups(self, db: AsyncSession, *, deltas: Mapping[tuple[UUID, datetime], int]) -> None:
+        """Прибавляет переходы к минутным корзинам роллапа; коммит - на вызывающей стороне.
+
+        Ключи отсортированы, чтобы параллельные сбросы разных воркеров блокировали строки
+        в одном порядке.
+        """
+        if not deltas:
+            return
+        statement = pg_insert(self._model).values(
+            [
+                {"short_link_id": short_link_id, "bucket_start": start, "granularity": 0, "count": delta}
+                for (short_link_id, start), delta in sorted(deltas.items())
+            ]
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.short_link_id, self._model.bucket_start, self._model.granularity],
+            set_={"count": self._model.count + statement.excluded.count},
+        )
+        await db.execute(statement)
+
+    async def compact_rollups(self, db: AsyncSession, *, source: str, target: str, border: datetime) -> int:
+        """Переносит корзины source старше border в корзины target одним запросом.
+
+        DELETE ... RETURNING в CTE и INSERT ... ON CONFLICT DO UPDATE выполняются атомарно,
+        поэтому переход не теряется и не учитывается дважды. Возвращает число корзин target.
+        """
+        # date_trunc(:bucket, ...) с параметром Postgres не сопоставит с тем же выражением в GROUP BY
+        truncate = literal_column(f"'{ROLLUP_BUCKETS[ROLLUP_BUCKETS.index(target)]}'")
+        moved = (
+            delete(self._model)
+            .where(self._model.granularity == ROLLUP_BUCKETS.index(source), self._model.bucket_start < border)
+            .returning(self._model.short_link_id, self._model.bucket_start, self._model.count)
+            .cte("moved")
+        )
+        start = func.date_trunc(truncate, moved.c.bucket_start)
+        statement = pg_insert(self._model).from_select(
+            ["short_link_id", "bucket_start", "granularity", "count"],
+            select(moved.c.short_link_id, start, literal(ROLLUP_BUCKETS.index(target)), func.sum(moved.c.count))
+            .group_by(moved.c.short_link_id, start),
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[self._model.short_link_id, self._model.bucket_start, self._model.granularity],
+            set_={"count": self._model.count + statement.excluded.count},
+        )
+        result = await db.execute(statement)
+        await db.commit()
+        return result.rowcount
+
+    async def get_rollups(
+            self,
+            db: AsyncSession,
+            *,
+            short_link_id: UUID,
+            bucket: str,
+            since: datetime,
+            until: datetime,
+    ) -> list[tuple[datetime, int]]:
+        """Сумма корзин ссылки любой гранулярности, сгруппированная по началу корзины bucket"""
+        truncate = literal_column(f"'{ROLLUP_BUCKETS[ROLLUP_BUCKETS.index(bucket)]}'")
+        start = func.date_trunc(truncate, self._model.bucket_start)
+        result = await db.execute(
+            select(start, func.sum(self._model.count))
+            .where(
+                self._model.short_link_id == short_link_id,
+                self._model.bucket_start >= since,
+                self._model.bucket_start < until,
+            )
+            .group_by(start)
+            .order_by(start)
+        )
+        return [(bucket_start, int(count)) for bucket_start, count in result.all()]
+
+    async def delete_many(self, db: AsyncSession, *, shorten_url_ids: list[str]) -> dict[str, bool]:
+        """Деактивирует ссылки по списку link_id одним UPDATE ... RETURNING.
+
+        Возвращает для каждой найденной ссылки, была ли она активна до запроса; строки
+        блокируются в подзапросе FOR UPDATE, поэтому параллельное удаление той же ссылки
+        увидит её уже неактивной.
+        """
+        if not shorten_url_ids:
+            return {}
+        previous = (
+            select(self._model.id, self._model.is_active.label("was_active"))
+            .where(self._model.link_id == any_(bindparam("link_ids", value=shorten_url_ids, type_=ARRAY(String))))
+            .with_for_update()
+            .subquery()
+        )
+        # Core-таблица: ORM-UPDATE не умеет возвращать колонки подзапроса из FROM
+        table = self._model.__table__
+        result = await db.execute(
+            update(table)
+            .where(table.c.id == previous.c.id)
+            .values({"is_active": False})
+            .returning(table.c.link_id, previous.c.was_active)
+        )
+        deleted = {link_id: bool(was_active) for link_id, was_active in result.all()}
+        await db.commit()
+        return deleted
+
+    async def get_all_time_sketches(self, db: AsyncSession, *, short_link_ids: list[UUID]) -> dict[UUID, bytes]:
+        """Скетчи посетителей за всё время для нескольких ссылок одним запросом"""
+        if not short_link_ids:
+            return {}
+        result = await db.execute(
+            select(self._model.short_link_id, self._model.sketch).where(
+                self._model.short_link_id == any_(
+                    bindparam("short_link_ids", value=short_link_ids, type_=ARRAY(PG_UUID(as_uuid=True)))
+                ),
+                self._model.day == ALL_TIME,
+            )
+        )
+        return dict(result.all())
+
+    async def delete(self, db: AsyncSession, *, id_: Any) -> None:
+        await db.execute(update(self._model).where(self._model.id == id_).values({"is_active": False}))
         await db.commit()
-        await db.refresh(db_obj)
-        return db_obj
 
     async def update_multi(self, db: AsyncSession, *, objects_in: CreateSchemaType):
-        db_objects = [self._model(**jsonable_encoder(obj_in)) for obj_in in objects_in.__root__]
+        db_objects = [self._model(**self._column_values(jsonable_encoder(obj_in))) for obj_in in objects_in.__root__]
         db.add_all(db_objects)
         await db.commit()
         db.expire_all()
@@ -97,11 +429,88 @@ class RepositoryDB(Repository, Generic[ModelType, CreateSchemaType, UpdateSchema
         )
         return db_objects.scalars().all()
 
-    async def get_detail_history(self, db: AsyncSession, *, link_id: UUID, limit: int, offset):
-        db_objects = await db.execute(
-            select(self._model).where(self._model.short_link_id == link_id).offset(offset).limit(limit)
+    async def bulk_create(self, db: AsyncSession, *, rows: list[dict], chunk_size: int) -> dict[str, Optional[str]]:
+        """Вставляет ссылки пачками по chunk_size, по одному INSERT ... RETURNING на пачку.
+
+        Возвращает для каждого link_id None при успехе или текст ошибки. Конфликты link_id
+        не прерывают вставку; если пачка падает целиком, её строки вставляются по одной,
+        чтобы одна плохая строка не роняла остальные.
+        """
+        results: dict[str, Optional[str]] = {}
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start + chunk_size]
+            try:
+                inserted = await self._insert_returning_link_ids(db, chunk)
+            except DBAPIError as err:
+                logger.warning("bulk_create chunk failed, retrying row by row: %s", err.orig)
+                inserted = set()
+                for row in chunk:
+                    try:
+                        inserted |= await self._insert_returning_link_ids(db, [row])
+                    except DBAPIError as row_err:
+                        results[row["link_id"]] = str(row_err.orig)
+            for row in chunk:
+                results.setdefault(row["link_id"], None if row["link_id"] in inserted else LINK_ID_CONFLICT)
+        return results
+
+    async def _insert_returning_link_ids(self, db: AsyncSession, rows: list[dict]) -> set[str]:
+        statement = (
+            pg_insert(self._model)
+            .values([self._column_values(row) for row in rows])
+            .on_conflict_do_nothing(index_elements=[self._model.link_id])
+            .returning(self._model.link_id)
         )
-        return db_objects.scalars().all()
+        try:
+            result = await db.execute(statement)
+            inserted = set(result.scalars().all())
+            await db.commit()
+        except DBAPIError:
+            await db.rollback()
+            raise
+        return inserted
+
+    async def get_detail_history(
+            self,
+            db: AsyncSession,
+            *,
+            link_id: UUID,
+            columns: Sequence[str],
+            limit: int,
+            offset: int = 0,
+            after: Optional[HistoryCursor] = None,
+    ) -> tuple[Sequence[Row], Optional[HistoryCursor]]:
+        """Страница истории (колонки columns, среди них use_at и id) в порядке (use_at, id) и курсор следующей.
+
+        С курсором используется keyset-пагинация по индексу (short_link_id, use_at, id),
+        поэтому глубокие страницы стоят столько же, сколько первая; offset оставлен
+        для обратной совместимости.
+        """
+        statement = self._statement(("get_detail_history", after is not None, *columns), lambda: self._history_page(
+            columns, keyset=after is not None,
+        ))
+        params = {"link_id": link_id, "limit": limit + 1}
+        if after is not None:
+            params.update(after_use_at=after.use_at, after_id=after.id)
+        else:
+            params.update(offset=offset)
+        rows = (await db.execute(statement, params)).all()
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, HistoryCursor(rows[-1].use_at, rows[-1].id)
+
+    def _history_page(self, columns: Sequence[str], *, keyset: bool) -> Executable:
+        statement = select(*self._columns(columns)).where(self._model.short_link_id == bindparam("link_id"))
+        if keyset:
+            statement = statement.where(
+                tuple_(self._model.use_at, self._model.id) > tuple_(
+                    bindparam("after_use_at", type_=self._model.use_at.type),
+                    bindparam("after_id", type_=self._model.id.type),
+                )
+            )
+        else:
+            statement = statement.offset(bindparam("offset"))
+        return statement.order_by(self._model.use_at, self._model.id).limit(bindparam("limit"))
 
     @staticmethod
     async def ping_db(db: AsyncSession) -> bool:
@@ -0,0 +1,211 @@
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.metrics import metrics
+from services.storage import LinkStorage
+
+logger = logging.getLogger(__name__)
+
+link_filter_bytes = metrics.gauge("link_filter_bytes", "Memory used by the link_id bloom filter")
+link_filter_items = metrics.gauge("link_filter_items", "link_ids added to the bloom filter")
+link_filter_fp_rate = metrics.gauge("link_filter_false_positive_rate", "Estimated bloom filter false positive rate")
+link_filter_rejections = metrics.counter(
+    "link_filter_rejections_total", "Lookups answered 404 by the bloom filter without the database",
+)
+
+
+class BloomFilter:
+    """Фильтр Блума: «точно нет» без ложноотрицательных ответов, «возможно есть» с вероятностью ошибки.
+
+    Позиции битов - двойное хеширование h1 + i * h2 по одному 128-битному blake2b.
+    """
+
+    def __init__(self, size_bytes: int, hash_count: int):
+        if size_bytes <= 0 or hash_count <= 0:
+            raise ValueError("size_bytes and hash_count must be positive")
+        self._bits = bytearray(size_bytes)
+        self._size = size_bytes * 8
+        self.hash_count = hash_count
+        self.count = 0
+
+    @classmethod
+    def for_capacity(cls, capacity: int, error_rate: float, max_bytes: int) -> "BloomFilter":
+        """Фильтр, дающий error_rate на capacity элементах, но не больше max_bytes"""
+        capacity = max(capacity, 1)
+        bits = math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2)
+        size_bytes = min(max(bits // 8 + 1, 64), max_bytes)
+        hash_count = max(1, round(size_bytes * 8 / capacity * math.log(2)))
+        return cls(size_bytes, hash_count)
+
+    @property
+    def size_bytes(self) -> int:
+        return len(self._bits)
+
+    def _positions(self, key: str) -> Iterable[int]:
+        digest = hashlib.blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        size = self._size
+        return ((h1 + i * h2) % size for i in range(self.hash_count))
+
+    def add(self, key: str) -> None:
+        bits = self._bits
+        is_new = False
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                is_new = True
+        # Повторное добавление (дочитывание с запасом по времени) не меняет счётчик
+        if is_new:
+            self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self._bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def false_positive_rate(self) -> float:
+        """Оценка доли ложноположительных ответов при текущем заполнении"""
+        return (1 - math.exp(-self.hash_count * self.count / self._size)) ** self.hash_count
+
+
+class LinkIdFilter:
+    """Фильтр Блума по всем link_id, отсекающий запросы несуществующих ссылок без БД.
+
+    Строится в фоне при старте потоковым чтением link_id. Ссылки, созданные этим
+    процессом, добавляются сразу; созданные другими процессами (скрипты, импорт)
+    дочитываются каждые refresh_interval секунд по created_at (с запасом overlap на
+    расхождение часов и долгие транзакции) и до этого отвечали бы 404. Поэтому при
+    нескольких воркерах (WEB_CONCURRENCY > 1) фильтр не запускается. Раз в
+    rebuild_interval, а также при заполнении сверх расчётной ёмкости фильтр
+    пересоздаётся под текущее число ссылок, чтобы ошибка оставалась около error_rate.
+    Пока фильтр не построен, он ничего не отсекает.
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            *,
+            storage: LinkStorage,
+            error_rate: float,
+            max_bytes: int,
+            refresh_interval: float,
+            rebuild_interval: float,
+            overlap: float = 60.0,
+            growth: float = 2.0,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self._error_rate = error_rate
+        self._max_bytes = max_bytes
+        self._refresh_interval = refresh_interval
+        self._rebuild_interval = rebuild_interval
+        self._overlap = timedelta(seconds=overlap)
+        self._growth = growth
+        self._filter: Optional[BloomFilter] = None
+        self._capacity = 0
+        self._watermark: Optional[datetime] = None
+        self._built_at = 0.0
+        # link_id, добавленные во время перестроения, - их нужно перенести в новый фильтр
+        self._added_while_building: Optional[list[str]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_ready(self) -> bool:
+        return self._filter is not None
+
+    def might_exist(self, link_id: str) -> bool:
+        if self._filter is None or link_id in self._filter:
+            return True
+        link_filter_rejections.inc()
+        return False
+
+    def add(self, link_ids: Iterable[str]) -> None:
+        link_ids = list(link_ids)
+        if self._added_while_building is not None:
+            self._added_while_building.extend(link_ids)
+        if self._filter is not None:
+            for link_id in link_ids:
+                self._filter.add(link_id)
+            link_filter_items.set(self._filter.count)
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if (
+                        self._filter is None
+                        or time.monotonic() - self._built_at >= self._rebuild_interval
+                        or self._filter.count > self._capacity
+                ):
+                    await self.rebuild()
+                else:
+                    await self.refresh()
+            except Exception as err:
+                logger.exception("link filter update failed: %s", err)
+            await asyncio.sleep(self._refresh_interval)
+
+    async def rebuild(self) -> None:
+        started = time.perf_counter()
+        started_at = datetime.utcnow()
+        self._added_while_building = []
+        try:
+            async with self.session_factory() as db:
+                count = await self.storage.count_links(db)
+                capacity = int(count * self._growth) + 1000
+                bloom = BloomFilter.for_capacity(capacity, self._error_rate, self._max_bytes)
+                watermark = await self._load(db, bloom, created_since=None)
+            for link_id in self._added_while_building:
+                bloom.add(link_id)
+        finally:
+            self._added_while_building = None
+        self._filter, self._capacity, self._built_at = bloom, capacity, time.monotonic()
+        # Пустая таблица: дочитываем ссылки, созданные после начала построения
+        self._watermark = watermark or started_at
+        link_filter_bytes.set(bloom.size_bytes)
+        link_filter_items.set(bloom.count)
+        link_filter_fp_rate.set(bloom.false_positive_rate())
+        logger.info(
+            "link filter built: links: %s, bytes: %s, hashes: %s, estimated fp rate: %.4f, took %.2fs",
+            bloom.count, bloom.size_bytes, bloom.hash_count, bloom.false_positive_rate(),
+            time.perf_counter() - started,
+        )
+
+    async def refresh(self) -> None:
+        """Дочитывает ссылки, созданные другими воркерами"""
+        created_since = self._watermark - self._overlap if self._watermark else None
+        async with self.session_factory() as db:
+            watermark = await self._load(db, self._filter, created_since=created_since)
+        if watermark and (self._watermark is None or watermark > self._watermark):
+            self._watermark = watermark
+        link_filter_items.set(self._filter.count)
+        link_filter_fp_rate.set(self._filter.false_positive_rate())
+
+    async def _load(self, db, bloom: BloomFilter, *, created_since: Optional[datetime]) -> Optional[datetime]:
+        watermark = None
+        async for batch in self.storage.stream_link_ids(db, created_since=created_since):
+            for link_id, created_at in batch:
+                bloom.add(link_id)
+                if created_at is not None and (watermark is None or created_at > watermark):
+                    watermark = created_at
+        return watermark
@@ -0,0 +1,93 @@
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+from uuid import UUID
+
+from core.config import DEFAULT_REDIRECT_STATUS
+
+
+class LinkCacheEntry(NamedTuple):
+    """Закешированный результат разрешения короткой ссылки"""
+
+    id: UUID
+    original_link: str
+    is_active: bool
+    redirect_status: int = DEFAULT_REDIRECT_STATUS
+    cache_max_age: Optional[int] = None
+
+    @classmethod
+    def from_link(cls, link: Any) -> "LinkCacheEntry":
+        """Запись для ссылки хранилища (LinkRecord или ORM-объекта ShortLink)"""
+        return cls(link.id, link.original_link, link.is_active, link.redirect_status, link.cache_max_age)
+
+
+# Признак отсутствия ключа в кеше (в отличие от закешированного 404 - None)
+MISS: Any = object()
+
+
+class LinkCache:
+    """Ограниченный по размеру LRU-кеш link_id -> LinkCacheEntry с TTL.
+
+    Отрицательные результаты (404 - ссылки нет, 410 - ссылка удалена) хранятся
+    с отдельным, более коротким TTL. Кеш живёт в памяти процесса, поэтому
+    в других воркерах удаление ссылки станет видно не позже чем через TTL.
+
+    Чтение из БД, начатое до invalidate, не должно вернуть в кеш устаревшую запись:
+    invalidate ставит ключу метку поколения, и put с меткой, взятой через version()
+    до чтения, отбрасывается, если ключ с тех пор инвалидировали. Меток хранится не
+    больше max_size; для вытесненных ключей берётся метка последней вытесненной.
+    """
+
+    def __init__(self, max_size: int, ttl: float, negative_ttl: float):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._negative_ttl = negative_ttl
+        self._data: OrderedDict[str, tuple[float, Optional[LinkCacheEntry]]] = OrderedDict()
+        self._generation = 0
+        self._invalidated: OrderedDict[str, int] = OrderedDict()
+        self._evicted_generation = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, link_id: str) -> Optional[LinkCacheEntry]:
+        """Возвращает запись, None для закешированного 404 или MISS"""
+        item = self._data.get(link_id)
+        if item is None:
+            return MISS
+        expires_at, entry = item
+        if expires_at < time.monotonic():
+            del self._data[link_id]
+            return MISS
+        self._data.move_to_end(link_id)
+        return entry
+
+    def version(self) -> int:
+        """Метка для put после чтения из БД; берётся до начала чтения"""
+        return self._generation
+
+    def put(self, link_id: str, entry: Optional[LinkCacheEntry], version: Optional[int] = None) -> None:
+        if self._max_size <= 0:
+            return
+        if version is not None and self._invalidated.get(link_id, self._evicted_generation) > version:
+            # Ключ инвалидировали, пока шло чтение: запись могла устареть
+            return
+        ttl = self._ttl if entry is not None and entry.is_active else self._negative_ttl
+        self._data[link_id] = (time.monotonic() + ttl, entry)
+        self._data.move_to_end(link_id)
+        while len(self._data) > self._max_size:
+            self._data.popitem(last=False)
+
+    def invalidate(self, link_id: str) -> None:
+        self._data.pop(link_id, None)
+        self._generation += 1
+        self._invalidated[link_id] = self._generation
+        self._invalidated.move_to_end(link_id)
+        while len(self._invalidated) > self._max_size:
+            _, self._evicted_generation = self._invalidated.popitem(last=False)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._generation += 1
+        self._invalidated.clear()
+        self._evicted_generation = self._generation
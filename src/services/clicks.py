@@ -0,0 +1,121 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Callable, NamedTuple, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.storage import LinkStorage
+
+logger = logging.getLogger(__name__)
+
+
+class ClickEvent(NamedTuple):
+    """Переход по короткой ссылке, ожидающий записи в БД"""
+
+    short_link_id: UUID
+    client_ip: str
+    use_at: datetime
+
+
+class ClickRecorder:
+    """Буферизованная запись переходов вне критического пути редиректа.
+
+    Обработчик кладёт событие в очередь и сразу отвечает клиенту. Фоновая
+    задача собирает события в пачки (не больше batch_size или за
+    flush_interval секунд) и пишет их в хранилище одной транзакцией: в Postgres
+    история - одним многострочным INSERT, счётчики - одним атомарным upsert
+    в шарды short_link_counter.
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            *,
+            storage: LinkStorage,
+            batch_size: int,
+            flush_interval: float,
+            queue_size: int,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._queue: asyncio.Queue[Optional[ClickEvent]] = asyncio.Queue(maxsize=queue_size)
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self) -> None:
+        if self.is_running:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("click recorder started")
+
+    async def stop(self) -> None:
+        """Останавливает фоновую задачу, дописав всё, что осталось в очереди"""
+        if not self.is_running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        logger.info("click recorder stopped")
+
+    async def record(self, event: ClickEvent) -> None:
+        if not self.is_running:
+            # Без фоновой задачи (скрипты, тесты) пишем сразу
+            await self.flush([event])
+            return
+        # Ждём только при переполненной очереди - это и есть backpressure
+        await self._queue.put(event)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            event = await self._queue.get()
+            if event is None:
+                break
+            batch = [event]
+            deadline = loop.time() + self._flush_interval
+            while len(batch) < self._batch_size:
+                try:
+                    event = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        event = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if event is None:
+                    stopping = True
+                    break
+                batch.append(event)
+            await self.flush(batch)
+        await self._drain()
+
+    async def _drain(self) -> None:
+        batch: list[ClickEvent] = []
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is not None:
+                batch.append(event)
+            if len(batch) >= self._batch_size:
+                await self.flush(batch)
+                batch = []
+        if batch:
+            await self.flush(batch)
+
+    async def flush(self, batch: list[ClickEvent]) -> None:
+        try:
+            async with self.session_factory() as db:
+                await self.storage.record_clicks(db, events=batch)
+        except Exception as err:
+            logger.exception("click recorder flush failed, %s clicks lost: %s", len(batch), err)
+            return
+        logger.debug("click recorder flushed %s clicks", len(batch))
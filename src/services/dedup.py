@@ -0,0 +1,47 @@
+import hashlib
+from typing import Optional
+from urllib.parse import urlsplit, urlunsplit
+
+from core.config import DEFAULT_REDIRECT_STATUS
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url: str) -> str:
+    """Приводит URL к каноническому виду для поиска повторов.
+
+    Схема и хост - в нижнем регистре, порт по умолчанию и фрагмент отбрасываются,
+    пустой путь заменяется на "/". Путь и query не меняются: они чувствительны к регистру.
+    URL, который urlsplit не разбирает (неверный порт, незакрытый IPv6-хост), возвращается
+    как есть: проверку check_http_link он проходит, и ссылка на него всё равно создаётся.
+    """
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return url.strip()
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = host if port is None or DEFAULT_PORTS.get(scheme) == port else f"{host}:{port}"
+    if parts.username is not None:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def url_hash(url: str) -> bytes:
+    """SHA-256 нормализованного URL: фиксированные 32 байта вместо неограниченного текста"""
+    return hashlib.sha256(normalize_url(url).encode()).digest()
+
+
+def link_hash(url: str, redirect_status: int = DEFAULT_REDIRECT_STATUS, cache_max_age: Optional[int] = None) -> bytes:
+    """Ключ поиска повторов: URL вместе с политикой редиректа.
+
+    Для политики по умолчанию совпадает с url_hash, поэтому хеши существующих ссылок
+    не меняются, а ссылка с 301 не выдаётся тому, кому нужен учёт каждого перехода.
+    """
+    if redirect_status == DEFAULT_REDIRECT_STATUS and cache_max_age is None:
+        return url_hash(url)
+    return hashlib.sha256(f"{redirect_status} {cache_max_age} {normalize_url(url)}".encode()).digest()
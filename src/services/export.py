@@ -0,0 +1,32 @@
+import csv
+import io
+from datetime import datetime
+from typing import AsyncIterator, Sequence
+
+import orjson
+
+# Форматы выгрузки истории и их media type
+EXPORT_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+CSV_HEADER = ("use_at", "client_ip")
+
+
+async def encode_history(batches: AsyncIterator[Sequence[tuple[datetime, str]]], fmt: str) -> AsyncIterator[bytes]:
+    """Кодирует пачки (use_at, client_ip) в NDJSON или CSV, по одному куску ответа на пачку"""
+    if fmt == "ndjson":
+        async for batch in batches:
+            yield b"".join(
+                orjson.dumps({"use_at": use_at, "client_ip": client_ip}, option=orjson.OPT_APPEND_NEWLINE)
+                for use_at, client_ip in batch
+            )
+        return
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(CSV_HEADER)
+    async for batch in batches:
+        writer.writerows((use_at.isoformat(), client_ip) for use_at, client_ip in batch)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        # История пуста: остался только заголовок
+        yield buffer.getvalue().encode()
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from shortuuid import ShortUUID
+from sqlalchemy import func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+logger = logging.getLogger(__name__)
+
+BASE62_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+# Последовательность, создаваемая миграцией
+LINK_ID_BLOCK_SEQUENCE = "short_link_id_block_seq"
+# Первый ключ advisory-блокировок номеров воркеров snowflake, второй - сам номер
+WORKER_ID_LOCK_NAMESPACE = 0x51F1
+
+
+def base62_encode(number: int) -> str:
+    if number < 0:
+        raise ValueError("number must be non-negative")
+    if number == 0:
+        return BASE62_ALPHABET[0]
+    chars = []
+    while number:
+        number, rest = divmod(number, 62)
+        chars.append(BASE62_ALPHABET[rest])
+    return "".join(reversed(chars))
+
+
+class IdGenerator:
+    """Генератор идентификаторов коротких ссылок (link_id)"""
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+    async def next_id(self, db: AsyncSession) -> str:
+        raise NotImplementedError
+
+    async def next_ids(self, db: AsyncSession, count: int) -> list[str]:
+        return [await self.next_id(db) for _ in range(count)]
+
+
+class RandomIdGenerator(IdGenerator):
+    """Случайные идентификаторы фиксированной длины (исходное поведение сервиса).
+
+    Уникальность не гарантируется: повтор упирается в уникальный индекс link_id.
+    """
+
+    def __init__(self, length: int):
+        self._length = length
+        self._shortuuid = ShortUUID()
+
+    async def next_id(self, db: AsyncSession) -> str:
+        return self._shortuuid.random(length=self._length)
+
+    async def next_ids(self, db: AsyncSession, count: int) -> list[str]:
+        return [self._shortuuid.random(length=self._length) for _ in range(count)]
+
+
+class BlockSequenceIdGenerator(IdGenerator):
+    """Номер из последовательности Postgres, закодированный в base62.
+
+    Последовательность шагает сразу на размер блока (INCREMENT BY), поэтому один
+    nextval резервирует за воркером целый диапазон номеров и обращение к БД нужно раз
+    в блок ссылок. Размер блока читается из самой последовательности, так что
+    диапазоны разных воркеров не пересекаются. Пока номер меньше 62**9, идентификатор
+    короче 10 символов и не совпадает со случайными link_id.
+    """
+
+    def __init__(self, sequence: str = LINK_ID_BLOCK_SEQUENCE):
+        self._sequence = sequence
+        self._block_size: Optional[int] = None
+        # Зарезервированные, но ещё не выданные диапазоны [next, end)
+        self._ranges: deque[list[int]] = deque()
+        self._lock = asyncio.Lock()
+
+    async def next_id(self, db: AsyncSession) -> str:
+        return (await self.next_ids(db, 1))[0]
+
+    async def next_ids(self, db: AsyncSession, count: int) -> list[str]:
+        numbers: list[int] = []
+        async with self._lock:
+            while len(numbers) < count:
+                if not self._ranges:
+                    await self._reserve(db, count - len(numbers))
+                current = self._ranges[0]
+                take = min(count - len(numbers), current[1] - current[0])
+                numbers.extend(range(current[0], current[0] + take))
+                current[0] += take
+                if current[0] >= current[1]:
+                    self._ranges.popleft()
+        return [base62_encode(number) for number in numbers]
+
+    async def _reserve(self, db: AsyncSession, needed: int) -> None:
+        if self._block_size is None:
+            result = await db.execute(
+                text("SELECT increment_by FROM pg_sequences WHERE sequencename = :name"), {"name": self._sequence}
+            )
+            self._block_size = result.scalar_one()
+        # Один запрос резервирует столько блоков, сколько нужно под всю пачку
+        blocks = -(-needed // self._block_size)
+        result = await db.execute(select(func.nextval(self._sequence)).select_from(func.generate_series(1, blocks)))
+        for start in sorted(result.scalars().all()):
+            self._ranges.append([start, start + self._block_size])
+
+
+class SnowflakeIdGenerator(IdGenerator):
+    """Идентификатор вида время | воркер | счётчик, закодированный в base62.
+
+    39 бит миллисекунд от EPOCH_MS (~17 лет), 8 бит номера воркера и 12 бит счётчика
+    в пределах миллисекунды: 59 бит, то есть не больше 10 символов base62.
+
+    Номер воркера арендуется: процесс берёт session-level advisory-блокировку
+    (WORKER_ID_LOCK_NAMESPACE, номер) на отдельном соединении и держит её до stop().
+    Если процесс упадёт, Postgres снимет блокировку вместе с соединением, так что
+    одновременно работающие процессы не получат один номер. Явный worker_id тоже
+    блокируется, если есть engine, - занятый другим процессом номер даёт ошибку при старте.
+
+    Соединение аренды может оборваться и при живом процессе - тогда блокировка снята,
+    и номер может взять другой. Поэтому номера выдаются, только если соединение
+    отвечало не раньше lease_check_interval секунд назад; иначе оно проверяется, а
+    потерянная аренда берётся заново. Новый арендатор ждёт 2 * lease_check_interval,
+    прежде чем выдавать номера: за это время прежний владелец заметит потерю и перестанет.
+    """
+
+    EPOCH_MS = 1672531200000  # 2023-01-01T00:00:00Z
+    TIME_BITS = 39
+    WORKER_BITS = 8
+    SEQUENCE_BITS = 12
+
+    def __init__(
+            self,
+            worker_id: Optional[int] = None,
+            engine: Optional[AsyncEngine] = None,
+            *,
+            lease_check_interval: float = 1.0,
+    ):
+        if worker_id is not None and not 0 <= worker_id < 1 << self.WORKER_BITS:
+            raise ValueError(f"worker_id must be in [0, {1 << self.WORKER_BITS})")
+        if worker_id is None and engine is None:
+            raise ValueError("worker_id is required without a database to lease it from")
+        self._static_worker_id = worker_id
+        self._worker_id = worker_id if engine is None else None
+        self._engine = engine
+        self._lease: Optional[AsyncConnection] = None
+        self._lease_check_interval = lease_check_interval
+        self._lease_checked_at = 0.0
+        self._lock = asyncio.Lock()
+        self._last_ms = -1
+        self._counter = 0
+
+    @property
+    def worker_id(self) -> Optional[int]:
+        return self._worker_id
+
+    async def start(self) -> None:
+        async with self._lock:
+            await self._ensure_worker_id()
+
+    async def stop(self) -> None:
+        async with self._lock:
+            if self._lease is None:
+                return
+            # Закрытие соединения снимает блокировку
+            await self._lease.close()
+            self._lease = None
+            self._worker_id = None
+            logger.info("snowflake worker id released")
+
+    async def next_id(self, db: AsyncSession) -> str:
+        return (await self.next_ids(db, 1))[0]
+
+    async def next_ids(self, db: AsyncSession, count: int) -> list[str]:
+        # Под блокировкой: пока одна пачка ждёт следующую миллисекунду, другая не выдаёт номера
+        async with self._lock:
+            await self._ensure_worker_id()
+            return [base62_encode(await self._next_number()) for _ in range(count)]
+
+    async def _ensure_worker_id(self) -> None:
+        if self._lease is not None and time.monotonic() - self._lease_checked_at >= self._lease_check_interval:
+            await self._check_lease()
+        if self._worker_id is not None:
+            return
+        connection = await self._engine.connect()
+        try:
+            await connection.execution_options(isolation_level="AUTOCOMMIT")
+            candidates = (
+                range(1 << self.WORKER_BITS) if self._static_worker_id is None else (self._static_worker_id,)
+            )
+            for candidate in candidates:
+                locked = await connection.scalar(
+                    select(func.pg_try_advisory_lock(WORKER_ID_LOCK_NAMESPACE, candidate))
+                )
+                if locked:
+                    break
+            else:
+                if self._static_worker_id is not None:
+                    raise RuntimeError(f"worker id {self._static_worker_id} is leased by another process")
+                raise RuntimeError("all snowflake worker ids are leased by other processes")
+            # Прежний владелец номера, если потерял аренду, за это время перестанет его выдавать
+            await asyncio.sleep(2 * self._lease_check_interval)
+        except BaseException:
+            await connection.close()
+            raise
+        self._lease, self._worker_id = connection, candidate
+        self._lease_checked_at = time.monotonic()
+        logger.info("snowflake worker id %s leased", candidate)
+
+    async def _check_lease(self) -> None:
+        try:
+            await self._lease.scalar(select(1))
+        except Exception as err:
+            logger.error("snowflake worker id %s lease is lost, leasing again: %s", self._worker_id, err)
+            try:
+                await self._lease.close()
+            except Exception:
+                pass
+            self._lease = None
+            self._worker_id = None
+            return
+        self._lease_checked_at = time.monotonic()
+
+    async def _next_number(self) -> int:
+        now_ms = self._now_ms()
+        if now_ms < self._last_ms:
+            # Часы ушли назад: продолжаем с последней выданной миллисекунды
+            now_ms = self._last_ms
+        if now_ms == self._last_ms:
+            self._counter += 1
+            if self._counter >> self.SEQUENCE_BITS:
+                # Счётчик миллисекунды исчерпан - ждём следующую, не блокируя цикл событий
+                now_ms = self._last_ms + 1
+                while self._now_ms() < now_ms:
+                    await asyncio.sleep(0.0001)
+                self._counter = 0
+        else:
+            self._counter = 0
+        self._last_ms = now_ms
+        timestamp = (now_ms - self.EPOCH_MS) & ((1 << self.TIME_BITS) - 1)
+        return (
+            (timestamp << (self.WORKER_BITS + self.SEQUENCE_BITS))
+            | (self._worker_id << self.SEQUENCE_BITS)
+            | self._counter
+        )
+
+    @staticmethod
+    def _now_ms() -> int:
+        return time.time_ns() // 1_000_000
+
+
+def make_id_generator(
+        kind: str,
+        *,
+        length: int,
+        worker_id: Optional[int],
+        workers: int = 1,
+        engine: Optional[AsyncEngine] = None,
+) -> IdGenerator:
+    """Генератор по имени; engine - Postgres для block и аренды номеров воркеров snowflake"""
+    if kind == "random":
+        return RandomIdGenerator(length)
+    if kind == "block":
+        return BlockSequenceIdGenerator()
+    if kind == "snowflake":
+        if worker_id is not None and workers > 1:
+            # Без аренды все процессы получили бы один номер и одинаковые link_id
+            raise ValueError(f"ID_WORKER_ID is shared by all {workers} worker processes; leave it unset")
+        return SnowflakeIdGenerator(worker_id, engine)
+    raise ValueError(f"unknown id generator: {kind!r}")
@@ -0,0 +1,219 @@
+import bisect
+import time
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# charset starlette добавляет сам
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Ключ ASGI scope с шаблоном маршрута, который ставят обработчики в обход роутинга FastAPI
+ROUTE_KEY = "metrics.route"
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_START_TIMES = "metrics.start_times"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """Метрика в памяти процесса; значения хранятся по кортежу значений меток"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+
+    def samples(self) -> Iterable[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self) -> Iterable[str]:
+        for labels, value in list(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Gauge(Metric):
+    """Значение выставляется явно или читается функцией callback в момент сбора"""
+
+    kind = "gauge"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            callback: Optional[Callable[[], dict[tuple, float]]] = None,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple, float] = {}
+        self._callback = callback
+
+    def set(self, value: float, labels: tuple = ()) -> None:
+        self._values[labels] = value
+
+    def inc(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, labels: tuple = (), amount: float = 1) -> None:
+        self._values[labels] = self._values.get(labels, 0) - amount
+
+    def samples(self) -> Iterable[str]:
+        values = self._callback() if self._callback else self._values
+        for labels, value in list(values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {value}"
+
+
+class Histogram(Metric):
+    """Гистограмма с фиксированными границами; observe - это bisect и два сложения"""
+
+    kind = "histogram"
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            labelnames: tuple[str, ...] = (),
+            buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Метки -> [счётчики по корзинам (последняя - +Inf), сумма]
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, labels: tuple = ()) -> None:
+        state = self._values.get(labels)
+        if state is None:
+            state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        state[0][bisect.bisect_left(self.buckets, value)] += 1
+        state[1] += value
+
+    def samples(self) -> Iterable[str]:
+        for labels, (counts, total) in list(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                le_label = f'le="{le}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le_label)} {cumulative}"
+            suffix = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{suffix} {total}"
+            yield f"{self.name}_count{suffix} {cumulative}"
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: dict[str, Metric] = {}
+
+    def register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), callback=None) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames, callback))
+
+    def histogram(
+            self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=DEFAULT_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics.values()) + "\n"
+
+
+metrics = MetricsRegistry()
+
+http_requests_total = metrics.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status"),
+)
+http_request_duration = metrics.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route", ("method", "route"),
+)
+http_requests_in_flight = metrics.gauge("http_requests_in_flight", "HTTP requests being processed")
+db_statements_total = metrics.counter(
+    "db_statements_total", "SQL statements executed", ("engine", "operation"),
+)
+db_statement_errors_total = metrics.counter(
+    "db_statement_errors_total", "SQL statements failed", ("engine", "operation"),
+)
+db_statement_duration = metrics.histogram(
+    "db_statement_duration_seconds", "SQL statement execution time", ("engine", "operation"),
+)
+
+# Пулы соединений читаются при сборе метрик, а не на каждом checkout
+_pools: dict[str, object] = {}
+
+
+def _pool_values(method: str) -> Callable[[], dict[tuple, float]]:
+    def collect() -> dict[tuple, float]:
+        # overflow() у QueuePool отрицателен, пока пул не заполнен целиком
+        return {(name,): max(0, getattr(pool, method)()) for name, pool in _pools.items() if hasattr(pool, method)}
+
+    return collect
+
+
+metrics.gauge("db_pool_checked_out", "Connections checked out of the pool", ("engine",), _pool_values("checkedout"))
+metrics.gauge("db_pool_overflow", "Connections opened over the pool size", ("engine",), _pool_values("overflow"))
+metrics.gauge("db_pool_size", "Configured pool size", ("engine",), _pool_values("size"))
+
+
+def statement_operation(statement: str) -> str:
+    """Тип запроса по первому слову: метка не должна зависеть от текста запроса"""
+    head = statement.lstrip()[:8].split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """Подключает к движку счётчики запросов, их время и состояние пула"""
+    _pools[name] = engine.pool
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault(_START_TIMES, []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info[_START_TIMES].pop()
+        labels = (name, statement_operation(statement))
+        db_statements_total.inc(labels)
+        db_statement_duration.observe(elapsed, labels)
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        start_times = context.connection.info.get(_START_TIMES) if context.connection is not None else None
+        if start_times:
+            start_times.pop()
+        db_statement_errors_total.inc((name, statement_operation(context.statement or "")))
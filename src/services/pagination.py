@@ -0,0 +1,46 @@
+import base64
+from datetime import datetime
+from typing import NamedTuple, Union
+from uuid import UUID
+
+import orjson
+
+BIGINT_MIN = -2 ** 63
+BIGINT_MAX = 2 ** 63 - 1
+
+
+class HistoryCursor(NamedTuple):
+    """Позиция в истории переходов: последний отданный (use_at, id).
+
+    id - bigint в Postgres и UUID в остальных хранилищах.
+    """
+
+    use_at: datetime
+    id: Union[int, UUID]
+
+
+def encode_cursor(cursor: HistoryCursor) -> str:
+    raw = orjson.dumps([cursor.use_at.isoformat(), cursor.id if isinstance(cursor.id, int) else str(cursor.id)])
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(value: str, *, id_type: type) -> HistoryCursor:
+    """Разбирает непрозрачный курсор с id типа id_type хранилища (int или UUID).
+
+    При некорректном значении или id другого типа (курсор другого хранилища) - ValueError.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+        use_at, id_ = orjson.loads(raw)
+        use_at = datetime.fromisoformat(use_at)
+    except (TypeError, ValueError, orjson.JSONDecodeError) as err:
+        raise ValueError(f"invalid cursor: {value!r}") from err
+    if id_type is int:
+        # bool - подкласс int; значение должно помещаться в bigint
+        if type(id_) is not int or not BIGINT_MIN <= id_ <= BIGINT_MAX:
+            raise ValueError(f"invalid cursor id: {value!r}")
+        return HistoryCursor(use_at, id_)
+    try:
+        return HistoryCursor(use_at, UUID(id_))
+    except (AttributeError, TypeError, ValueError) as err:
+        raise ValueError(f"invalid cursor id: {value!r}") from err
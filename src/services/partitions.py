@@ -0,0 +1,216 @@
+import asyncio
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Callable, NamedTuple, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PARTITION_INTERVALS = ("day", "week", "month")
+_BOUND_RE = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+default_rows_moved = metrics.counter(
+    "history_default_partition_rows_moved_total", "History rows moved from the DEFAULT partition into a new partition",
+)
+partition_failures = metrics.counter(
+    "history_partition_failures_total", "Failed partition maintenance steps: action=create or drop", ("action",),
+)
+
+
+class Partition(NamedTuple):
+    name: str
+    lower: datetime
+    upper: datetime
+
+
+def period_start(moment: datetime, interval: str) -> datetime:
+    """Начало секции, в которую попадает moment"""
+    day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if interval == "day":
+        return day
+    if interval == "week":
+        return day - timedelta(days=day.weekday())
+    if interval == "month":
+        return day.replace(day=1)
+    raise ValueError(f"unknown partition interval: {interval!r}")
+
+
+def next_period(start: datetime, interval: str) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "week":
+        return start + timedelta(days=7)
+    if interval == "month":
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    raise ValueError(f"unknown partition interval: {interval!r}")
+
+
+class HistoryPartitionManager:
+    """Обслуживание секций таблицы истории переходов.
+
+    Заранее создаёт секции на ahead периодов вперёд и удаляет целиком секции,
+    все строки которых старше retention_days, вместо построчного DELETE.
+    Каждая секция создаётся в своей транзакции: ошибка одной не мешает остальным.
+    Строки, попавшие в DEFAULT-секцию (например, пока менеджер не работал), при
+    создании секции их диапазона переносятся в неё - иначе Postgres не даст её создать;
+    устаревшие строки DEFAULT-секции удаляются построчно - обычно их единицы.
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            *,
+            table: str,
+            interval: str,
+            ahead: int,
+            retention_days: Optional[int],
+            check_interval: float,
+    ):
+        if interval not in PARTITION_INTERVALS:
+            raise ValueError(f"unknown partition interval: {interval!r}")
+        self.session_factory = session_factory
+        self._table = table
+        self._interval = interval
+        self._ahead = ahead
+        self._retention_days = retention_days
+        self._check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.maintain()
+            except Exception as err:
+                logger.exception("history partitions maintenance failed: %s", err)
+            await asyncio.sleep(self._check_interval)
+
+    async def maintain(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.utcnow()
+        created = await self.create_future_partitions(now)
+        dropped = await self.drop_expired_partitions(now)
+        logger.info("history partitions maintained; created: %s; dropped: %s", created, dropped)
+
+    async def list_partitions(self, db: AsyncSession) -> list[Partition]:
+        result = await db.execute(
+            text(
+                "SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) "
+                "FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass)"
+            ),
+            {"table": self._table},
+        )
+        partitions = []
+        for name, bound in result.all():
+            match = _BOUND_RE.search(bound)
+            # DEFAULT-секция границ не имеет
+            if match:
+                lower, upper = (datetime.fromisoformat(value) for value in match.groups())
+                partitions.append(Partition(name, lower, upper))
+        return partitions
+
+    async def find_default_partition(self, db: AsyncSession) -> Optional[str]:
+        result = await db.execute(
+            text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = CAST(:table AS regclass) AND pg_get_expr(c.relpartbound, c.oid) = 'DEFAULT'"
+            ),
+            {"table": self._table},
+        )
+        return result.scalar()
+
+    async def create_future_partitions(self, now: datetime) -> list[str]:
+        async with self.session_factory() as db:
+            async with db.begin():
+                existing = await self.list_partitions(db)
+                default = await self.find_default_partition(db)
+        created = []
+        start = period_start(now, self._interval)
+        for _ in range(self._ahead + 1):
+            end = next_period(start, self._interval)
+            # Секции с пересекающимся диапазоном (например, после смены интервала) не трогаем
+            if not any(p.lower < end and start < p.upper for p in existing):
+                name = f"{self._table}_p{start:%Y%m%d}"
+                try:
+                    await self.create_partition(name, start, end, default)
+                except Exception as err:
+                    partition_failures.inc(("create",))
+                    logger.exception("failed to create history partition %s: %s", name, err)
+                else:
+                    created.append(name)
+            start = end
+        return created
+
+    async def create_partition(self, name: str, start: datetime, end: datetime, default: Optional[str]) -> None:
+        bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+        in_range = f"use_at >= '{start.isoformat()}' AND use_at < '{end.isoformat()}'"
+        async with self.session_factory() as db:
+            async with db.begin():
+                stray_rows = default is not None and (await db.execute(
+                    text(f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE {in_range})')
+                )).scalar()
+                if not stray_rows:
+                    await db.execute(text(
+                        f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{self._table}" {bounds}'
+                    ))
+                    return
+                # CREATE ... PARTITION OF упал бы на строках диапазона в DEFAULT-секции:
+                # переносим их в отдельную таблицу и присоединяем её как секцию
+                await db.execute(text(f'CREATE TABLE "{name}" (LIKE "{self._table}" INCLUDING DEFAULTS)'))
+                moved = (await db.execute(text(
+                    f'WITH moved AS (DELETE FROM "{default}" WHERE {in_range} RETURNING *) '
+                    f'INSERT INTO "{name}" SELECT * FROM moved'
+                ))).rowcount
+                await db.execute(text(f'ALTER TABLE "{self._table}" ATTACH PARTITION "{name}" {bounds}'))
+        default_rows_moved.inc(amount=moved)
+        logger.warning("moved %s history rows from %s into the new partition %s", moved, default, name)
+
+    async def drop_expired_partitions(self, now: datetime) -> list[str]:
+        if self._retention_days is None:
+            return []
+        border = now - timedelta(days=self._retention_days)
+        async with self.session_factory() as db:
+            async with db.begin():
+                partitions = await self.list_partitions(db)
+                default = await self.find_default_partition(db)
+        dropped = []
+        for partition in partitions:
+            if partition.upper > border:
+                continue
+            try:
+                async with self.session_factory() as db:
+                    async with db.begin():
+                        await db.execute(text(f'ALTER TABLE "{self._table}" DETACH PARTITION "{partition.name}"'))
+                        await db.execute(text(f'DROP TABLE "{partition.name}"'))
+            except Exception as err:
+                partition_failures.inc(("drop",))
+                logger.exception("failed to drop history partition %s: %s", partition.name, err)
+            else:
+                dropped.append(partition.name)
+        if default is not None:
+            async with self.session_factory() as db:
+                async with db.begin():
+                    deleted = (await db.execute(
+                        text(f'DELETE FROM "{default}" WHERE use_at < :border'), {"border": border},
+                    )).rowcount
+            if deleted:
+                logger.warning("deleted %s expired history rows from %s", deleted, default)
+        return dropped
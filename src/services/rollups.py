@@ -0,0 +1,98 @@
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Callable, Iterable, Optional
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from services.storage import LinkStorage
+
+logger = logging.getLogger(__name__)
+
+# Размеры корзин от мелких к крупным; индекс в кортеже - значение колонки granularity
+ROLLUP_BUCKETS = ("minute", "hour", "day")
+BUCKET_SIZES = {"minute": timedelta(minutes=1), "hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def bucket_start(moment: datetime, bucket: str) -> datetime:
+    if bucket == "minute":
+        return moment.replace(second=0, microsecond=0)
+    if bucket == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if bucket == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"unknown rollup bucket: {bucket!r}")
+
+
+def minute_deltas(events: Iterable) -> Counter[tuple[UUID, datetime]]:
+    """Число переходов пачки по (ссылка, минута) - так переходы попадают в роллапы"""
+    return Counter((event.short_link_id, bucket_start(event.use_at, "minute")) for event in events)
+
+
+def merge_points(rows: Iterable[tuple[datetime, int]], bucket: str) -> list[tuple[datetime, int]]:
+    """Сводит строки роллапа разной гранулярности к корзинам bucket, по возрастанию времени"""
+    totals: Counter = Counter()
+    for start, count in rows:
+        totals[bucket_start(start, bucket)] += count
+    return sorted(totals.items())
+
+
+class RollupCompactor:
+    """Перенос роллапов из мелких корзин в крупные.
+
+    Переходы пишутся в минутные корзины. Минуты старше minute_retention_days
+    сворачиваются в часы, часы старше hour_retention_days - в дни, поэтому число строк
+    на ссылку ограничено сроками хранения и не зависит от числа переходов.
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            *,
+            storage: LinkStorage,
+            minute_retention_days: int,
+            hour_retention_days: int,
+            check_interval: float,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self._minute_retention = timedelta(days=minute_retention_days)
+        self._hour_retention = timedelta(days=hour_retention_days)
+        self._check_interval = check_interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.compact()
+            except Exception as err:
+                logger.exception("rollup compaction failed: %s", err)
+            await asyncio.sleep(self._check_interval)
+
+    async def compact(self, now: Optional[datetime] = None) -> None:
+        now = now or datetime.utcnow()
+        async with self.session_factory() as db:
+            # Границы выровнены по крупной корзине, чтобы она собиралась из полного набора мелких
+            minutes = await self.storage.compact_rollups(
+                db, source="minute", target="hour", border=bucket_start(now - self._minute_retention, "hour"),
+            )
+            hours = await self.storage.compact_rollups(
+                db, source="hour", target="day", border=bucket_start(now - self._hour_retention, "day"),
+            )
+        logger.info("rollups compacted; minute rows: %s; hour rows: %s", minutes, hours)
@@ -0,0 +1,63 @@
+import asyncio
+from typing import Awaitable, Callable, Generic, Hashable, TypeVar
+
+from services.metrics import metrics
+
+T = TypeVar("T")
+
+singleflight_calls_total = metrics.counter(
+    "singleflight_calls_total",
+    "Coalesced calls: role=leader ran the call, role=shared waited for the leader's result",
+    ("group", "role"),
+)
+
+
+class SingleFlight(Generic[T]):
+    """Объединяет одновременные вызовы с одинаковым ключом в один.
+
+    Первый вызов для ключа (ведущий) выполняет call сам - в своей задаче и на своих
+    ресурсах, например сессии БД запроса. Вызовы, пришедшие до его завершения, ждут
+    и получают тот же результат или то же исключение. Результат не кешируется:
+    следующий вызов после завершения снова выполняет call.
+
+    Отмена ожидающего не влияет на остальных. Если отменён ведущий, его результата
+    не будет, и ожидающие выбирают нового ведущего среди себя.
+    """
+
+    def __init__(self, group: str):
+        self._group = group
+        self._flights: dict[Hashable, asyncio.Future] = {}
+
+    def __len__(self) -> int:
+        return len(self._flights)
+
+    async def do(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        while True:
+            flight = self._flights.get(key)
+            if flight is None:
+                return await self._lead(key, call)
+            singleflight_calls_total.inc((self._group, "shared"))
+            # wait, в отличие от await flight, не пробрасывает отмену общего вызова:
+            # CancelledError здесь означает, что отменили самого ожидающего
+            await asyncio.wait((flight,))
+            if not flight.cancelled():
+                return flight.result()
+
+    async def _lead(self, key: Hashable, call: Callable[[], Awaitable[T]]) -> T:
+        singleflight_calls_total.inc((self._group, "leader"))
+        flight = self._flights[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await call()
+        except asyncio.CancelledError:
+            flight.cancel()
+            raise
+        except BaseException as exc:
+            flight.set_exception(exc)
+            # Исключение уже проброшено ведущему: без ожидающих asyncio не должен жаловаться на него
+            flight.exception()
+            raise
+        else:
+            flight.set_result(result)
+            return result
+        finally:
+            del self._flights[key]
@@ -0,0 +1,28 @@
+from services.storage.base import HistoryRecord, LinkRecord, LinkStorage
+
+__all__ = ["HistoryRecord", "LinkRecord", "LinkStorage", "STORAGE_BACKENDS", "make_storage"]
+
+STORAGE_BACKENDS = ("postgres", "memory", "sqlite")
+
+
+def make_storage(
+        kind: str,
+        *,
+        chunk_size: int,
+        counter_shards: int,
+        sqlite_path: str,
+        visitors_precision: int,
+        visitors_daily: bool,
+) -> LinkStorage:
+    visitors = {"visitors_precision": visitors_precision, "visitors_daily": visitors_daily}
+    # Модули хранилищ импортируются по требованию: postgres тянет ORM-модели, sqlite - aiosqlite
+    if kind == "postgres":
+        from services.storage.postgres import PostgresStorage
+        return PostgresStorage(chunk_size=chunk_size, counter_shards=counter_shards, **visitors)
+    if kind == "memory":
+        from services.storage.memory import MemoryStorage
+        return MemoryStorage(**visitors)
+    if kind == "sqlite":
+        from services.storage.sqlite import SQLiteStorage
+        return SQLiteStorage(sqlite_path, **visitors)
+    raise ValueError(f"unknown storage backend: {kind!r}")
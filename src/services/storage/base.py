@@ -0,0 +1,170 @@
+from datetime import date, datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, NamedTuple, Optional, Sequence, Union
+from uuid import UUID
+
+from core.config import DEFAULT_REDIRECT_STATUS
+from services.pagination import HistoryCursor
+
+if TYPE_CHECKING:
+    from services.clicks import ClickEvent
+
+
+class LinkRecord(NamedTuple):
+    """Короткая ссылка; get_top_links хранилища Postgres отдаёт ORM-объекты ShortLink с теми же полями"""
+
+    id: UUID
+    link_id: str
+    original_link: str
+    short_link: str
+    is_active: bool
+    usages_count: int
+    created_at: datetime
+    redirect_status: int = DEFAULT_REDIRECT_STATUS
+    cache_max_age: Optional[int] = None
+
+
+class HistoryRecord(NamedTuple):
+    """Переход по ссылке; в Postgres - строка Row с теми же колонками и bigint id"""
+
+    id: Union[int, UUID]
+    short_link_id: UUID
+    client_ip: str
+    use_at: datetime
+
+
+class LinkStorage:
+    """Хранилище ссылок и истории переходов.
+
+    Первый аргумент методов - сессия запроса (AsyncSession из get_session): её использует
+    хранилище Postgres, остальные хранилища её игнорируют. Сессия SQLAlchemy подключается
+    к БД только при первом запросе, поэтому с ними обработчики не делают I/O к Postgres.
+    """
+
+    # Тип id записей истории и курсоров пагинации
+    history_id_type: type = UUID
+
+    async def get_link(self, db: Any, link_id: str) -> Optional[LinkRecord]:
+        raise NotImplementedError
+
+    async def get_links(self, db: Any, link_ids: list[str]) -> dict[str, LinkRecord]:
+        """Ссылки по списку link_id одним запросом; отсутствующих в ответе нет"""
+        raise NotImplementedError
+
+    async def count_links(self, db: Any) -> int:
+        raise NotImplementedError
+
+    def stream_link_ids(
+            self,
+            db: Any,
+            *,
+            created_since: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[Sequence[tuple[str, datetime]]]:
+        """Пары (link_id, created_at) всех ссылок (или созданных после created_since) пачками"""
+        raise NotImplementedError
+
+    async def get_top_links(self, db: Any, *, limit: int) -> list[LinkRecord]:
+        """Активные ссылки с наибольшим числом переходов, по убыванию"""
+        raise NotImplementedError
+
+    async def get_active_by_hashes(self, db: Any, *, hashes: list[bytes]) -> dict[bytes, tuple[str, str]]:
+        """Активные ссылки по хешам original_link: hash -> (link_id, short_link)"""
+        raise NotImplementedError
+
+    async def create_links(self, db: Any, *, rows: list[dict]) -> dict[str, Optional[str]]:
+        """Создаёт ссылки из строк {original_link, link_id, short_link[, redirect_status, cache_max_age]}.
+
+        Возвращает для каждого link_id None при успехе или текст ошибки; занятый
+        link_id - это LINK_ID_CONFLICT, а не исключение.
+        """
+        raise NotImplementedError
+
+    async def deactivate_link(self, db: Any, *, link: LinkRecord) -> None:
+        raise NotImplementedError
+
+    async def deactivate_links(self, db: Any, *, link_ids: list[str]) -> dict[str, bool]:
+        """Деактивирует ссылки по списку link_id; для найденных - была ли ссылка активна"""
+        raise NotImplementedError
+
+    async def record_clicks(self, db: Any, *, events: Sequence["ClickEvent"]) -> None:
+        """Записывает пачку переходов в историю, счётчики, скетчи посетителей и минутные роллапы одной транзакцией"""
+        raise NotImplementedError
+
+    async def get_click_count(self, db: Any, *, link: LinkRecord) -> int:
+        raise NotImplementedError
+
+    async def get_click_counts(self, db: Any, *, links: Sequence[LinkRecord]) -> dict[UUID, int]:
+        """Число переходов нескольких ссылок одним запросом"""
+        raise NotImplementedError
+
+    async def get_last_click_at(self, db: Any, *, link_id: UUID) -> Optional[datetime]:
+        """Время последнего записанного перехода по ссылке"""
+        raise NotImplementedError
+
+    async def get_unique_clients(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            since: Optional[date] = None,
+            until: Optional[date] = None,
+    ) -> int:
+        """Оценка числа уникальных клиентов за всё время или за дни [since, until]"""
+        raise NotImplementedError
+
+    async def get_unique_clients_many(self, db: Any, *, link_ids: list[UUID]) -> dict[UUID, int]:
+        """Оценка числа уникальных клиентов за всё время для нескольких ссылок одним запросом"""
+        raise NotImplementedError
+
+    def stream_history(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[Sequence[tuple[datetime, str]]]:
+        """Пары (use_at, client_ip) истории ссылки за [since, until) в порядке (use_at, id) пачками.
+
+        В памяти одновременно держится не больше одной пачки, сколько бы переходов ни было.
+        """
+        raise NotImplementedError
+
+    async def get_timeseries(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            bucket: str,
+            since: datetime,
+            until: datetime,
+    ) -> list[tuple[datetime, int]]:
+        """Число переходов по корзинам bucket в [since, until); пустые корзины не возвращаются.
+
+        Данные старше срока хранения минут (часов) уже свёрнуты в часы (дни) и
+        приходят с этой точностью, даже если запрошены более мелкие корзины.
+        """
+        raise NotImplementedError
+
+    async def compact_rollups(self, db: Any, *, source: str, target: str, border: datetime) -> int:
+        """Сворачивает корзины source, начавшиеся до border, в корзины target; возвращает число корзин target"""
+        raise NotImplementedError
+
+    async def get_history(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            limit: int,
+            offset: int = 0,
+            after: Optional[HistoryCursor] = None,
+    ) -> tuple[Sequence[HistoryRecord], Optional[HistoryCursor]]:
+        """Страница истории в порядке (use_at, id) и курсор следующей страницы"""
+        raise NotImplementedError
+
+    async def ping(self, db: Any) -> bool:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
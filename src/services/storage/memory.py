@@ -0,0 +1,246 @@
+import bisect
+import heapq
+import uuid
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Optional, Sequence
+from uuid import UUID
+
+from core.config import DEFAULT_REDIRECT_STATUS, LINK_ID_CONFLICT
+from services.dedup import link_hash
+from services.hll import ALL_TIME, HyperLogLog, merge_all, sketches_for_clicks
+from services.pagination import HistoryCursor
+from services.rollups import ROLLUP_BUCKETS, bucket_start, merge_points, minute_deltas
+from services.storage.base import HistoryRecord, LinkRecord, LinkStorage
+
+
+class MemoryStorage(LinkStorage):
+    """Хранилище в памяти процесса: индексы-словари и отсортированная история на ссылку.
+
+    Методы не уступают управление циклу событий, поэтому каждый из них атомарен без
+    блокировок. Данные не переживают перезапуск и не видны другим воркерам: это
+    хранилище для тестов, одиночных запусков и замеров HTTP-слоя без I/O.
+    """
+
+    def __init__(self, *, visitors_precision: int, visitors_daily: bool):
+        self._visitors_precision = visitors_precision
+        self._visitors_daily = visitors_daily
+        self._links: dict[str, LinkRecord] = {}
+        # Первая активная ссылка для хеша original_link
+        self._active_by_hash: dict[bytes, str] = {}
+        self._clicks: dict[UUID, int] = defaultdict(int)
+        # История ссылки и параллельный список ключей (use_at, id) для bisect
+        self._history: dict[UUID, list[HistoryRecord]] = defaultdict(list)
+        self._history_keys: dict[UUID, list[tuple[datetime, UUID]]] = defaultdict(list)
+        # Скетчи посетителей ссылки по дням (ALL_TIME - за всё время)
+        self._sketches: dict[UUID, dict[date, HyperLogLog]] = defaultdict(dict)
+        # Роллапы ссылки: (granularity, начало корзины) -> число переходов
+        self._rollups: dict[UUID, dict[tuple[int, datetime], int]] = defaultdict(dict)
+
+    async def get_link(self, db: Any, link_id: str) -> Optional[LinkRecord]:
+        return self._links.get(link_id)
+
+    async def get_links(self, db: Any, link_ids: list[str]) -> dict[str, LinkRecord]:
+        return {link_id: self._links[link_id] for link_id in link_ids if link_id in self._links}
+
+    async def count_links(self, db: Any) -> int:
+        return len(self._links)
+
+    async def stream_link_ids(
+            self,
+            db: Any,
+            *,
+            created_since: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[list[tuple[str, datetime]]]:
+        # Снимок списка: между пачками управление уходит в цикл событий, а словарь может измениться
+        links = list(self._links.values())
+        for start in range(0, len(links), batch_size):
+            yield [
+                (link.link_id, link.created_at) for link in links[start:start + batch_size]
+                if created_since is None or link.created_at > created_since
+            ]
+
+    async def get_top_links(self, db: Any, *, limit: int) -> list[LinkRecord]:
+        return heapq.nlargest(
+            limit,
+            (link for link in self._links.values() if link.is_active),
+            key=lambda link: link.usages_count + self._clicks.get(link.id, 0),
+        )
+
+    async def get_active_by_hashes(self, db: Any, *, hashes: list[bytes]) -> dict[bytes, tuple[str, str]]:
+        result = {}
+        for hash_ in hashes:
+            link_id = self._active_by_hash.get(hash_)
+            if link_id is not None:
+                result[hash_] = (link_id, self._links[link_id].short_link)
+        return result
+
+    async def create_links(self, db: Any, *, rows: list[dict]) -> dict[str, Optional[str]]:
+        results: dict[str, Optional[str]] = {}
+        now = datetime.utcnow()
+        for row in rows:
+            link_id = row["link_id"]
+            if link_id in self._links:
+                results.setdefault(link_id, LINK_ID_CONFLICT)
+                continue
+            link = self._links[link_id] = LinkRecord(
+                uuid.uuid4(), link_id, row["original_link"], row["short_link"], True, 0, now,
+                row.get("redirect_status", DEFAULT_REDIRECT_STATUS), row.get("cache_max_age"),
+            )
+            self._active_by_hash.setdefault(
+                link_hash(link.original_link, link.redirect_status, link.cache_max_age), link_id,
+            )
+            results[link_id] = None
+        return results
+
+    async def deactivate_link(self, db: Any, *, link: LinkRecord) -> None:
+        self._links[link.link_id] = link._replace(is_active=False)
+        hash_ = link_hash(link.original_link, link.redirect_status, link.cache_max_age)
+        if self._active_by_hash.get(hash_) == link.link_id:
+            del self._active_by_hash[hash_]
+
+    async def deactivate_links(self, db: Any, *, link_ids: list[str]) -> dict[str, bool]:
+        result = {}
+        for link_id in link_ids:
+            link = self._links.get(link_id)
+            if link is not None and link_id not in result:
+                result[link_id] = link.is_active
+                await self.deactivate_link(db, link=link)
+        return result
+
+    async def record_clicks(self, db: Any, *, events: Sequence) -> None:
+        for event in events:
+            record = HistoryRecord(uuid.uuid4(), event.short_link_id, event.client_ip, event.use_at)
+            key = (record.use_at, record.id)
+            keys = self._history_keys[record.short_link_id]
+            # Переходы приходят почти по порядку, так что обычно это вставка в конец
+            index = bisect.bisect_right(keys, key)
+            keys.insert(index, key)
+            self._history[record.short_link_id].insert(index, record)
+            self._clicks[record.short_link_id] += 1
+        for key, sketch in sketches_for_clicks(
+                events, precision=self._visitors_precision, daily=self._visitors_daily,
+        ).items():
+            short_link_id, day = key
+            link_sketches = self._sketches[short_link_id]
+            if day in link_sketches:
+                link_sketches[day].merge(sketch)
+            else:
+                link_sketches[day] = sketch
+        for (short_link_id, start), delta in minute_deltas(events).items():
+            link_rollups = self._rollups[short_link_id]
+            link_rollups[0, start] = link_rollups.get((0, start), 0) + delta
+
+    async def get_click_count(self, db: Any, *, link: LinkRecord) -> int:
+        return link.usages_count + self._clicks.get(link.id, 0)
+
+    async def get_click_counts(self, db: Any, *, links: Sequence[LinkRecord]) -> dict[UUID, int]:
+        return {link.id: link.usages_count + self._clicks.get(link.id, 0) for link in links}
+
+    async def get_last_click_at(self, db: Any, *, link_id: UUID) -> Optional[datetime]:
+        keys = self._history_keys.get(link_id)
+        return keys[-1][0] if keys else None
+
+    async def get_unique_clients(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            since: Optional[date] = None,
+            until: Optional[date] = None,
+    ) -> int:
+        link_sketches = self._sketches.get(link_id, {})
+        if since is None and until is None:
+            sketch = link_sketches.get(ALL_TIME)
+            return sketch.count() if sketch else 0
+        # Слияние идёт в новый скетч, сохранённые не меняются
+        merged = merge_all(
+            HyperLogLog(sketch.precision).merge(sketch) for day, sketch in link_sketches.items()
+            if day != ALL_TIME and (since is None or day >= since) and (until is None or day <= until)
+        )
+        return merged.count() if merged else 0
+
+    async def get_unique_clients_many(self, db: Any, *, link_ids: list[UUID]) -> dict[UUID, int]:
+        result = {}
+        for link_id in link_ids:
+            sketch = self._sketches.get(link_id, {}).get(ALL_TIME)
+            result[link_id] = sketch.count() if sketch else 0
+        return result
+
+    async def stream_history(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[list[tuple[datetime, str]]]:
+        # Позиция ищется заново перед каждой пачкой: между пачками история может пополниться
+        keys = self._history_keys.get(link_id, [])
+        history = self._history.get(link_id, [])
+        position = bisect.bisect_left(keys, (since,)) if since is not None else 0
+        while True:
+            batch = []
+            for record in history[position:position + batch_size]:
+                if until is not None and record.use_at >= until:
+                    break
+                batch.append((record.use_at, record.client_ip))
+            if not batch:
+                return
+            last = history[position + len(batch) - 1]
+            yield batch
+            position = bisect.bisect_right(keys, (last.use_at, last.id))
+
+    async def get_timeseries(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            bucket: str,
+            since: datetime,
+            until: datetime,
+    ) -> list[tuple[datetime, int]]:
+        return merge_points(
+            (
+                (start, count) for (_, start), count in self._rollups.get(link_id, {}).items()
+                if since <= start < until
+            ),
+            bucket,
+        )
+
+    async def compact_rollups(self, db: Any, *, source: str, target: str, border: datetime) -> int:
+        source_level, target_level = ROLLUP_BUCKETS.index(source), ROLLUP_BUCKETS.index(target)
+        compacted = 0
+        for link_rollups in self._rollups.values():
+            moved = [key for key in link_rollups if key[0] == source_level and key[1] < border]
+            targets = set()
+            for key in moved:
+                target_key = (target_level, bucket_start(key[1], target))
+                link_rollups[target_key] = link_rollups.get(target_key, 0) + link_rollups.pop(key)
+                targets.add(target_key)
+            compacted += len(targets)
+        return compacted
+
+    async def get_history(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            limit: int,
+            offset: int = 0,
+            after: Optional[HistoryCursor] = None,
+    ) -> tuple[list[HistoryRecord], Optional[HistoryCursor]]:
+        history = self._history.get(link_id, [])
+        if after is not None:
+            start = bisect.bisect_right(self._history_keys.get(link_id, []), (after.use_at, after.id))
+        else:
+            start = offset
+        page = history[start:start + limit]
+        if not page or start + limit >= len(history):
+            return page, None
+        return page, HistoryCursor(page[-1].use_at, page[-1].id)
+
+    async def ping(self, db: Any) -> bool:
+        return True
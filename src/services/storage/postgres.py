@@ -0,0 +1,195 @@
+import ipaddress
+from collections import Counter
+from datetime import date, datetime
+from typing import AsyncIterator, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.config import PROJECT_URL
+from models.short_link import (
+    PORT_MASK, ShortLink, ShortLinkCounter, ShortLinkHistory, ShortLinkRollup, ShortLinkVisitors,
+)
+from services.base import RepositoryDB
+from services.hll import HyperLogLog, merge_all, sketches_for_clicks
+from services.pagination import HistoryCursor
+from services.rollups import minute_deltas
+from services.storage.base import LinkRecord, LinkStorage
+
+# Колонки, которые читаются для ссылки и страницы истории: без хеша URL и сырых колонок клиента
+LINK_COLUMNS = (
+    "id", "link_id", "original_link", "is_active", "usages_count", "created_at", "redirect_status", "cache_max_age",
+)
+HISTORY_COLUMNS = ("id", "short_link_id", "client_ip", "use_at")
+
+
+def history_row(event) -> dict:
+    """Строка short_link_history для перехода: IP-адрес и порт в inet и smallint, иначе строкой"""
+    # У всех строк многострочного INSERT одинаковый набор колонок
+    row = {
+        "short_link_id": event.short_link_id,
+        "use_at": event.use_at,
+        "client_host": None,
+        "client_port": None,
+        "client_raw": None,
+    }
+    host, _, port = event.client_ip.rpartition(":")
+    try:
+        address = ipaddress.ip_address(host)
+        port_number = int(port)
+    except ValueError:
+        address = None
+    if address is None or not 0 <= port_number <= PORT_MASK:
+        row["client_raw"] = event.client_ip
+    else:
+        row["client_host"] = str(address)
+        row["client_port"] = port_number - (PORT_MASK + 1) if port_number > PORT_MASK >> 1 else port_number
+    return row
+
+
+def link_record(row: Row) -> LinkRecord:
+    """LinkRecord из строки LINK_COLUMNS; short_link не хранится и собирается из link_id"""
+    return LinkRecord(
+        row.id, row.link_id, row.original_link, f"{PROJECT_URL}{row.link_id}", row.is_active, row.usages_count,
+        row.created_at, row.redirect_status, row.cache_max_age,
+    )
+
+
+class PostgresStorage(LinkStorage):
+    """Хранилище в Postgres поверх RepositoryDB.
+
+    Горячие чтения (ссылка, страница истории) выбирают только нужные колонки без
+    ORM-объектов и отдают LinkRecord и строки Row; остальное - ORM-объекты.
+    """
+
+    history_id_type = int
+
+    def __init__(self, *, chunk_size: int, counter_shards: int, visitors_precision: int, visitors_daily: bool):
+        self.links = RepositoryDB(ShortLink)
+        self.history = RepositoryDB(ShortLinkHistory)
+        self.counters = RepositoryDB(ShortLinkCounter)
+        self.visitors = RepositoryDB(ShortLinkVisitors)
+        self.rollups = RepositoryDB(ShortLinkRollup)
+        self._chunk_size = chunk_size
+        self._counter_shards = counter_shards
+        self._visitors_precision = visitors_precision
+        self._visitors_daily = visitors_daily
+
+    async def get_link(self, db: AsyncSession, link_id: str) -> Optional[LinkRecord]:
+        row = await self.links.get_for_shorten_url(db, link_id, columns=LINK_COLUMNS)
+        return link_record(row) if row is not None else None
+
+    async def get_links(self, db: AsyncSession, link_ids: list[str]) -> dict[str, LinkRecord]:
+        rows = await self.links.get_many_for_shorten_urls(db, link_ids, columns=LINK_COLUMNS)
+        return {row.link_id: link_record(row) for row in rows}
+
+    async def count_links(self, db: AsyncSession) -> int:
+        return await self.links.count(db)
+
+    def stream_link_ids(
+            self,
+            db: AsyncSession,
+            *,
+            created_since: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[Sequence[tuple[str, datetime]]]:
+        return self.links.stream_link_ids(db, created_since=created_since, batch_size=batch_size)
+
+    async def get_top_links(self, db: AsyncSession, *, limit: int) -> list[ShortLink]:
+        return await self.links.get_most_clicked(db, counters=ShortLinkCounter, limit=limit)
+
+    async def get_active_by_hashes(self, db: AsyncSession, *, hashes: list[bytes]) -> dict[bytes, tuple[str, str]]:
+        link_ids = await self.links.get_active_by_hashes(db, hashes=hashes)
+        return {hash_: (link_id, f"{PROJECT_URL}{link_id}") for hash_, link_id in link_ids.items()}
+
+    async def create_links(self, db: AsyncSession, *, rows: list[dict]) -> dict[str, Optional[str]]:
+        return await self.links.bulk_create(db, rows=rows, chunk_size=self._chunk_size)
+
+    async def deactivate_link(self, db: AsyncSession, *, link: LinkRecord) -> None:
+        await self.links.delete(db, id_=link.id)
+
+    async def deactivate_links(self, db: AsyncSession, *, link_ids: list[str]) -> dict[str, bool]:
+        return await self.links.delete_many(db, shorten_url_ids=link_ids)
+
+    async def record_clicks(self, db: AsyncSession, *, events: Sequence) -> None:
+        async with db.begin():
+            await self.history.bulk_insert(db, rows=[history_row(event) for event in events])
+            await self.counters.bulk_increment_counters(
+                db, deltas=Counter(event.short_link_id for event in events), shards=self._counter_shards,
+            )
+            await self.visitors.merge_sketches(db, sketches=sketches_for_clicks(
+                events, precision=self._visitors_precision, daily=self._visitors_daily,
+            ))
+            await self.rollups.bulk_increment_rollups(db, deltas=minute_deltas(events))
+
+    async def get_click_count(self, db: AsyncSession, *, link: LinkRecord) -> int:
+        # usages_count хранит переходы до перехода на шардированные счётчики
+        return link.usages_count + await self.counters.get_counter_total(db, short_link_id=link.id)
+
+    async def get_click_counts(self, db: AsyncSession, *, links: Sequence[LinkRecord]) -> dict[UUID, int]:
+        totals = await self.counters.get_counter_totals(db, short_link_ids=[link.id for link in links])
+        return {link.id: link.usages_count + totals.get(link.id, 0) for link in links}
+
+    async def get_last_click_at(self, db: AsyncSession, *, link_id: UUID) -> Optional[datetime]:
+        return await self.history.get_last_use_at(db, link_id=link_id)
+
+    async def get_unique_clients(
+            self,
+            db: AsyncSession,
+            *,
+            link_id: UUID,
+            since: Optional[date] = None,
+            until: Optional[date] = None,
+    ) -> int:
+        sketches = await self.visitors.get_sketches(db, short_link_id=link_id, since=since, until=until)
+        merged = merge_all(HyperLogLog.from_bytes(sketch) for sketch in sketches)
+        return merged.count() if merged else 0
+
+    async def get_unique_clients_many(self, db: AsyncSession, *, link_ids: list[UUID]) -> dict[UUID, int]:
+        sketches = await self.visitors.get_all_time_sketches(db, short_link_ids=link_ids)
+        return {
+            link_id: HyperLogLog.from_bytes(sketches[link_id]).count() if link_id in sketches else 0
+            for link_id in link_ids
+        }
+
+    def stream_history(
+            self,
+            db: AsyncSession,
+            *,
+            link_id: UUID,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[Sequence[tuple[datetime, str]]]:
+        return self.history.stream_history(db, link_id=link_id, since=since, until=until, batch_size=batch_size)
+
+    async def get_timeseries(
+            self,
+            db: AsyncSession,
+            *,
+            link_id: UUID,
+            bucket: str,
+            since: datetime,
+            until: datetime,
+    ) -> list[tuple[datetime, int]]:
+        return await self.rollups.get_rollups(db, short_link_id=link_id, bucket=bucket, since=since, until=until)
+
+    async def compact_rollups(self, db: AsyncSession, *, source: str, target: str, border: datetime) -> int:
+        return await self.rollups.compact_rollups(db, source=source, target=target, border=border)
+
+    async def get_history(
+            self,
+            db: AsyncSession,
+            *,
+            link_id: UUID,
+            limit: int,
+            offset: int = 0,
+            after: Optional[HistoryCursor] = None,
+    ) -> tuple[Sequence[Row], Optional[HistoryCursor]]:
+        return await self.history.get_detail_history(
+            db, link_id=link_id, columns=HISTORY_COLUMNS, limit=limit, offset=offset, after=after,
+        )
+
+    async def ping(self, db: AsyncSession) -> bool:
+        return await RepositoryDB.ping_db(db)
@@ -0,0 +1,506 @@
+import asyncio
+import uuid
+from collections import Counter
+from datetime import date, datetime
+from typing import Any, AsyncIterator, Optional, Sequence
+from uuid import UUID
+
+from core.config import DEFAULT_REDIRECT_STATUS, LINK_ID_CONFLICT
+from services.dedup import link_hash
+from services.hll import ALL_TIME, HyperLogLog, merge_all, sketches_for_clicks
+from services.pagination import HistoryCursor
+from services.rollups import ROLLUP_BUCKETS, minute_deltas
+from services.storage.base import HistoryRecord, LinkRecord, LinkStorage
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+# Меньше SQLITE_MAX_VARIABLE_NUMBER любых сборок SQLite
+IN_CHUNK_SIZE = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS short_link (
+    id TEXT PRIMARY KEY,
+    link_id TEXT NOT NULL UNIQUE,
+    original_link TEXT NOT NULL,
+    original_link_hash BLOB NOT NULL,
+    short_link TEXT NOT NULL,
+    is_active INTEGER NOT NULL DEFAULT 1,
+    usages_count INTEGER NOT NULL DEFAULT 0,
+    created_at TEXT NOT NULL,
+    redirect_status INTEGER NOT NULL DEFAULT 307,
+    cache_max_age INTEGER
+);
+CREATE INDEX IF NOT EXISTS ix_short_link_original_link_hash ON short_link (original_link_hash);
+CREATE INDEX IF NOT EXISTS ix_short_link_created_at ON short_link (created_at);
+CREATE TABLE IF NOT EXISTS short_link_history (
+    short_link_id TEXT NOT NULL REFERENCES short_link (id) ON DELETE CASCADE,
+    use_at TEXT NOT NULL,
+    id TEXT NOT NULL,
+    client_ip TEXT NOT NULL,
+    PRIMARY KEY (short_link_id, use_at, id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS short_link_visitors (
+    short_link_id TEXT NOT NULL REFERENCES short_link (id) ON DELETE CASCADE,
+    day TEXT NOT NULL,
+    sketch BLOB NOT NULL,
+    PRIMARY KEY (short_link_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS short_link_rollup (
+    short_link_id TEXT NOT NULL REFERENCES short_link (id) ON DELETE CASCADE,
+    bucket_start TEXT NOT NULL,
+    granularity INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (short_link_id, bucket_start, granularity)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS ix_short_link_rollup_granularity_bucket_start
+    ON short_link_rollup (granularity, bucket_start);
+"""
+
+# Колонки, добавленные после первой версии схемы: в существующие файлы они добавляются при подключении
+ADDED_LINK_COLUMNS = {
+    "redirect_status": f"INTEGER NOT NULL DEFAULT {DEFAULT_REDIRECT_STATUS}",
+    "cache_max_age": "INTEGER",
+}
+
+LINK_COLUMNS = (
+    "id, link_id, original_link, short_link, is_active, usages_count, created_at, redirect_status, cache_max_age"
+)
+
+
+def _format_time(value: datetime) -> str:
+    # Фиксированная ширина, чтобы строки сортировались как моменты времени
+    return value.isoformat(sep=" ", timespec="microseconds")
+
+
+def _truncate_time(column: str, bucket: str) -> str:
+    """SQL-выражение начала корзины: у строк _format_time это префикс и нули"""
+    length = {"minute": 16, "hour": 13, "day": 10}[bucket]
+    return f"substr({column}, 1, {length}) || '{_format_time(datetime.min)[length:]}'"
+
+
+def _link_record(row: tuple) -> LinkRecord:
+    id_, link_id, original_link, short_link, is_active, usages_count, created_at, redirect_status, cache_max_age = row
+    return LinkRecord(
+        UUID(id_), link_id, original_link, short_link, bool(is_active), usages_count,
+        datetime.fromisoformat(created_at), redirect_status, cache_max_age,
+    )
+
+
+class SQLiteStorage(LinkStorage):
+    """Хранилище в файле SQLite для однонодовых установок без Postgres.
+
+    Одно соединение aiosqlite в режиме WAL; операции сериализуются блокировкой, так как
+    SQLite всё равно допускает одного писателя, а транзакции разных корутин на одном
+    соединении не должны перемешиваться. Счётчик переходов - usages_count самой ссылки:
+    без параллельных писателей шардировать его незачем.
+    """
+
+    def __init__(self, path: str, *, visitors_precision: int, visitors_daily: bool):
+        if aiosqlite is None:
+            raise RuntimeError("sqlite storage requires the aiosqlite package")
+        self._path = path
+        self._visitors_precision = visitors_precision
+        self._visitors_daily = visitors_daily
+        self._conn: Optional["aiosqlite.Connection"] = None
+        self._lock = asyncio.Lock()
+
+    async def _connection(self) -> "aiosqlite.Connection":
+        if self._conn is None:
+            # isolation_level=None: транзакции открываются явно через BEGIN
+            conn = await aiosqlite.connect(self._path, isolation_level=None)
+            await conn.execute("PRAGMA journal_mode=WAL")
+            await conn.execute("PRAGMA synchronous=NORMAL")
+            await conn.execute("PRAGMA foreign_keys=ON")
+            await conn.executescript(SCHEMA)
+            async with conn.execute("SELECT name FROM pragma_table_info('short_link')") as cursor:
+                columns = {name for (name,) in await cursor.fetchall()}
+            for column, definition in ADDED_LINK_COLUMNS.items():
+                if column not in columns:
+                    await conn.execute(f"ALTER TABLE short_link ADD COLUMN {column} {definition}")
+            self._conn = conn
+        return self._conn
+
+    async def get_link(self, db: Any, link_id: str) -> Optional[LinkRecord]:
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute(f"SELECT {LINK_COLUMNS} FROM short_link WHERE link_id = ?", (link_id,)) as cursor:
+                row = await cursor.fetchone()
+        return _link_record(row) if row else None
+
+    async def get_links(self, db: Any, link_ids: list[str]) -> dict[str, LinkRecord]:
+        result = {}
+        async with self._lock:
+            conn = await self._connection()
+            for start in range(0, len(link_ids), IN_CHUNK_SIZE):
+                chunk = link_ids[start:start + IN_CHUNK_SIZE]
+                async with conn.execute(
+                    f"SELECT {LINK_COLUMNS} FROM short_link WHERE link_id IN ({','.join('?' * len(chunk))})", chunk,
+                ) as cursor:
+                    for row in await cursor.fetchall():
+                        link = _link_record(row)
+                        result[link.link_id] = link
+        return result
+
+    async def count_links(self, db: Any) -> int:
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute("SELECT count(*) FROM short_link") as cursor:
+                (count,) = await cursor.fetchone()
+        return count
+
+    async def stream_link_ids(
+            self,
+            db: Any,
+            *,
+            created_since: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[list[tuple[str, datetime]]]:
+        # Постранично по rowid: блокировка не держится, пока вызывающий обрабатывает пачку
+        last_rowid = 0
+        since = _format_time(created_since) if created_since is not None else ""
+        while True:
+            async with self._lock:
+                conn = await self._connection()
+                async with conn.execute(
+                    "SELECT rowid, link_id, created_at FROM short_link "
+                    "WHERE rowid > ? AND created_at > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, since, batch_size),
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            yield [(link_id, datetime.fromisoformat(created_at)) for _, link_id, created_at in rows]
+
+    async def get_top_links(self, db: Any, *, limit: int) -> list[LinkRecord]:
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute(
+                f"SELECT {LINK_COLUMNS} FROM short_link WHERE is_active ORDER BY usages_count DESC LIMIT ?", (limit,),
+            ) as cursor:
+                rows = await cursor.fetchall()
+        return [_link_record(row) for row in rows]
+
+    async def get_active_by_hashes(self, db: Any, *, hashes: list[bytes]) -> dict[bytes, tuple[str, str]]:
+        result = {}
+        async with self._lock:
+            conn = await self._connection()
+            for start in range(0, len(hashes), IN_CHUNK_SIZE):
+                chunk = hashes[start:start + IN_CHUNK_SIZE]
+                async with conn.execute(
+                    "SELECT original_link_hash, link_id, short_link FROM short_link "
+                    f"WHERE is_active AND original_link_hash IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                ) as cursor:
+                    for hash_, link_id, short_link in await cursor.fetchall():
+                        result.setdefault(hash_, (link_id, short_link))
+        return result
+
+    async def create_links(self, db: Any, *, rows: list[dict]) -> dict[str, Optional[str]]:
+        results: dict[str, Optional[str]] = {}
+        created_at = _format_time(datetime.utcnow())
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute("BEGIN")
+            try:
+                for start in range(0, len(rows), IN_CHUNK_SIZE):
+                    chunk = rows[start:start + IN_CHUNK_SIZE]
+                    async with conn.execute(
+                        f"SELECT link_id FROM short_link WHERE link_id IN ({','.join('?' * len(chunk))})",
+                        [row["link_id"] for row in chunk],
+                    ) as cursor:
+                        taken = {link_id for (link_id,) in await cursor.fetchall()}
+                    values = []
+                    for row in chunk:
+                        link_id = row["link_id"]
+                        if link_id in taken:
+                            results.setdefault(link_id, LINK_ID_CONFLICT)
+                            continue
+                        taken.add(link_id)
+                        results[link_id] = None
+                        redirect_status = row.get("redirect_status", DEFAULT_REDIRECT_STATUS)
+                        cache_max_age = row.get("cache_max_age")
+                        values.append((
+                            str(uuid.uuid4()), link_id, row["original_link"],
+                            link_hash(row["original_link"], redirect_status, cache_max_age),
+                            row["short_link"], created_at, redirect_status, cache_max_age,
+                        ))
+                    await conn.executemany(
+                        "INSERT INTO short_link (id, link_id, original_link, original_link_hash, short_link, "
+                        "created_at, redirect_status, cache_max_age) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                        values,
+                    )
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+        return results
+
+    async def deactivate_link(self, db: Any, *, link: LinkRecord) -> None:
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute("UPDATE short_link SET is_active = 0 WHERE id = ?", (str(link.id),))
+
+    async def deactivate_links(self, db: Any, *, link_ids: list[str]) -> dict[str, bool]:
+        result = {}
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute("BEGIN")
+            try:
+                for start in range(0, len(link_ids), IN_CHUNK_SIZE):
+                    chunk = link_ids[start:start + IN_CHUNK_SIZE]
+                    placeholders = ','.join('?' * len(chunk))
+                    async with conn.execute(
+                        f"SELECT link_id, is_active FROM short_link WHERE link_id IN ({placeholders})", chunk,
+                    ) as cursor:
+                        result.update((link_id, bool(is_active)) for link_id, is_active in await cursor.fetchall())
+                    await conn.execute(f"UPDATE short_link SET is_active = 0 WHERE link_id IN ({placeholders})", chunk)
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+        return result
+
+    async def record_clicks(self, db: Any, *, events: Sequence) -> None:
+        deltas = Counter(event.short_link_id for event in events)
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute("BEGIN")
+            try:
+                await conn.executemany(
+                    "INSERT INTO short_link_history (short_link_id, use_at, id, client_ip) VALUES (?, ?, ?, ?)",
+                    [
+                        (str(event.short_link_id), _format_time(event.use_at), str(uuid.uuid4()), event.client_ip)
+                        for event in events
+                    ],
+                )
+                await conn.executemany(
+                    "UPDATE short_link SET usages_count = usages_count + ? WHERE id = ?",
+                    [(delta, str(short_link_id)) for short_link_id, delta in deltas.items()],
+                )
+                await self._merge_sketches(conn, sketches_for_clicks(
+                    events, precision=self._visitors_precision, daily=self._visitors_daily,
+                ))
+                await conn.executemany(
+                    "INSERT INTO short_link_rollup (short_link_id, bucket_start, granularity, count) "
+                    "VALUES (?, ?, 0, ?) "
+                    "ON CONFLICT (short_link_id, bucket_start, granularity) "
+                    "DO UPDATE SET count = count + excluded.count",
+                    [
+                        (str(short_link_id), _format_time(start), delta)
+                        for (short_link_id, start), delta in minute_deltas(events).items()
+                    ],
+                )
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+
+    @staticmethod
+    async def _merge_sketches(conn: "aiosqlite.Connection", sketches: dict[tuple[UUID, date], HyperLogLog]) -> None:
+        keys = {(str(short_link_id), day.isoformat()): sketch for (short_link_id, day), sketch in sketches.items()}
+        link_ids = sorted({short_link_id for short_link_id, _ in keys})
+        days = sorted({day for _, day in keys})
+        # Выборка с запасом: пары (ссылка, день) из всех сочетаний, лишние отбрасываются
+        async with conn.execute(
+            "SELECT short_link_id, day, sketch FROM short_link_visitors "
+            f"WHERE short_link_id IN ({','.join('?' * len(link_ids))}) AND day IN ({','.join('?' * len(days))})",
+            link_ids + days,
+        ) as cursor:
+            for short_link_id, day, stored in await cursor.fetchall():
+                sketch = keys.get((short_link_id, day))
+                if sketch is not None:
+                    sketch.merge(HyperLogLog.from_bytes(stored))
+        await conn.executemany(
+            "INSERT INTO short_link_visitors (short_link_id, day, sketch) VALUES (?, ?, ?) "
+            "ON CONFLICT (short_link_id, day) DO UPDATE SET sketch = excluded.sketch",
+            [(short_link_id, day, sketch.to_bytes()) for (short_link_id, day), sketch in keys.items()],
+        )
+
+    async def get_unique_clients(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            since: Optional[date] = None,
+            until: Optional[date] = None,
+    ) -> int:
+        statement = "SELECT sketch FROM short_link_visitors WHERE short_link_id = ?"
+        params: list = [str(link_id)]
+        if since is None and until is None:
+            statement += " AND day = ?"
+            params.append(ALL_TIME.isoformat())
+        else:
+            statement += " AND day != ? AND day >= ? AND day <= ?"
+            params += [ALL_TIME.isoformat(), (since or date.min).isoformat(), (until or date.max).isoformat()]
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute(statement, params) as cursor:
+                rows = await cursor.fetchall()
+        merged = merge_all(HyperLogLog.from_bytes(sketch) for (sketch,) in rows)
+        return merged.count() if merged else 0
+
+    async def stream_history(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            since: Optional[datetime] = None,
+            until: Optional[datetime] = None,
+            batch_size: int = 10000,
+    ) -> AsyncIterator[list[tuple[datetime, str]]]:
+        # Keyset по (use_at, id): блокировка не держится, пока вызывающий обрабатывает пачку
+        last = (_format_time(since) if since is not None else "", "")
+        until_ = _format_time(until) if until is not None else "~"
+        while True:
+            async with self._lock:
+                conn = await self._connection()
+                async with conn.execute(
+                    "SELECT use_at, id, client_ip FROM short_link_history "
+                    "WHERE short_link_id = ? AND (use_at, id) > (?, ?) AND use_at < ? ORDER BY use_at, id LIMIT ?",
+                    (str(link_id), *last, until_, batch_size),
+                ) as cursor:
+                    rows = await cursor.fetchall()
+            if not rows:
+                return
+            last = rows[-1][:2]
+            yield [(datetime.fromisoformat(use_at), client_ip) for use_at, _, client_ip in rows]
+
+    async def get_timeseries(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            bucket: str,
+            since: datetime,
+            until: datetime,
+    ) -> list[tuple[datetime, int]]:
+        start = _truncate_time("bucket_start", bucket)
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute(
+                f"SELECT {start} AS start, sum(count) FROM short_link_rollup "
+                "WHERE short_link_id = ? AND bucket_start >= ? AND bucket_start < ? "
+                "GROUP BY start ORDER BY start",
+                (str(link_id), _format_time(since), _format_time(until)),
+            ) as cursor:
+                rows = await cursor.fetchall()
+        return [(datetime.fromisoformat(start), count) for start, count in rows]
+
+    async def compact_rollups(self, db: Any, *, source: str, target: str, border: datetime) -> int:
+        params = (ROLLUP_BUCKETS.index(source), _format_time(border))
+        async with self._lock:
+            conn = await self._connection()
+            await conn.execute("BEGIN")
+            try:
+                cursor = await conn.execute(
+                    "INSERT INTO short_link_rollup (short_link_id, bucket_start, granularity, count) "
+                    f"SELECT short_link_id, {_truncate_time('bucket_start', target)} AS start, ?, sum(count) "
+                    "FROM short_link_rollup WHERE granularity = ? AND bucket_start < ? "
+                    "GROUP BY short_link_id, start "
+                    "ON CONFLICT (short_link_id, bucket_start, granularity) "
+                    "DO UPDATE SET count = count + excluded.count",
+                    (ROLLUP_BUCKETS.index(target), *params),
+                )
+                compacted = cursor.rowcount
+                await conn.execute(
+                    "DELETE FROM short_link_rollup WHERE granularity = ? AND bucket_start < ?", params,
+                )
+                await conn.commit()
+            except BaseException:
+                await conn.rollback()
+                raise
+        return compacted
+
+    async def get_unique_clients_many(self, db: Any, *, link_ids: list[UUID]) -> dict[UUID, int]:
+        result = dict.fromkeys(link_ids, 0)
+        async with self._lock:
+            conn = await self._connection()
+            for start in range(0, len(link_ids), IN_CHUNK_SIZE):
+                chunk = [str(link_id) for link_id in link_ids[start:start + IN_CHUNK_SIZE]]
+                async with conn.execute(
+                    "SELECT short_link_id, sketch FROM short_link_visitors "
+                    f"WHERE day = ? AND short_link_id IN ({','.join('?' * len(chunk))})",
+                    [ALL_TIME.isoformat(), *chunk],
+                ) as cursor:
+                    for short_link_id, sketch in await cursor.fetchall():
+                        result[UUID(short_link_id)] = HyperLogLog.from_bytes(sketch).count()
+        return result
+
+    async def get_click_count(self, db: Any, *, link: LinkRecord) -> int:
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute("SELECT usages_count FROM short_link WHERE id = ?", (str(link.id),)) as cursor:
+                row = await cursor.fetchone()
+        return row[0] if row else 0
+
+    async def get_last_click_at(self, db: Any, *, link_id: UUID) -> Optional[datetime]:
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute(
+                "SELECT max(use_at) FROM short_link_history WHERE short_link_id = ?", (str(link_id),),
+            ) as cursor:
+                (use_at,) = await cursor.fetchone()
+        return datetime.fromisoformat(use_at) if use_at else None
+
+    async def get_click_counts(self, db: Any, *, links: Sequence[LinkRecord]) -> dict[UUID, int]:
+        result = {link.id: link.usages_count for link in links}
+        async with self._lock:
+            conn = await self._connection()
+            for start in range(0, len(links), IN_CHUNK_SIZE):
+                chunk = [str(link.id) for link in links[start:start + IN_CHUNK_SIZE]]
+                async with conn.execute(
+                    f"SELECT id, usages_count FROM short_link WHERE id IN ({','.join('?' * len(chunk))})", chunk,
+                ) as cursor:
+                    for id_, usages_count in await cursor.fetchall():
+                        result[UUID(id_)] = usages_count
+        return result
+
+    async def get_history(
+            self,
+            db: Any,
+            *,
+            link_id: UUID,
+            limit: int,
+            offset: int = 0,
+            after: Optional[HistoryCursor] = None,
+    ) -> tuple[list[HistoryRecord], Optional[HistoryCursor]]:
+        statement = "SELECT id, client_ip, use_at FROM short_link_history WHERE short_link_id = ?"
+        params: list = [str(link_id)]
+        if after is not None:
+            statement += " AND (use_at, id) > (?, ?)"
+            params += [_format_time(after.use_at), str(after.id)]
+        statement += " ORDER BY use_at, id LIMIT ?"
+        params.append(limit + 1)
+        if after is None and offset:
+            statement += " OFFSET ?"
+            params.append(offset)
+        async with self._lock:
+            conn = await self._connection()
+            async with conn.execute(statement, params) as cursor:
+                rows = await cursor.fetchall()
+        records = [
+            HistoryRecord(UUID(id_), link_id, client_ip, datetime.fromisoformat(use_at))
+            for id_, client_ip, use_at in rows
+        ]
+        if len(records) <= limit:
+            return records, None
+        records = records[:limit]
+        return records, HistoryCursor(records[-1].use_at, records[-1].id)
+
+    async def ping(self, db: Any) -> bool:
+        try:
+            async with self._lock:
+                conn = await self._connection()
+                await conn.execute("SELECT 1")
+            return True
+        except Exception:
+            return False
+
+    async def close(self) -> None:
+        if self._conn is not None:
+            await self._conn.close()
+            self._conn = None
@@ -0,0 +1,205 @@
+import asyncio
+import ipaddress
+import logging
+import os
+import socket
+import time
+from typing import Iterable, Optional, Union
+
+from services.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+blocklist_subnets = metrics.gauge("blocklist_subnets", "Subnets in the loaded blocklist")
+blocklist_reloads = metrics.counter(
+    "blocklist_reloads_total", "Blocklist file reloads: result=ok or error (the previous list stays)", ("result",),
+)
+blocked_requests = metrics.counter(
+    "blocked_requests_total", "Requests refused because the client address is in a blocked subnet", ("family",),
+)
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+# Старшие 96 бит IPv4-mapped адреса IPv6 (::ffff:a.b.c.d)
+IPV4_MAPPED_PREFIX = 0xFFFF
+
+
+class _Node:
+    """Узел trie: старшие length бит адреса в key; terminal - запрещена вся подсеть key/length"""
+
+    __slots__ = ("key", "length", "children", "terminal")
+
+    def __init__(self, key: int, length: int, terminal: bool = False):
+        self.key = key
+        self.length = length
+        self.children: list[Optional["_Node"]] = [None, None]
+        self.terminal = terminal
+
+
+class SubnetTrie:
+    """Множество подсетей IPv4 и IPv6 в виде сжатого двоичного префиксного дерева (radix trie).
+
+    Цепочки узлов с одним потомком схлопнуты, поэтому узлов не больше, чем 2 * число
+    подсетей, а проверка адреса проходит не больше 32 (128) узлов, обычно порядка
+    log2 числа подсетей, - в отличие от линейного перебора ip_network.
+    IPv4-mapped адреса IPv6 (::ffff:a.b.c.d) проверяются как IPv4.
+    """
+
+    def __init__(self, networks: Iterable[Network] = ()):
+        self._roots = {4: _Node(0, 0), 6: _Node(0, 0)}
+        self._widths = {4: 32, 6: 128}
+        self.count = 0
+        for network in networks:
+            self.add(network)
+
+    def add(self, network: Network) -> None:
+        width = self._widths[network.version]
+        length = network.prefixlen
+        key = int(network.network_address) >> (width - length)
+        node = self._roots[network.version]
+        while True:
+            # node.key - префикс key
+            if node.length == length:
+                if not node.terminal:
+                    node.terminal = True
+                    self.count += 1
+                return
+            bit = (key >> (length - node.length - 1)) & 1
+            child = node.children[bit]
+            if child is None:
+                node.children[bit] = _Node(key, length, terminal=True)
+                self.count += 1
+                return
+            # Длина общего префикса child и key; не меньше node.length + 1, так как бит совпал
+            common = min(child.length, length)
+            diff = (child.key >> (child.length - common)) ^ (key >> (length - common))
+            common -= diff.bit_length()
+            if common < child.length:
+                # Развилка внутри ребра до child: вставляем промежуточный узел
+                split = _Node(child.key >> (child.length - common), common)
+                split.children[(child.key >> (child.length - common - 1)) & 1] = child
+                node.children[bit] = split
+                child = split
+            node = child
+
+    def __contains__(self, address: Union[str, ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+        if not isinstance(address, str):
+            return self._contains(address.version, int(address))
+        # inet_pton в разы быстрее ipaddress.ip_address, а разбор адреса - основная часть проверки
+        try:
+            return self._contains(4, int.from_bytes(socket.inet_pton(socket.AF_INET, address), "big"))
+        except OSError:
+            pass
+        try:
+            return self._contains(6, int.from_bytes(socket.inet_pton(socket.AF_INET6, address), "big"))
+        except OSError:
+            # Не IP-адрес (unix-сокет, тестовый клиент) - не из запрещённой подсети
+            return False
+
+    def _contains(self, version: int, value: int) -> bool:
+        if version == 6 and value >> 32 == IPV4_MAPPED_PREFIX:
+            version, value = 4, value & 0xFFFFFFFF
+        width = self._widths[version]
+        node = self._roots[version]
+        while node is not None:
+            if value >> (width - node.length) != node.key:
+                return False
+            if node.terminal:
+                return True
+            if node.length == width:
+                return False
+            node = node.children[(value >> (width - node.length - 1)) & 1]
+        return False
+
+    def __len__(self) -> int:
+        return self.count
+
+
+def parse_blocklist(lines: Iterable[str], source: str = "<blocklist>") -> SubnetTrie:
+    """SubnetTrie из строк CIDR или адресов; # - комментарий, неверные строки пропускаются с предупреждением"""
+    trie = SubnetTrie()
+    for number, line in enumerate(lines, 1):
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        try:
+            trie.add(ipaddress.ip_network(line, strict=False))
+        except ValueError as err:
+            logger.warning("%s:%s: skipping invalid subnet %r: %s", source, number, line, err)
+    return trie
+
+
+def load_blocklist(path: str) -> SubnetTrie:
+    with open(path, encoding="utf-8") as file:
+        return parse_blocklist(file, source=path)
+
+
+class SubnetBlocklist:
+    """Чёрный список подсетей из файла path с перечитыванием на лету.
+
+    Раз в reload_interval секунд сравнивается mtime и размер файла; при изменении
+    новое дерево строится в потоке (asyncio.to_thread), не блокируя цикл событий, и
+    подменяет старое одним присваиванием. Если файл не читается или не в UTF-8,
+    остаётся прежний список. Пока список не загружен, никто не блокируется.
+    """
+
+    def __init__(self, path: Optional[str], *, reload_interval: float):
+        self.path = path
+        self._reload_interval = reload_interval
+        self._trie = SubnetTrie()
+        self._signature: Optional[tuple[float, int]] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def is_blocked(self, host: str) -> bool:
+        if not self._trie.count or host not in self._trie:
+            return False
+        blocked_requests.inc(("ipv6" if ":" in host else "ipv4",))
+        return True
+
+    async def start(self) -> None:
+        if self._task is not None or not self.path:
+            return
+        # Первая загрузка - до приёма запросов, дальше - в фоне
+        await self.reload()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self._reload_interval)
+            try:
+                await self.reload()
+            except Exception as err:
+                # Перечитывание не должно останавливаться навсегда из-за одной ошибки
+                blocklist_reloads.inc(("error",))
+                logger.exception("blocklist %s reload failed: %s", self.path, err)
+
+    async def reload(self, force: bool = False) -> bool:
+        """Перечитывает файл, если он изменился; True - список заменён"""
+        started = time.perf_counter()
+        try:
+            stat = await asyncio.to_thread(os.stat, self.path)
+            signature = (stat.st_mtime, stat.st_size)
+            if signature == self._signature and not force:
+                return False
+            trie = await asyncio.to_thread(load_blocklist, self.path)
+        # ValueError - в том числе UnicodeDecodeError: файл не в UTF-8
+        except (OSError, ValueError) as err:
+            blocklist_reloads.inc(("error",))
+            logger.error("blocklist %s is not loaded, keeping %s subnets: %s", self.path, self._trie.count, err)
+            return False
+        self._trie, self._signature = trie, signature
+        blocklist_reloads.inc(("ok",))
+        blocklist_subnets.set(trie.count)
+        logger.info(
+            "blocklist %s loaded: %s subnets, took %.3fs", self.path, trie.count, time.perf_counter() - started,
+        )
+        return True
@@ -0,0 +1,134 @@
+import asyncio
+import logging
+import time
+from contextlib import AsyncExitStack
+from datetime import datetime
+from typing import Callable, Optional, Sequence
+from uuid import UUID
+
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine, AsyncSession
+
+from db.routing import READ_ONLY
+from services.cache import LinkCache, LinkCacheEntry
+from services.dedup import url_hash
+from services.metrics import metrics
+from services.storage.base import LinkRecord, LinkStorage
+
+logger = logging.getLogger(__name__)
+
+startup_phase_seconds = metrics.gauge(
+    "startup_phase_seconds",
+    "Time from the startup event to the end of each warmup phase and to readiness",
+    ("phase",),
+)
+
+# Несуществующая ссылка: запросы прогрева проходят весь путь до БД, но ничего не находят
+WARMUP_LINK = LinkRecord(UUID(int=0), "", "https://warmup.invalid/", "", True, 0, datetime.min)
+
+
+class Warmup:
+    """Прогрев перед приёмом трафика после выкладки или масштабирования.
+
+    Открывает в каждом движке pool_connections соединений и выполняет на каждом горячие
+    запросы: кеш подготовленных выражений asyncpg живёт в соединении, кеш компиляции
+    SQLAlchemy - в движке. Затем загружает в кеш ссылок preload_links самых посещаемых
+    ссылок. До конца прогрева ready ложно (/ready отвечает 503); ошибка прогрева
+    только пишется в лог - без прогрева сервис работает, лишь первые запросы медленнее.
+    """
+
+    def __init__(
+            self,
+            session_factory: Callable[[], AsyncSession],
+            *,
+            storage: LinkStorage,
+            link_cache: LinkCache,
+            engines: Sequence[AsyncEngine],
+            pool_connections: int,
+            preload_links: int,
+            enabled: bool = True,
+    ):
+        self.session_factory = session_factory
+        self.storage = storage
+        self._link_cache = link_cache
+        self.engines = engines
+        self._pool_connections = pool_connections
+        self._preload_links = preload_links
+        self._enabled = enabled
+        self._task: Optional[asyncio.Task] = None
+        self.ready = False
+        self.startup_seconds: Optional[float] = None
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        started = time.perf_counter()
+        if not self._enabled:
+            self._finish(started)
+            return
+        self._task = asyncio.create_task(self._run(started))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def _run(self, started: float) -> None:
+        for phase, step in (("connections", self.prime), ("preload", self.preload)):
+            try:
+                await step()
+            except Exception as err:
+                logger.exception("warmup phase %s failed: %s", phase, err)
+            startup_phase_seconds.set(time.perf_counter() - started, (phase,))
+        self._finish(started)
+
+    def _finish(self, started: float) -> None:
+        self.startup_seconds = time.perf_counter() - started
+        startup_phase_seconds.set(self.startup_seconds, ("ready",))
+        self.ready = True
+        logger.info("ready to serve in %.3fs after startup", self.startup_seconds)
+
+    async def prime(self) -> None:
+        if not self.engines:
+            # Хранилищам без Postgres сессия не нужна: прогреваются их собственные соединения
+            await self._prime_queries(None)
+            return
+        await asyncio.gather(*(self._prime_engine(engine) for engine in self.engines))
+
+    async def _prime_engine(self, engine: AsyncEngine) -> None:
+        # Соединения сверх размера пула закрылись бы при возврате в пул
+        count = min(self._pool_connections, engine.pool.size())
+        async with AsyncExitStack() as stack:
+            # Соединения держатся одновременно, иначе пул выдавал бы одно и то же
+            connections = [await stack.enter_async_context(engine.connect()) for _ in range(count)]
+            await asyncio.gather(*(self._prime_connection(conn) for conn in connections))
+        logger.info("warmed up %s connections of %s", count, engine.url.host)
+
+    async def _prime_connection(self, conn: AsyncConnection) -> None:
+        async with AsyncSession(bind=conn) as db:
+            await self._prime_queries(db)
+
+    async def _prime_queries(self, db: Optional[AsyncSession]) -> None:
+        """Один раз каждый запрос путей редиректа, /status и создания ссылок"""
+        link = WARMUP_LINK
+        await self.storage.get_link(db, link.link_id)
+        await self.storage.get_links(db, [link.link_id])
+        await self.storage.get_active_by_hashes(db, hashes=[url_hash(link.original_link)])
+        await self.storage.get_click_count(db, link=link)
+        await self.storage.get_last_click_at(db, link_id=link.id)
+        await self.storage.get_unique_clients(db, link_id=link.id)
+        await self.storage.get_history(db, link_id=link.id, limit=1)
+
+    async def preload(self) -> None:
+        if self._preload_links <= 0:
+            return
+        async with self.session_factory() as db:
+            db.info[READ_ONLY] = True
+            links = await self.storage.get_top_links(db, limit=self._preload_links)
+        for link in links:
+            self._link_cache.put(link.link_id, LinkCacheEntry.from_link(link))
+        logger.info("preloaded %s most clicked links into the link cache", len(links))
@@ -0,0 +1,123 @@
+import os
+import random
+import subprocess
+import sys
+from collections import Counter
+from pathlib import Path
+
+import orjson
+import pytest
+
+from benchmarks.suite import percentile, print_results, summarize
+from benchmarks.workloads import (
+    BatchUploadWorkload,
+    DeepPagingWorkload,
+    RedirectWorkload,
+    load_workloads,
+    redirect_requests,
+    save_workloads,
+    zipf_sampler,
+)
+
+SRC = Path(__file__).resolve().parents[1]
+
+
+@pytest.mark.parametrize("share, expected", [(0.0, 1), (0.5, 50), (0.95, 95), (0.99, 99), (1.0, 100)])
+def test_percentile_is_nearest_rank(share, expected):
+    assert percentile([float(value) for value in range(1, 101)], share) == expected
+
+
+def test_percentile_of_no_values_is_zero():
+    assert percentile([], 0.99) == 0.0
+    assert summarize("empty", [], errors=3, elapsed=0.0)["p99_ms"] == 0.0
+
+
+def test_summarize_counts_errors_but_not_their_latency():
+    result = summarize("w", [0.001, 0.003, 0.002], errors=1, elapsed=0.5, concurrency=4)
+
+    assert result["requests"] == 4
+    assert result["throughput_rps"] == 6.0
+    assert (result["p50_ms"], result["max_ms"]) == (2.0, 3.0)
+    assert result["concurrency"] == 4
+
+
+def test_zipf_sampler_prefers_low_ranks():
+    sample = zipf_sampler(100, 1.1, random.Random(1))
+    counts = Counter(sample() for _ in range(20000))
+
+    assert set(counts) <= set(range(100))
+    assert counts[0] > counts[1] > counts[9] > counts[99]
+    # Доля первого ранга близка к 1 / H(100, 1.1) ~ 0.234
+    assert 0.22 < counts[0] / 20000 < 0.25
+
+
+def test_redirect_requests_are_reproducible_from_the_seed():
+    link_ids = [f"id{i}" for i in range(50)]
+    workload = RedirectWorkload(links=50, requests=200, seed=7)
+
+    first = list(redirect_requests(workload, link_ids))
+
+    assert first == list(redirect_requests(workload, link_ids))
+    assert first != list(redirect_requests(workload.copy(update={"seed": 8}), link_ids))
+    assert {spec.path.rsplit("/", 1)[1] for spec in first} <= set(link_ids)
+
+
+def test_workloads_survive_record_and_replay(tmp_path):
+    workloads = [
+        RedirectWorkload(requests=10, zipf_s=1.3),
+        BatchUploadWorkload(sizes=[1, 2]),
+        DeepPagingWorkload(name="paging", pages=2),
+    ]
+    path = tmp_path / "requests.jsonl"
+
+    save_workloads(str(path), workloads)
+
+    assert len(path.read_bytes().splitlines()) == 3
+    assert load_workloads(str(path)) == workloads
+
+
+def test_results_are_compared_with_the_baseline(capsys):
+    baseline = {"results": [
+        {"name": "redirect-zipf", "throughput_rps": 1000.0, "p99_ms": 10.0},
+        {"name": "batch-upload[10]", "throughput_rps": 0.0, "p99_ms": 0.0},
+    ]}
+    results = [
+        summarize("redirect-zipf", [0.004] * 100, errors=0, elapsed=0.08),
+        summarize("batch-upload[10]", [0.002], errors=0, elapsed=0.002),
+        summarize("deep-paging[cursor]", [0.001], errors=0, elapsed=0.001),
+    ]
+
+    print_results(results, baseline)
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1].endswith("rps +25.0%, p99 -60.0%")
+    # Нулевой базы и новой нагрузки сравнивать не с чем
+    assert lines[2].endswith("0")
+    assert lines[3].endswith("0")
+
+
+def test_suite_runs_against_asgi_target_with_memory_storage(tmp_path):
+    workloads = tmp_path / "requests.jsonl"
+    save_workloads(str(workloads), [
+        RedirectWorkload(links=10, requests=30, concurrency=4),
+        BatchUploadWorkload(sizes=[5], repeat=2),
+        DeepPagingWorkload(clicks=25, page_size=10, pages=3),
+    ])
+    out = tmp_path / "results.json"
+
+    # Хранилище выбирается при импорте приложения, поэтому набор запускается отдельным процессом
+    subprocess.run(
+        [sys.executable, "-m", "benchmarks.suite", "--target", "asgi",
+         "--replay", str(workloads), "--out", str(out)],
+        cwd=SRC, env=dict(os.environ, STORAGE_BACKEND="memory"), check=True, timeout=120,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+
+    report = orjson.loads(out.read_bytes())
+    results = {result["name"]: result for result in report["results"]}
+    assert list(results) == ["redirect-zipf", "batch-upload[5]", "deep-paging[cursor]", "deep-paging[offset]"]
+    assert all(result["errors"] == 0 for result in results.values())
+    assert results["redirect-zipf"]["requests"] == 30
+    assert results["batch-upload[5]"]["requests"] == 2
+    assert results["deep-paging[cursor]"]["requests"] == 3
+    assert len(report["meta"]["workloads"]) == 3
@@ -0,0 +1,62 @@
+import pytest
+
+from services.bloom import BloomFilter, LinkIdFilter
+from services.storage.memory import MemoryStorage
+
+
+def test_bloom_filter_has_no_false_negatives_and_bounded_false_positives():
+    bloom = BloomFilter.for_capacity(10000, error_rate=0.01, max_bytes=1 << 20)
+    for i in range(10000):
+        bloom.add(f"link{i}")
+
+    assert all(f"link{i}" in bloom for i in range(10000))
+    false_positives = sum(f"other{i}" in bloom for i in range(10000))
+    assert false_positives < 300
+    assert bloom.false_positive_rate() == pytest.approx(0.01, rel=0.5)
+
+
+def test_bloom_filter_size_is_capped():
+    bloom = BloomFilter.for_capacity(10 ** 7, error_rate=0.01, max_bytes=4096)
+
+    assert bloom.size_bytes == 4096
+
+
+@pytest.mark.asyncio
+async def test_link_filter_rejects_only_unknown_links():
+    storage = MemoryStorage(visitors_precision=12, visitors_daily=False)
+    await storage.create_links(None, rows=[
+        {"original_link": f"https://example.com/{i}", "link_id": f"id{i}", "short_link": f"short{i}"}
+        for i in range(100)
+    ])
+    link_filter = LinkIdFilter(
+        lambda: NullSession(), storage=storage, error_rate=0.001, max_bytes=1 << 16,
+        refresh_interval=1, rebuild_interval=60,
+    )
+
+    # До построения фильтр ничего не отсекает
+    assert link_filter.might_exist("missing")
+
+    await link_filter.rebuild()
+    link_filter.add(["fresh"])
+
+    assert all(link_filter.might_exist(f"id{i}") for i in range(100))
+    assert link_filter.might_exist("fresh")
+    assert not link_filter.might_exist("missing")
+
+    # Ссылка, созданная другим воркером, появляется после дочитывания
+    await storage.create_links(None, rows=[
+        {"original_link": "https://example.com/", "link_id": "other", "short_link": "s"},
+    ])
+    await link_filter.refresh()
+
+    assert link_filter.might_exist("other")
+
+
+class NullSession:
+    """Сессия для хранилищ, которым она не нужна"""
+
+    async def __aenter__(self):
+        return None
+
+    async def __aexit__(self, *exc_info):
+        return False
@@ -0,0 +1,90 @@
+from uuid import uuid4
+
+from services import cache
+from services.cache import MISS, LinkCache, LinkCacheEntry
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def entry(is_active: bool = True) -> LinkCacheEntry:
+    return LinkCacheEntry(uuid4(), "https://example.com/", is_active)
+
+
+def test_entries_expire_after_ttl_and_negative_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    link_cache = LinkCache(max_size=10, ttl=60, negative_ttl=5)
+    active, deleted = entry(), entry(is_active=False)
+    link_cache.put("active", active)
+    link_cache.put("deleted", deleted)
+    link_cache.put("missing", None)
+
+    assert link_cache.get("active") == active
+    assert link_cache.get("deleted") == deleted
+    assert link_cache.get("missing") is None
+    assert link_cache.get("unknown") is MISS
+
+    # 404 и 410 живут negative_ttl, активные ссылки - ttl
+    clock.now += 6
+    assert link_cache.get("active") == active
+    assert link_cache.get("deleted") is MISS
+    assert link_cache.get("missing") is MISS
+
+    clock.now += 60
+    assert link_cache.get("active") is MISS
+    assert len(link_cache) == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    link_cache = LinkCache(max_size=2, ttl=60, negative_ttl=5)
+    link_cache.put("a", entry())
+    link_cache.put("b", entry())
+    # Чтение делает "a" самой свежей, вытесняется "b"
+    link_cache.get("a")
+    link_cache.put("c", entry())
+
+    assert link_cache.get("b") is MISS
+    assert link_cache.get("a") is not MISS
+    assert link_cache.get("c") is not MISS
+    assert len(link_cache) == 2
+
+    link_cache.invalidate("a")
+    assert link_cache.get("a") is MISS
+
+
+def test_zero_size_disables_cache():
+    link_cache = LinkCache(max_size=0, ttl=60, negative_ttl=5)
+    link_cache.put("a", entry())
+
+    assert link_cache.get("a") is MISS
+
+
+def test_read_started_before_invalidate_is_not_cached():
+    link_cache = LinkCache(max_size=2, ttl=60, negative_ttl=5)
+    stale = link_cache.version()
+    link_cache.invalidate("deleted")
+
+    link_cache.put("deleted", entry())
+    link_cache.put("other", entry(), stale)
+    assert link_cache.get("other") != MISS
+
+    link_cache.invalidate("deleted")
+    link_cache.put("deleted", entry(), stale)
+    assert link_cache.get("deleted") is MISS
+
+    fresh = link_cache.version()
+    link_cache.put("deleted", entry(is_active=False), fresh)
+    assert not link_cache.get("deleted").is_active
+
+    # Меток хранится не больше max_size, но вытесненная метка не теряет силу
+    stale = link_cache.version()
+    for link_id in ("deleted", "a", "b"):
+        link_cache.invalidate(link_id)
+    link_cache.put("deleted", entry(), stale)
+    assert link_cache.get("deleted") is MISS
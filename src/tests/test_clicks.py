@@ -0,0 +1,77 @@
+import asyncio
+from datetime import datetime
+from uuid import uuid4
+
+import pytest
+
+from db.short_links_db_base import async_session
+from services.clicks import ClickEvent, ClickRecorder
+from services.storage.memory import MemoryStorage
+
+
+class RecordingStorage(MemoryStorage):
+    """Запоминает пачки переходов; пока gate закрыт, запись висит, как на медленной БД"""
+
+    def __init__(self):
+        super().__init__(visitors_precision=12, visitors_daily=False)
+        self.batches: list[int] = []
+        self.gate = asyncio.Event()
+        self.gate.set()
+
+    async def record_clicks(self, db, *, events):
+        await self.gate.wait()
+        self.batches.append(len(events))
+        await super().record_clicks(db, events=events)
+
+
+def click(link_id) -> ClickEvent:
+    return ClickEvent(link_id, "127.0.0.1:1", datetime.utcnow())
+
+
+@pytest.mark.asyncio
+async def test_stop_flushes_buffered_clicks():
+    storage = RecordingStorage()
+    recorder = ClickRecorder(async_session, storage=storage, batch_size=10, flush_interval=60, queue_size=100)
+    link_id = uuid4()
+    await recorder.start()
+    for _ in range(25):
+        await recorder.record(click(link_id))
+
+    await recorder.stop()
+
+    assert not recorder.is_running
+    assert sum(storage.batches) == 25
+    assert max(storage.batches) <= 10
+    assert storage._clicks[link_id] == 25
+
+
+@pytest.mark.asyncio
+async def test_full_queue_applies_backpressure_without_losing_clicks():
+    storage = RecordingStorage()
+    storage.gate.clear()
+    recorder = ClickRecorder(async_session, storage=storage, batch_size=1, flush_interval=0, queue_size=2)
+    link_id = uuid4()
+    await recorder.start()
+    # Одна пачка в записи, две в очереди - следующий record ждёт места
+    for _ in range(3):
+        await recorder.record(click(link_id))
+    blocked = asyncio.create_task(recorder.record(click(link_id)))
+    await asyncio.sleep(0.05)
+
+    assert not blocked.done()
+
+    storage.gate.set()
+    await asyncio.wait_for(blocked, 1)
+    await recorder.stop()
+
+    assert sum(storage.batches) == 4
+
+
+@pytest.mark.asyncio
+async def test_record_without_background_task_writes_immediately():
+    storage = RecordingStorage()
+    recorder = ClickRecorder(async_session, storage=storage, batch_size=10, flush_interval=60, queue_size=100)
+
+    await recorder.record(click(uuid4()))
+
+    assert storage.batches == [1]
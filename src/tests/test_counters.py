@@ -0,0 +1,37 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from api.v1.handlers.short_link_service import get_item_object_in_for_url
+from services.clicks import ClickEvent, ClickRecorder
+from services.storage.postgres import PostgresStorage
+
+PARALLEL_REDIRECTS = 2000
+
+
+@pytest.mark.asyncio
+async def test_parallel_clicks_are_not_lost(db_dsn):
+    engine = create_async_engine(db_dsn, pool_size=20, max_overflow=20)
+    session_factory = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    storage = PostgresStorage(chunk_size=100, counter_shards=4, visitors_precision=12, visitors_daily=False)
+    recorder = ClickRecorder(session_factory, storage=storage, batch_size=1, flush_interval=0, queue_size=1)
+    try:
+        async with session_factory() as db:
+            obj_in = await get_item_object_in_for_url(db, "https://example.com/")
+            await storage.create_links(db, rows=[obj_in.dict()])
+            sl_obj = await storage.get_link(db, obj_in.link_id)
+
+        # Каждый переход - отдельная транзакция, как при многих воркерах без буферизации
+        await asyncio.gather(*(
+            recorder.flush([ClickEvent(sl_obj.id, f"127.0.0.1:{i}", datetime.utcnow())])
+            for i in range(PARALLEL_REDIRECTS)
+        ))
+
+        async with session_factory() as db:
+            total = await storage.counters.get_counter_total(db, short_link_id=sl_obj.id)
+        assert total == PARALLEL_REDIRECTS
+    finally:
+        await engine.dispose()
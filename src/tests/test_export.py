@@ -0,0 +1,32 @@
+from datetime import datetime
+
+import orjson
+import pytest
+
+from services.export import encode_history
+
+
+async def batches(*items):
+    for batch in items:
+        yield batch
+
+
+@pytest.mark.asyncio
+async def test_history_is_encoded_one_chunk_per_batch():
+    moment = datetime(2024, 1, 1, 12, 30)
+    history = ([(moment, "127.0.0.1:1"), (moment, "127.0.0.1:2")], [(moment, "10.0.0.1:3")])
+
+    ndjson = [chunk async for chunk in encode_history(batches(*history), "ndjson")]
+    csv_ = [chunk async for chunk in encode_history(batches(*history), "csv")]
+
+    assert len(ndjson) == len(csv_) == 2
+    assert [orjson.loads(line) for line in b"".join(ndjson).splitlines()] == [
+        {"use_at": "2024-01-01T12:30:00", "client_ip": ip} for ip in ("127.0.0.1:1", "127.0.0.1:2", "10.0.0.1:3")
+    ]
+    assert b"".join(csv_).decode().splitlines() == [
+        "use_at,client_ip",
+        "2024-01-01T12:30:00,127.0.0.1:1",
+        "2024-01-01T12:30:00,127.0.0.1:2",
+        "2024-01-01T12:30:00,10.0.0.1:3",
+    ]
+    assert [chunk async for chunk in encode_history(batches(), "csv")] == [b"use_at,client_ip\r\n"]
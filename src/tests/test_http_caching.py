@@ -0,0 +1,34 @@
+import uuid
+from datetime import datetime
+
+from api.v1.handlers.short_link_service import is_not_modified, redirect_cache_control, status_validators
+from core.config import app_settings
+from services.cache import LinkCacheEntry
+from services.storage import LinkRecord
+
+
+def test_redirect_is_cached_only_by_link_policy():
+    entry = LinkCacheEntry(uuid.uuid4(), "https://example.com/", True)
+
+    assert redirect_cache_control(entry) is None
+    assert redirect_cache_control(entry._replace(cache_max_age=60)) == "public, max-age=60"
+    assert redirect_cache_control(entry._replace(redirect_status=301)) == (
+        f"public, max-age={app_settings.permanent_redirect_max_age}"
+    )
+    assert redirect_cache_control(entry._replace(redirect_status=308, cache_max_age=0)) == "public, max-age=0"
+
+
+def test_status_is_not_modified_until_new_clicks():
+    link = LinkRecord(uuid.uuid4(), "abc", "https://example.com/", "http://s/abc", True, 0, datetime(2024, 1, 1))
+    headers = status_validators(link, 5, datetime(2024, 1, 2, 12, 30, 15, 500))
+    newer = status_validators(link, 6, datetime(2024, 1, 2, 12, 31))
+
+    assert headers["last-modified"] == "Tue, 02 Jan 2024 12:30:15 GMT"
+    assert is_not_modified(headers, headers["etag"], None)
+    assert is_not_modified(headers, f'"other", W/{headers["etag"]}', None)
+    assert not is_not_modified(newer, headers["etag"], None)
+    assert is_not_modified(headers, None, headers["last-modified"])
+    assert not is_not_modified(newer, None, headers["last-modified"])
+    # If-None-Match важнее If-Modified-Since; неразборчивая дата - не повод для 304
+    assert not is_not_modified(newer, headers["etag"], newer["last-modified"])
+    assert not is_not_modified(headers, None, "yesterday")
@@ -0,0 +1,207 @@
+import asyncio
+
+import pytest
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from services.id_generator import (
+    BASE62_ALPHABET,
+    BlockSequenceIdGenerator,
+    SnowflakeIdGenerator,
+    base62_encode,
+    make_id_generator,
+)
+
+
+def base62_decode(value: str) -> int:
+    number = 0
+    for char in value:
+        number = number * 62 + BASE62_ALPHABET.index(char)
+    return number
+
+
+@pytest.mark.parametrize("number, encoded", [(0, "0"), (61, "z"), (62, "10"), (62 ** 9 - 1, "z" * 9)])
+def test_base62_encode(number, encoded):
+    assert base62_encode(number) == encoded
+    assert base62_decode(encoded) == number
+
+
+def test_base62_rejects_negative_numbers():
+    with pytest.raises(ValueError):
+        base62_encode(-1)
+
+
+class FrozenClock:
+    """Миллисекунда сменяется раз в ticks_per_ms обращений: счётчик успевает исчерпаться"""
+
+    def __init__(self, start_ms: int, ticks_per_ms: int):
+        self._start_ms = start_ms
+        self._ticks_per_ms = ticks_per_ms
+        self._calls = 0
+
+    def __call__(self) -> int:
+        self._calls += 1
+        return self._start_ms + self._calls // self._ticks_per_ms
+
+
+@pytest.mark.asyncio
+async def test_snowflake_ids_are_unique_and_increasing():
+    generator = SnowflakeIdGenerator(worker_id=7)
+    generator._now_ms = FrozenClock(SnowflakeIdGenerator.EPOCH_MS + 10 ** 9, ticks_per_ms=4200)
+
+    batches = await asyncio.gather(*(generator.next_ids(None, 1000) for _ in range(20)))
+    numbers = [base62_decode(link_id) for batch in batches for link_id in batch]
+
+    assert len(set(numbers)) == len(numbers)
+    # Пачки выдаются целиком по очереди, поэтому номера растут и между пачками
+    assert numbers == sorted(numbers)
+    assert {(number >> SnowflakeIdGenerator.SEQUENCE_BITS) & 0xFF for number in numbers} == {7}
+
+
+@pytest.mark.asyncio
+async def test_snowflake_survives_clock_going_back():
+    generator = SnowflakeIdGenerator(worker_id=1)
+    moments = iter([SnowflakeIdGenerator.EPOCH_MS + 1000, SnowflakeIdGenerator.EPOCH_MS + 500])
+    generator._now_ms = lambda: next(moments)
+
+    first, second = (base62_decode(link_id) for link_id in await generator.next_ids(None, 2))
+
+    assert second > first
+
+
+def test_static_worker_id_is_rejected_for_several_processes():
+    with pytest.raises(ValueError):
+        make_id_generator("snowflake", length=10, worker_id=3, workers=4)
+    with pytest.raises(ValueError):
+        SnowflakeIdGenerator(worker_id=None, engine=None)
+
+
+@pytest.mark.asyncio
+async def test_worker_ids_are_leased_per_process(db_dsn):
+    engine = create_async_engine(db_dsn)
+    first, second = (SnowflakeIdGenerator(engine=engine, lease_check_interval=0.01) for _ in range(2))
+    try:
+        await first.start()
+        await second.start()
+        assert first.worker_id != second.worker_id
+
+        # Номер, занятый другим процессом, нельзя задать и явно
+        with pytest.raises(RuntimeError):
+            await SnowflakeIdGenerator(worker_id=first.worker_id, engine=engine, lease_check_interval=0.01).start()
+
+        leased = first.worker_id
+        await first.stop()
+        static = SnowflakeIdGenerator(worker_id=leased, engine=engine, lease_check_interval=0.01)
+        await static.start()
+        assert static.worker_id == leased
+        await static.stop()
+    finally:
+        await first.stop()
+        await second.stop()
+        await engine.dispose()
+
+
+class LeaseEngine:
+    """advisory-блокировки номеров воркеров в памяти; соединение можно оборвать"""
+
+    def __init__(self, taken: set[int]):
+        self.taken = taken
+        self.connections: list["LeaseConnection"] = []
+
+    async def connect(self) -> "LeaseConnection":
+        self.connections.append(LeaseConnection(self))
+        return self.connections[-1]
+
+
+class LeaseConnection:
+    def __init__(self, engine: LeaseEngine):
+        self.engine = engine
+        self.alive = True
+        self.worker_ids: set[int] = set()
+
+    async def execution_options(self, **options):
+        return self
+
+    async def scalar(self, statement):
+        if not self.alive:
+            raise ConnectionResetError("connection was closed by the server")
+        params = list(statement.compile().params.values())
+        if len(params) < 2:
+            return 1
+        if params[1] in self.engine.taken:
+            return False
+        self.engine.taken.add(params[1])
+        self.worker_ids.add(params[1])
+        return True
+
+    async def close(self):
+        self.alive = False
+
+
+@pytest.mark.asyncio
+async def test_lost_lease_is_detected_before_issuing_ids():
+    engine = LeaseEngine(taken={0})
+    generator = SnowflakeIdGenerator(engine=engine, lease_check_interval=0.01)
+    await generator.start()
+    assert generator.worker_id == 1
+
+    # Сервер оборвал соединение аренды, и номер 1 сразу взял другой процесс
+    engine.connections[0].alive = False
+    await asyncio.sleep(0.02)
+    numbers = [base62_decode(link_id) for link_id in await generator.next_ids(None, 3)]
+
+    assert generator.worker_id == 2
+    assert {(number >> SnowflakeIdGenerator.SEQUENCE_BITS) & 0xFF for number in numbers} == {2}
+    assert len(engine.connections) == 2
+    await generator.stop()
+    assert not engine.connections[1].alive
+
+
+class SequenceSession:
+    """Сессия с последовательностью INCREMENT BY block_size в памяти вместо Postgres"""
+
+    def __init__(self, block_size: int):
+        self.block_size = block_size
+        self.value = 1 - block_size
+        self.queries = 0
+
+    async def execute(self, statement, params=None):
+        self.queries += 1
+        if "pg_sequences" in str(statement):
+            return Result([self.block_size])
+        blocks = int(statement.compile().params["generate_series_2"])
+        starts = []
+        for _ in range(blocks):
+            self.value += self.block_size
+            starts.append(self.value)
+        return Result(starts)
+
+
+class Result:
+    def __init__(self, values):
+        self._values = values
+
+    def scalar_one(self):
+        return self._values[0]
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self._values
+
+
+@pytest.mark.asyncio
+async def test_block_sequence_workers_get_disjoint_ranges():
+    db = SequenceSession(block_size=100)
+    first, second = BlockSequenceIdGenerator(), BlockSequenceIdGenerator()
+
+    ids = await first.next_ids(db, 150) + await second.next_ids(db, 30) + await first.next_ids(db, 60)
+    numbers = [base62_decode(link_id) for link_id in ids]
+
+    assert len(set(numbers)) == len(numbers) == 240
+    # first: блоки [1, 101) и [101, 201), second - [201, 301); остаток блока first расходуется первым
+    assert numbers[:150] == list(range(1, 151))
+    assert numbers[150:180] == list(range(201, 231))
+    assert numbers[180:] == list(range(151, 201)) + list(range(301, 311))
+    # increment_by дважды, блоки: 2 для first, 1 для second, ещё 1 для first
+    assert db.queries == 5
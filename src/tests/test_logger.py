@@ -0,0 +1,40 @@
+import logging
+
+from core import logger as logger_module
+from core.logger import setup_logging
+
+
+class Collector(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines: list[str] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines.append(self.format(record))
+
+
+def test_prod_mode_samples_access_log_and_registers_atexit_once(monkeypatch):
+    registered = []
+    monkeypatch.setattr(logger_module.atexit, "register", registered.append)
+    monkeypatch.setattr(logger_module, "_atexit_registered", False)
+    access = logging.getLogger("uvicorn.access")
+    try:
+        setup_logging(mode="prod", sample_rate=0.0)
+        setup_logging(mode="prod", sample_rate=0.0)
+        # Вывод access-лога - в потоке слушателя, с форматтером uvicorn
+        listener = logger_module._listeners[-1]
+        (access_handler,) = listener.handlers
+        collector = Collector()
+        collector.setFormatter(access_handler.formatter)
+        listener.handlers = (collector,)
+
+        access.info('%s - "%s %s HTTP/%s" %d', "10.0.0.1:5000", "GET", "/sampled", "1.1", 200)
+        access.warning('%s - "%s %s HTTP/%s" %d', "10.0.0.1:5000", "GET", "/kept", "1.1", 500)
+    finally:
+        # Остановка дожидается вывода всех записей из очереди
+        logger_module._stop_listeners()
+        setup_logging()
+
+    assert len(collector.lines) == 1
+    assert "GET /kept HTTP/1.1" in collector.lines[0] and "500" in collector.lines[0]
+    assert registered == [logger_module._stop_listeners]
@@ -0,0 +1,154 @@
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+import pytest
+
+from services.partitions import HistoryPartitionManager, Partition, next_period, period_start
+
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+        self.rowcount = value or 0
+
+    def scalar(self):
+        return self.value
+
+
+class RecordingSession:
+    """Сессия, которая запоминает выполненный SQL вместо обращения к БД.
+
+    answers - ответы на запросы по началу их текста; fail_on - запрос с этой
+    подстрокой падает, как упал бы в Postgres.
+    """
+
+    def __init__(self, answers: dict = None, fail_on: str = None):
+        self.statements: list[str] = []
+        self.answers = answers or {}
+        self.fail_on = fail_on
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    @asynccontextmanager
+    async def begin(self):
+        yield
+
+    async def execute(self, statement, params=None):
+        statement = str(statement)
+        if self.fail_on and self.fail_on in statement:
+            raise RuntimeError(f"failed: {statement}")
+        self.statements.append(statement)
+        answer = next((value for prefix, value in self.answers.items() if statement.startswith(prefix)), None)
+        return FakeResult(answer)
+
+
+def make_manager(
+        session: RecordingSession, existing: list[Partition], default: str = None, **kwargs,
+) -> HistoryPartitionManager:
+    manager = HistoryPartitionManager(lambda: session, table="history", check_interval=60, **kwargs)
+
+    async def list_partitions(db):
+        return existing
+
+    async def find_default_partition(db):
+        return default
+
+    manager.list_partitions = list_partitions
+    manager.find_default_partition = find_default_partition
+    return manager
+
+
+@pytest.mark.parametrize("interval, moment, start, end", [
+    ("day", datetime(2024, 3, 5, 17, 30), datetime(2024, 3, 5), datetime(2024, 3, 6)),
+    ("week", datetime(2024, 3, 7, 1), datetime(2024, 3, 4), datetime(2024, 3, 11)),
+    ("month", datetime(2024, 1, 31, 23), datetime(2024, 1, 1), datetime(2024, 2, 1)),
+    ("month", datetime(2024, 12, 15), datetime(2024, 12, 1), datetime(2025, 1, 1)),
+])
+def test_period_bounds(interval, moment, start, end):
+    assert period_start(moment, interval) == start
+    assert next_period(start, interval) == end
+
+
+@pytest.mark.asyncio
+async def test_future_partitions_are_created_except_existing_ranges():
+    session = RecordingSession()
+    existing = [Partition("history_p20240305", datetime(2024, 3, 5), datetime(2024, 3, 6))]
+    manager = make_manager(session, existing, interval="day", ahead=2, retention_days=None)
+
+    created = await manager.create_future_partitions(datetime(2024, 3, 5, 12))
+
+    assert created == ["history_p20240306", "history_p20240307"]
+    assert "FOR VALUES FROM ('2024-03-06T00:00:00') TO ('2024-03-07T00:00:00')" in session.statements[0]
+
+
+@pytest.mark.asyncio
+async def test_rows_in_default_partition_are_moved_into_the_new_partition():
+    session = RecordingSession(answers={"SELECT EXISTS": True, "WITH moved": 5})
+    manager = make_manager(session, [], default="history_default", interval="day", ahead=0, retention_days=None)
+
+    assert await manager.create_future_partitions(datetime(2024, 3, 5, 12)) == ["history_p20240305"]
+    in_range = "use_at >= '2024-03-05T00:00:00' AND use_at < '2024-03-06T00:00:00'"
+    assert session.statements == [
+        f'SELECT EXISTS (SELECT 1 FROM "history_default" WHERE {in_range})',
+        'CREATE TABLE "history_p20240305" (LIKE "history" INCLUDING DEFAULTS)',
+        f'WITH moved AS (DELETE FROM "history_default" WHERE {in_range} RETURNING *) '
+        'INSERT INTO "history_p20240305" SELECT * FROM moved',
+        'ALTER TABLE "history" ATTACH PARTITION "history_p20240305" '
+        "FOR VALUES FROM ('2024-03-05T00:00:00') TO ('2024-03-06T00:00:00')",
+    ]
+
+
+@pytest.mark.asyncio
+async def test_failed_partition_does_not_block_the_following_ones():
+    session = RecordingSession(fail_on="history_p20240306")
+    manager = make_manager(session, [], interval="day", ahead=2, retention_days=None)
+
+    created = await manager.create_future_partitions(datetime(2024, 3, 5, 12))
+
+    assert created == ["history_p20240305", "history_p20240307"]
+
+
+@pytest.mark.asyncio
+async def test_only_partitions_entirely_past_retention_are_dropped():
+    session = RecordingSession()
+    existing = [
+        Partition("history_p20240101", datetime(2024, 1, 1), datetime(2024, 1, 2)),
+        # Граница совпадает с началом окна хранения - все строки старше, секция удаляется
+        Partition("history_p20240109", datetime(2024, 1, 9), datetime(2024, 1, 10)),
+        # Часть строк ещё в окне хранения - секция остаётся
+        Partition("history_p20240110", datetime(2024, 1, 10), datetime(2024, 1, 11)),
+    ]
+    manager = make_manager(session, existing, interval="day", ahead=0, retention_days=30)
+
+    dropped = await manager.drop_expired_partitions(datetime(2024, 2, 9))
+
+    assert dropped == ["history_p20240101", "history_p20240109"]
+    assert session.statements == [
+        'ALTER TABLE "history" DETACH PARTITION "history_p20240101"',
+        'DROP TABLE "history_p20240101"',
+        'ALTER TABLE "history" DETACH PARTITION "history_p20240109"',
+        'DROP TABLE "history_p20240109"',
+    ]
+
+
+@pytest.mark.asyncio
+async def test_without_retention_nothing_is_dropped():
+    session = RecordingSession()
+    existing = [Partition("history_p20000101", datetime(2000, 1, 1), datetime(2000, 1, 2))]
+    manager = make_manager(session, existing, interval="day", ahead=0, retention_days=None)
+
+    assert await manager.drop_expired_partitions(datetime(2024, 1, 1)) == []
+    assert session.statements == []
+
+
+@pytest.mark.asyncio
+async def test_expired_rows_of_default_partition_are_deleted():
+    session = RecordingSession(answers={"DELETE": 3})
+    manager = make_manager(session, [], default="history_default", interval="day", ahead=0, retention_days=30)
+
+    assert await manager.drop_expired_partitions(datetime(2024, 2, 9)) == []
+    assert session.statements == ['DELETE FROM "history_default" WHERE use_at < :border']
@@ -0,0 +1,115 @@
+from contextlib import asynccontextmanager
+
+import orjson
+import pytest
+
+from api.v1.handlers import short_link_service as handlers
+from core.config import LINK_NOT_FOUND, PAGE_DELETED
+from middlewares import redirect_fast_path
+from middlewares.redirect_fast_path import RedirectFastPathMiddleware
+from services.cache import LinkCache
+from services.storage.memory import MemoryStorage
+
+
+class FakeSessions:
+    """Фабрика сессий без БД: хранилищу в памяти сессия не нужна, считаются только открытия"""
+
+    def __init__(self):
+        self.opened = 0
+
+    @asynccontextmanager
+    async def __call__(self):
+        self.opened += 1
+        yield type("Session", (), {"info": {}})()
+
+
+class RecordingClicks:
+    def __init__(self):
+        self.events = []
+
+    async def record(self, event):
+        self.events.append(event)
+
+
+@pytest.fixture
+def fast_path(monkeypatch):
+    storage = MemoryStorage(visitors_precision=12, visitors_daily=False)
+    link_cache = LinkCache(max_size=100, ttl=60, negative_ttl=60)
+    clicks = RecordingClicks()
+    monkeypatch.setattr(handlers, "storage", storage)
+    monkeypatch.setattr(handlers, "link_cache", link_cache)
+    monkeypatch.setattr(redirect_fast_path, "link_cache", link_cache)
+    monkeypatch.setattr(redirect_fast_path, "click_recorder", clicks)
+    # Фильтр не загружен - пропускает все link_id
+    monkeypatch.setattr(handlers.link_filter, "_filter", None)
+    passed = []
+
+    async def app(scope, receive, send):
+        passed.append(scope["path"])
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    sessions = FakeSessions()
+    middleware = RedirectFastPathMiddleware(
+        app, prefix="/api/v1", reserved=frozenset({"ping"}), session_factory=sessions,
+    )
+
+    async def call(path: str, method: str = "GET") -> tuple[int, dict, bytes]:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        scope = {"type": "http", "method": method, "path": path, "client": ("10.0.0.1", 5000)}
+        await middleware(scope, None, send)
+        start, body = messages
+        return start["status"], {k.decode(): v.decode() for k, v in start["headers"]}, body["body"]
+
+    return storage, sessions, clicks, passed, call
+
+
+@pytest.mark.asyncio
+async def test_redirect_is_served_from_storage_then_from_cache(fast_path):
+    storage, sessions, clicks, _, call = fast_path
+    await storage.create_links(None, rows=[{
+        "original_link": "https://example.com/a b", "link_id": "live", "short_link": "http://s/live",
+        "redirect_status": 301, "cache_max_age": 600,
+    }])
+
+    for _ in range(2):
+        status_code, headers, body = await call("/api/v1/live")
+
+        assert status_code == 301
+        assert headers["location"] == "https://example.com/a%20b"
+        assert headers["cache-control"] == "public, max-age=600"
+        assert body == b""
+    # Второй редирект - из кеша ссылок, без сессии БД
+    assert sessions.opened == 1
+    assert [event.client_ip for event in clicks.events] == ["10.0.0.1:5000"] * 2
+
+
+@pytest.mark.asyncio
+async def test_missing_and_deleted_links(fast_path):
+    storage, _, clicks, _, call = fast_path
+    await storage.create_links(None, rows=[
+        {"original_link": "https://example.com/", "link_id": "gone", "short_link": "http://s/gone"},
+    ])
+    await storage.deactivate_link(None, link=await storage.get_link(None, "gone"))
+
+    for path, status_code, detail in (("/api/v1/missing", 404, LINK_NOT_FOUND), ("/api/v1/gone", 410, PAGE_DELETED)):
+        response_status, headers, body = await call(path)
+
+        assert response_status == status_code
+        assert headers["content-type"] == "application/json"
+        assert orjson.loads(body) == {"detail": detail}
+    assert clicks.events == []
+
+
+@pytest.mark.asyncio
+async def test_other_requests_are_passed_to_the_app(fast_path):
+    _, sessions, _, passed, call = fast_path
+
+    for path, method in (("/api/v1/ping", "GET"), ("/api/v1/live", "DELETE"), ("/api/v1/live/status", "GET")):
+        assert (await call(path, method))[0] == 200
+    assert passed == ["/api/v1/ping", "/api/v1/live", "/api/v1/live/status"]
+    assert sessions.opened == 0
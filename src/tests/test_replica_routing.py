@@ -0,0 +1,99 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import insert, select
+
+from db.routing import READ_ONLY, ROUTER, USE_PRIMARY, ReplicaRouter, RoutingSession
+from models.short_link import ShortLink
+
+
+class StandInEngine:
+    """Заменитель AsyncEngine: хватает имени, sync_engine и connect() для проверки здоровья"""
+
+    def __init__(self, name: str, alive: bool = True, hangs: bool = False):
+        self.name = name
+        self.alive = alive
+        self.hangs = hangs
+        self.sync_engine = self
+        self.url = SimpleNamespace(host=name)
+
+    @asynccontextmanager
+    async def connect(self):
+        if not self.alive:
+            raise ConnectionRefusedError(self.name)
+        if self.hangs:
+            # Пакеты уходят в никуда: подключение не завершается
+            await asyncio.sleep(3600)
+        yield self
+
+    async def execute(self, statement):
+        return None
+
+
+def make_router(window: float = 5.0, timeout: float = 1.0):
+    primary = StandInEngine("primary")
+    replicas = [StandInEngine("replica-1"), StandInEngine("replica-2")]
+    router = ReplicaRouter(
+        primary, replicas, read_your_writes_window=window, health_check_interval=1, health_check_timeout=timeout,
+    )
+    return router, primary, replicas
+
+
+@pytest.mark.asyncio
+async def test_reads_round_robin_and_skip_unhealthy_replicas():
+    router, primary, replicas = make_router()
+    assert [router.read_engine().name for _ in range(4)] == ["replica-1", "replica-2"] * 2
+
+    replicas[0].alive = False
+    await router.check_health()
+    assert {router.read_engine().name for _ in range(4)} == {"replica-2"}
+
+    replicas[1].alive = False
+    await router.check_health()
+    assert router.read_engine() is primary
+
+    replicas[0].alive = replicas[1].alive = True
+    await router.check_health()
+    assert {router.read_engine().name for _ in range(4)} == {"replica-1", "replica-2"}
+
+
+@pytest.mark.asyncio
+async def test_blackholed_replica_is_dropped_within_timeout():
+    router, primary, replicas = make_router(timeout=0.05)
+    replicas[0].hangs = True
+
+    started = time.monotonic()
+    await router.check_health()
+
+    assert time.monotonic() - started < 1
+    assert {router.read_engine().name for _ in range(4)} == {"replica-2"}
+
+
+def test_routing_session_sends_only_reads_to_replica():
+    router, primary, replicas = make_router()
+    session = RoutingSession(info={ROUTER: router})
+    assert session.get_bind(clause=select(ShortLink)) is primary
+
+    session = RoutingSession(info={ROUTER: router, READ_ONLY: True})
+    replica = session.get_bind(clause=select(ShortLink))
+    assert replica in replicas
+    # Реплика закрепляется за сессией
+    assert session.get_bind(clause=select(ShortLink)) is replica
+    assert session.get_bind(clause=insert(ShortLink)) is primary
+
+    session.info[USE_PRIMARY] = True
+    assert session.get_bind(clause=select(ShortLink)) is primary
+
+
+def test_read_your_writes_window():
+    router, _, _ = make_router(window=5.0)
+    router.note_write(["abc"])
+    assert router.recently_written("abc")
+    assert not router.recently_written("other")
+
+    router, _, _ = make_router(window=0)
+    router.note_write(["abc"])
+    assert not router.recently_written("abc")
@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+
+from api.v1.handlers import short_link_service as handlers
+from db.short_links_db_base import async_session
+from services.cache import MISS, LinkCache
+from services.singleflight import SingleFlight
+from services.storage.memory import MemoryStorage
+
+
+class CountingStorage(MemoryStorage):
+    """Хранилище в памяти, которое считает чтения ссылок и отвечает не сразу, как БД"""
+
+    def __init__(self):
+        super().__init__(visitors_precision=12, visitors_daily=False)
+        self.lookups = 0
+
+    async def get_link(self, db, link_id):
+        self.lookups += 1
+        await asyncio.sleep(0.01)
+        return await super().get_link(db, link_id)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_lookups_of_one_link_make_one_query(monkeypatch):
+    storage = CountingStorage()
+    monkeypatch.setattr(handlers, "storage", storage)
+    await storage.create_links(None, rows=[
+        {"original_link": "https://example.com/", "link_id": "viral", "short_link": "http://s/viral"},
+    ])
+
+    async with async_session() as db:
+        links = await asyncio.gather(*(handlers.load_link(db, "viral") for _ in range(100)))
+
+        assert storage.lookups == 1
+        assert {link.link_id for link in links} == {"viral"}
+
+        # Результат не кешируется: следующее чтение снова идёт в хранилище
+        await handlers.load_link(db, "viral")
+
+        assert storage.lookups == 2
+    assert len(handlers.link_lookups) == 0
+
+
+class LaggingStorage(CountingStorage):
+    """Отвечает прочитанным до задержки - как ответ БД, который ещё в пути"""
+
+    async def get_link(self, db, link_id):
+        self.lookups += 1
+        link = await MemoryStorage.get_link(self, db, link_id)
+        await asyncio.sleep(0.01)
+        return link
+
+
+@pytest.mark.asyncio
+async def test_link_deleted_during_lookup_is_not_cached_as_active(monkeypatch):
+    storage = LaggingStorage()
+    link_cache = LinkCache(max_size=10, ttl=60, negative_ttl=5)
+    monkeypatch.setattr(handlers, "storage", storage)
+    monkeypatch.setattr(handlers, "link_cache", link_cache)
+    monkeypatch.setattr(handlers.link_filter, "_filter", None)
+    await storage.create_links(None, rows=[
+        {"original_link": "https://example.com/", "link_id": "doomed", "short_link": "http://s/doomed"},
+    ])
+
+    async with async_session() as db:
+        lookups = [asyncio.create_task(handlers.get_link_entry(db, "doomed")) for _ in range(3)]
+        await asyncio.sleep(0)
+        # Удаление, как в delete_short_url_handler, пока чтение ещё идёт
+        await storage.deactivate_link(db, link=await MemoryStorage.get_link(storage, db, "doomed"))
+        link_cache.invalidate("doomed")
+        entries = await asyncio.gather(*lookups)
+
+    assert all(entry.is_active for entry in entries)
+    assert link_cache.get("doomed") is MISS
+    assert storage.lookups == 1
+
+
+@pytest.mark.asyncio
+async def test_error_is_shared_and_not_remembered():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def failing():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db is down")
+
+    results = await asyncio.gather(*(flight.do("key", failing) for _ in range(5)), return_exceptions=True)
+
+    assert calls == 1
+    assert all(isinstance(result, RuntimeError) for result in results)
+    with pytest.raises(RuntimeError):
+        await flight.do("key", failing)
+    assert calls == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_leader_hands_over_to_waiters():
+    flight = SingleFlight("test")
+    calls = 0
+
+    async def lookup():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    leader = asyncio.create_task(flight.do("key", lookup))
+    await asyncio.sleep(0)
+    waiters = [asyncio.create_task(flight.do("key", lookup)) for _ in range(3)]
+    cancelled_waiter = asyncio.create_task(flight.do("key", lookup))
+    await asyncio.sleep(0)
+    leader.cancel()
+    cancelled_waiter.cancel()
+
+    assert await asyncio.gather(*waiters) == [2, 2, 2]
+    assert leader.cancelled() and cancelled_waiter.cancelled()
+    assert calls == 2
+    assert len(flight) == 0
@@ -0,0 +1,369 @@
+"""Общие проверки для всех хранилищ ссылок: каждое должно вести себя одинаково"""
+import importlib.util
+import uuid
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from core.config import LINK_ID_CONFLICT, PROJECT_URL
+from models.short_link import ShortLink
+from services.base import RepositoryDB
+from services.clicks import ClickEvent
+from services.dedup import link_hash, url_hash
+from services.pagination import HistoryCursor, decode_cursor, encode_cursor
+from services.storage import make_storage
+from services.storage.postgres import history_row
+
+
+@pytest_asyncio.fixture(params=["memory", "sqlite", "postgres"])
+async def storage_db(request, tmp_path, db_dsn):
+    """Хранилище и сессия, которую ему передают обработчики"""
+    if request.param == "sqlite":
+        pytest.importorskip("aiosqlite")
+    storage = make_storage(
+        request.param, chunk_size=100, counter_shards=4, sqlite_path=str(tmp_path / "links.sqlite3"),
+        visitors_precision=12, visitors_daily=True,
+    )
+    if request.param != "postgres":
+        yield storage, None
+        await storage.close()
+        return
+    engine = create_async_engine(db_dsn)
+    try:
+        async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as db:
+            yield storage, db
+    finally:
+        await engine.dispose()
+
+
+def new_row(original_link: str = None) -> dict:
+    link_id = uuid.uuid4().hex[:10]
+    return {
+        "original_link": original_link or f"https://example.com/{uuid.uuid4().hex}",
+        "link_id": link_id,
+        "short_link": f"{PROJECT_URL}{link_id}",
+    }
+
+
+@pytest.mark.asyncio
+async def test_created_link_is_found_by_link_id(storage_db):
+    storage, db = storage_db
+    row = new_row()
+
+    assert await storage.create_links(db, rows=[row]) == {row["link_id"]: None}
+    link = await storage.get_link(db, row["link_id"])
+
+    assert (link.link_id, str(link.original_link), str(link.short_link)) == (
+        row["link_id"], row["original_link"], row["short_link"],
+    )
+    assert link.is_active
+    assert await storage.get_link(db, "missing") is None
+    assert await storage.ping(db)
+
+
+@pytest.mark.asyncio
+async def test_taken_link_id_is_reported_per_row(storage_db):
+    storage, db = storage_db
+    taken, fresh = new_row(), new_row()
+    await storage.create_links(db, rows=[taken])
+
+    results = await storage.create_links(db, rows=[dict(taken, original_link="https://example.com/other"), fresh])
+
+    assert results == {taken["link_id"]: LINK_ID_CONFLICT, fresh["link_id"]: None}
+    assert str((await storage.get_link(db, taken["link_id"])).original_link) == taken["original_link"]
+
+
+@pytest.mark.asyncio
+async def test_deactivated_link_is_not_a_dedup_candidate(storage_db):
+    storage, db = storage_db
+    row = new_row()
+    await storage.create_links(db, rows=[row])
+    hash_ = url_hash(row["original_link"])
+
+    assert await storage.get_active_by_hashes(db, hashes=[hash_]) == {hash_: (row["link_id"], row["short_link"])}
+
+    await storage.deactivate_link(db, link=await storage.get_link(db, row["link_id"]))
+
+    assert not (await storage.get_link(db, row["link_id"])).is_active
+    assert await storage.get_active_by_hashes(db, hashes=[hash_]) == {}
+
+
+@pytest.mark.asyncio
+async def test_links_with_unparsable_netloc_are_created_and_deduplicated(storage_db):
+    storage, db = storage_db
+    # Порт не число, порт вне диапазона, незакрытый IPv6-хост: urlsplit на них падает
+    rows = [new_row(url) for url in ("http://example.com:abc/", "http://x:99999/", "http://[::1/")]
+
+    assert await storage.create_links(db, rows=rows) == {row["link_id"]: None for row in rows}
+    hashes = [url_hash(row["original_link"]) for row in rows]
+    assert await storage.get_active_by_hashes(db, hashes=hashes) == {
+        hash_: (row["link_id"], row["short_link"]) for hash_, row in zip(hashes, rows)
+    }
+
+
+@pytest.mark.parametrize("url", [
+    "HTTP://Example.COM:80", "https://example.com/a?b#c", "http://example.com:abc/", "http://x:99999/", "http://[::1/",
+])
+def test_migration_backfills_the_runtime_url_hash(url):
+    # Миграция хранит свою копию нормализации; хеши должны совпадать с вычисляемыми приложением
+    path = Path(__file__).parents[1] / "migrations" / "versions" / "a19c7e3d5f20_short_link_original_link_hash.py"
+    spec = importlib.util.spec_from_file_location("original_link_hash_migration", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    assert migration._url_hash(url) == url_hash(url)
+
+
+@pytest.mark.asyncio
+async def test_redirect_policy_is_kept_and_separates_dedup(storage_db):
+    storage, db = storage_db
+    tracked = new_row()
+    cached = dict(new_row(tracked["original_link"]), redirect_status=308, cache_max_age=600)
+    await storage.create_links(db, rows=[tracked, cached])
+    link = await storage.get_link(db, cached["link_id"])
+
+    assert (link.redirect_status, link.cache_max_age) == (308, 600)
+    assert (await storage.get_link(db, tracked["link_id"])).redirect_status == 307
+    assert await storage.get_active_by_hashes(db, hashes=[url_hash(tracked["original_link"])]) == {
+        url_hash(tracked["original_link"]): (tracked["link_id"], tracked["short_link"]),
+    }
+    cached_hash = link_hash(cached["original_link"], 308, 600)
+    assert await storage.get_active_by_hashes(db, hashes=[cached_hash]) == {
+        cached_hash: (cached["link_id"], cached["short_link"]),
+    }
+
+    assert await storage.get_last_click_at(db, link_id=link.id) is None
+    moment = datetime(2024, 1, 1, 12, 30)
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, "127.0.0.1:1", moment), ClickEvent(link.id, "127.0.0.1:2", moment - timedelta(hours=1)),
+    ])
+
+    assert await storage.get_last_click_at(db, link_id=link.id) == moment
+
+
+@pytest.mark.asyncio
+async def test_clicks_are_counted_and_paged_in_order(storage_db):
+    storage, db = storage_db
+    row = new_row()
+    await storage.create_links(db, rows=[row])
+    link = await storage.get_link(db, row["link_id"])
+    started = datetime(2024, 1, 1)
+    # Последний переход с тем же временем, что и первый: порядок решает id
+    moments = [started + timedelta(seconds=i) for i in range(7)] + [started]
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, f"127.0.0.1:{i}", moment) for i, moment in enumerate(reversed(moments))
+    ])
+
+    assert await storage.get_click_count(db, link=link) == len(moments)
+
+    pages = []
+    cursor = None
+    while True:
+        page, cursor = await storage.get_history(db, link_id=link.id, limit=3, after=cursor)
+        pages.append(page)
+        if cursor is None:
+            break
+    records = [record for page in pages for record in page]
+    keys = [(record.use_at, record.id) for record in records]
+
+    assert [len(page) for page in pages] == [3, 3, 2]
+    assert keys == sorted(keys)
+    assert len(set(keys)) == len(moments)
+
+    by_offset, _ = await storage.get_history(db, link_id=link.id, limit=3, offset=3)
+
+    assert [record.id for record in by_offset] == [record.id for record in records[3:6]]
+
+
+@pytest.mark.asyncio
+async def test_unique_clients_are_merged_across_batches_and_days(storage_db):
+    storage, db = storage_db
+    row = new_row()
+    await storage.create_links(db, rows=[row])
+    link = await storage.get_link(db, row["link_id"])
+    first_day = datetime(2024, 1, 1, 12)
+    # Порт у каждого соединения свой: посетитель определяется адресом
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, f"10.0.0.{i}:{40000 + i}", first_day) for i in range(50)
+    ])
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, f"10.0.0.{i}:{50000 + i}", first_day + timedelta(days=1)) for i in range(25, 100)
+    ])
+
+    assert await storage.get_unique_clients(db, link_id=link.id) == pytest.approx(100, abs=3)
+    assert await storage.get_unique_clients(
+        db, link_id=link.id, since=first_day.date(), until=first_day.date(),
+    ) == pytest.approx(50, abs=2)
+    assert await storage.get_unique_clients(
+        db, link_id=link.id, since=first_day.date() + timedelta(days=1),
+    ) == pytest.approx(75, abs=3)
+
+
+@pytest.mark.asyncio
+async def test_rollups_keep_totals_through_compaction(storage_db):
+    storage, db = storage_db
+    row = new_row()
+    await storage.create_links(db, rows=[row])
+    link = await storage.get_link(db, row["link_id"])
+    started = datetime(2024, 1, 1, 10, 58)
+    # По 3 перехода в минуту 10:58 ... 11:01 и ещё одна пачка в ту же минуту 10:58
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, "127.0.0.1:1", started + timedelta(minutes=i, seconds=s))
+        for i in range(4) for s in (0, 20, 40)
+    ])
+    await storage.record_clicks(db, events=[ClickEvent(link.id, "127.0.0.1:1", started)])
+    since, until = datetime(2024, 1, 1), datetime(2024, 1, 2)
+
+    minutes = await storage.get_timeseries(db, link_id=link.id, bucket="minute", since=since, until=until)
+    assert minutes == [(started, 4)] + [(started + timedelta(minutes=i), 3) for i in range(1, 4)]
+
+    assert await storage.compact_rollups(db, source="minute", target="hour", border=datetime(2024, 1, 1, 11)) == 1
+
+    hours = await storage.get_timeseries(db, link_id=link.id, bucket="hour", since=since, until=until)
+    assert hours == [(datetime(2024, 1, 1, 10), 7), (datetime(2024, 1, 1, 11), 6)]
+    # Свёрнутые минуты отдаются с точностью до часа, несвёрнутые - по минутам
+    minutes = await storage.get_timeseries(db, link_id=link.id, bucket="minute", since=since, until=until)
+    assert minutes == [(datetime(2024, 1, 1, 10), 7), (datetime(2024, 1, 1, 11), 3), (datetime(2024, 1, 1, 11, 1), 3)]
+
+    await storage.compact_rollups(db, source="minute", target="hour", border=until)
+    await storage.compact_rollups(db, source="hour", target="day", border=until)
+
+    assert await storage.get_timeseries(db, link_id=link.id, bucket="day", since=since, until=until) == [(since, 13)]
+    assert await storage.get_timeseries(
+        db, link_id=link.id, bucket="day", since=until, until=until + timedelta(days=1),
+    ) == []
+
+
+@pytest.mark.asyncio
+async def test_history_is_streamed_in_batches_within_range(storage_db):
+    storage, db = storage_db
+    row = new_row()
+    await storage.create_links(db, rows=[row])
+    link = await storage.get_link(db, row["link_id"])
+    started = datetime(2024, 1, 1)
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, f"127.0.0.1:{i}", started + timedelta(minutes=i)) for i in reversed(range(10))
+    ])
+
+    batches = [batch async for batch in storage.stream_history(db, link_id=link.id, batch_size=4)]
+
+    assert [len(batch) for batch in batches] == [4, 4, 2]
+    assert [tuple(item) for batch in batches for item in batch] == [
+        (started + timedelta(minutes=i), f"127.0.0.1:{i}") for i in range(10)
+    ]
+
+    in_range = [
+        tuple(item)
+        async for batch in storage.stream_history(
+            db, link_id=link.id, since=started + timedelta(minutes=3), until=started + timedelta(minutes=6),
+            batch_size=2,
+        )
+        for item in batch
+    ]
+
+    assert in_range == [(started + timedelta(minutes=i), f"127.0.0.1:{i}") for i in range(3, 6)]
+
+
+@pytest.mark.asyncio
+async def test_links_are_resolved_and_deactivated_in_bulk(storage_db):
+    storage, db = storage_db
+    active, deleted, clicked = new_row(), new_row(), new_row()
+    await storage.create_links(db, rows=[active, deleted, clicked])
+    await storage.deactivate_link(db, link=await storage.get_link(db, deleted["link_id"]))
+    link = await storage.get_link(db, clicked["link_id"])
+    await storage.record_clicks(db, events=[
+        ClickEvent(link.id, f"10.0.0.{i % 2}:{i}", datetime(2024, 1, 1)) for i in range(3)
+    ])
+    link_ids = [active["link_id"], deleted["link_id"], clicked["link_id"], "missing"]
+
+    links = await storage.get_links(db, link_ids)
+
+    assert sorted(links) == sorted(link_ids[:3])
+    assert (await storage.get_click_counts(db, links=list(links.values())))[link.id] == 3
+    assert await storage.get_unique_clients_many(db, link_ids=[link.id, links[active["link_id"]].id]) == {
+        link.id: 2, links[active["link_id"]].id: 0,
+    }
+
+    assert await storage.deactivate_links(db, link_ids=link_ids) == {
+        active["link_id"]: True, deleted["link_id"]: False, clicked["link_id"]: True,
+    }
+    assert not any(link.is_active for link in (await storage.get_links(db, link_ids)).values())
+
+
+@pytest.mark.parametrize("client_ip, host, port, raw", [
+    ("127.0.0.1:8080", "127.0.0.1", 8080, None),
+    # Порты от 32768 не помещаются в smallint и хранятся отрицательными
+    ("10.0.0.1:65535", "10.0.0.1", -1, None),
+    ("::1:40000", "::1", 40000 - 65536, None),
+    ("testclient:50000", None, None, "testclient:50000"),
+    ("10.0.0.1:70000", None, None, "10.0.0.1:70000"),
+])
+def test_history_client_is_stored_compactly(client_ip, host, port, raw):
+    row = history_row(ClickEvent(uuid.uuid4(), client_ip, datetime(2024, 1, 1)))
+
+    assert (row["client_host"], row["client_port"], row["client_raw"]) == (host, port, raw)
+    if host is not None:
+        assert f"{host}:{row['client_port'] & 0xFFFF}" == client_ip
+
+
+@pytest.mark.parametrize("record_id", [2 ** 40 + 7, uuid.uuid4()])
+def test_history_cursor_keeps_id_type(record_id):
+    cursor = HistoryCursor(datetime(2024, 1, 1, 12, 30), record_id)
+
+    assert decode_cursor(encode_cursor(cursor), id_type=type(record_id)) == cursor
+
+
+@pytest.mark.parametrize("record_id, id_type", [
+    (uuid.uuid4(), int), (2 ** 40 + 7, uuid.UUID), (2 ** 63, int), (True, int), ("not-a-uuid", uuid.UUID),
+])
+def test_history_cursor_of_other_backend_is_rejected(record_id, id_type):
+    value = encode_cursor(HistoryCursor(datetime(2024, 1, 1), record_id))
+
+    with pytest.raises(ValueError):
+        decode_cursor(value, id_type=id_type)
+
+
+@pytest.mark.asyncio
+async def test_bulk_create_reports_conflicts_across_chunks(db_dsn):
+    engine = create_async_engine(db_dsn)
+    links = RepositoryDB(ShortLink)
+    taken = new_row()
+    rows = [new_row(), dict(taken, original_link="https://example.com/other"), new_row(), new_row(), taken]
+    try:
+        async with sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as db:
+            await links.bulk_create(db, rows=[taken], chunk_size=2)
+            results = await links.bulk_create(db, rows=rows, chunk_size=2)
+    finally:
+        await engine.dispose()
+
+    assert results == {
+        rows[0]["link_id"]: None, taken["link_id"]: LINK_ID_CONFLICT, rows[2]["link_id"]: None,
+        rows[3]["link_id"]: None,
+    }
+
+
+@pytest.mark.asyncio
+async def test_failed_chunk_is_retried_row_by_row(monkeypatch):
+    links = RepositoryDB(ShortLink)
+    rows = [new_row() for _ in range(5)]
+    bad = rows[3]["link_id"]
+    calls = []
+
+    async def insert_returning_link_ids(db, chunk):
+        calls.append(len(chunk))
+        if any(row["link_id"] == bad for row in chunk):
+            raise DBAPIError("INSERT", {}, Exception("value too long"))
+        return {row["link_id"] for row in chunk}
+
+    monkeypatch.setattr(links, "_insert_returning_link_ids", insert_returning_link_ids)
+
+    results = await links.bulk_create(None, rows=rows, chunk_size=2)
+
+    # Пачки по 2: вторая падает и повторяется по строке, остальные вставляются целиком
+    assert calls == [2, 2, 1, 1, 1]
+    assert results == {row["link_id"]: None for row in rows} | {bad: "value too long"}
@@ -0,0 +1,93 @@
+import ipaddress
+import os
+import random
+
+import pytest
+
+from middlewares.subnet_blocklist import SubnetBlocklistMiddleware
+from services.subnets import Network, SubnetBlocklist, SubnetTrie, parse_blocklist
+
+
+def random_network(rng: random.Random) -> Network:
+    if rng.random() < 0.5:
+        return ipaddress.IPv4Network((rng.getrandbits(32), rng.randint(8, 32)), strict=False)
+    return ipaddress.IPv6Network((rng.getrandbits(128), rng.randint(16, 128)), strict=False)
+
+
+def test_trie_matches_linear_scan():
+    rng = random.Random(42)
+    networks = [random_network(rng) for _ in range(500)]
+    trie = SubnetTrie(networks)
+    # Адреса внутри подсетей списка и случайные
+    addresses = [network[rng.randrange(network.num_addresses)] for network in networks]
+    addresses += [ipaddress.IPv4Address(rng.getrandbits(32)) for _ in range(2000)]
+    addresses += [ipaddress.IPv6Address(rng.getrandbits(128)) for _ in range(2000)]
+
+    for address in addresses:
+        expected = any(address in network for network in networks if network.version == address.version)
+        assert (address in trie) is expected, address
+    assert len(trie) == len(set(networks))
+
+
+def test_blocklist_file_format_and_special_hosts():
+    trie = parse_blocklist([
+        "# офисная сеть\n",
+        "10.0.0.0/8\n",
+        "\n",
+        "2001:db8::/32  # документация\n",
+        "192.168.1.7\n",
+        "not a subnet\n",
+    ])
+
+    assert len(trie) == 3
+    assert "10.200.3.4" in trie
+    assert "::ffff:10.1.2.3" in trie
+    assert "2001:db8:1::5" in trie
+    assert "192.168.1.7" in trie
+    assert "192.168.1.8" not in trie
+    assert "testclient" not in trie
+
+
+@pytest.mark.asyncio
+async def test_middleware_blocks_and_reloads_list(tmp_path):
+    path = tmp_path / "blocklist.txt"
+    path.write_text("203.0.113.0/24\n")
+    blocklist = SubnetBlocklist(str(path), reload_interval=60)
+    await blocklist.start()
+
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    middleware = SubnetBlocklistMiddleware(app, blocklist=blocklist)
+
+    async def status_for(host: str) -> int:
+        messages = []
+
+        async def send(message):
+            messages.append(message)
+
+        await middleware({"type": "http", "client": (host, 50000)}, None, send)
+        return messages[0]["status"]
+
+    try:
+        assert await status_for("203.0.113.9") == 403
+        assert await status_for("198.51.100.1") == 200
+
+        path.write_text("198.51.100.0/24\n")
+        # mtime может совпасть в пределах разрешения файловой системы
+        os.utime(path, (0, 0))
+        assert await blocklist.reload()
+
+        assert await status_for("203.0.113.9") == 200
+        assert await status_for("198.51.100.1") == 403
+
+        path.write_bytes(b"198.51.100.0/24 # \xff\xfe\n")
+        assert not await blocklist.reload(force=True)
+        assert await status_for("198.51.100.1") == 403
+
+        path.unlink()
+        assert not await blocklist.reload(force=True)
+        assert await status_for("198.51.100.1") == 403
+    finally:
+        await blocklist.stop()
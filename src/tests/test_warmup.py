@@ -0,0 +1,36 @@
+from datetime import datetime
+
+import pytest
+
+from db.short_links_db_base import async_session
+from services.cache import MISS, LinkCache
+from services.clicks import ClickEvent
+from services.storage.memory import MemoryStorage
+from services.warmup import Warmup
+
+
+@pytest.mark.asyncio
+async def test_warmup_preloads_most_clicked_links_and_becomes_ready():
+    storage = MemoryStorage(visitors_precision=12, visitors_daily=False)
+    await storage.create_links(None, rows=[
+        {"original_link": f"https://example.com/{i}", "link_id": f"l{i}", "short_link": f"http://s/l{i}"}
+        for i in range(5)
+    ])
+    links = await storage.get_links(None, [f"l{i}" for i in range(5)])
+    await storage.record_clicks(None, events=[
+        ClickEvent(links[f"l{i}"].id, "127.0.0.1:1", datetime.utcnow())
+        for i, clicks in enumerate((3, 0, 7, 1, 5)) for _ in range(clicks)
+    ])
+    link_cache = LinkCache(max_size=100, ttl=60, negative_ttl=60)
+    warmup = Warmup(
+        async_session, storage=storage, link_cache=link_cache, engines=[], pool_connections=5, preload_links=3,
+    )
+
+    assert not warmup.ready
+    await warmup.start()
+    await warmup._task
+
+    assert warmup.ready
+    assert warmup.startup_seconds is not None
+    assert {link_id for link_id in links if link_cache.get(link_id) is not MISS} == {"l0", "l2", "l4"}
+    await warmup.stop()